@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from endpoints import EndpointPool, public_base_url
+from payload import COVER_PARAMS, cover_url
+
+# Decides which large_image goes to Discord. Each cover URL is checked once
+# per (image item, tag): a GET that must come back 200 with an image, which
+# also makes Jellyfin render and cache the resized image before Discord asks
+# for it. Bad URLs fall back to the default asset key for a while. resolve()
+# never waits for a check: until it lands, the last good cover of the same
+# image (or the default asset) is published, and settled() tells the client
+# to publish again. Near the end of an episode the next one's cover is
+# checked ahead of time, so the first update after the transition already
+# has verified art.
+
+OK_TTL = 6 * 3600.0
+BAD_TTL = 600.0
+CHECK_TIMEOUT = 5.0
+PREFETCH_WINDOW = 120.0
+
+ArtKey = Tuple[str, str]
+
+
+def art_key(url: str) -> ArtKey:
+    """(image item id, tag) for a Jellyfin image URL; the URL itself for anything else."""
+    parts = urlsplit(url)
+    segments = parts.path.strip("/").split("/")
+    if "Items" in segments:
+        i = segments.index("Items")
+        if i + 1 < len(segments):
+            tag = (parse_qs(parts.query).get("tag") or [""])[0]
+            return segments[i + 1].lower(), tag
+    return url, ""
+
+
+class ArtworkResolver:
+    """Reachability cache for cover URLs, with next-episode prefetch."""
+
+    def __init__(self, cfg: dict, default_asset: str = "jellyfin") -> None:
+        self.cfg = cfg
+        self.default_asset = default_asset
+        self._cache: Dict[ArtKey, Tuple[bool, float]] = {}
+        self._inflight: Dict[ArtKey, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="artwork")
+        self._prefetched: Optional[str] = None
+        # (image item id, URL) of the last cover that passed its check
+        self._good: Optional[Tuple[str, str]] = None
+        # Cover resolve() answered for without waiting for its check
+        self._waiting: Optional[str] = None
+
+    def _check(self, key: ArtKey, url: str) -> bool:
+        try:
+            with requests.get(url, timeout=CHECK_TIMEOUT, stream=True, allow_redirects=False) as r:
+                ok = r.status_code == 200 and r.headers.get("Content-Type", "").startswith("image/")
+        except Exception as e:
+            logging.warning(f"Artwork check failed for {url}: {e}")
+            ok = False
+        if not ok:
+            logging.warning(f"Artwork not reachable, using '{self.default_asset}' instead: {url}")
+        with self._lock:
+            self._cache[key] = (ok, time.monotonic() + (OK_TTL if ok else BAD_TTL))
+            self._inflight.pop(key, None)
+        return ok
+
+    def _cached(self, key: ArtKey) -> Optional[bool]:
+        hit = self._cache.get(key)
+        if hit is None or hit[1] < time.monotonic():
+            return None
+        return hit[0]
+
+    def warm(self, url: str) -> Future:
+        """Start (or join) a check of url without waiting for it."""
+        key = art_key(url)
+        with self._lock:
+            known = self._cached(key)
+            if known is not None:
+                done: Future = Future()
+                done.set_result(known)
+                return done
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._executor.submit(self._check, key, url)
+                self._inflight[key] = pending
+            return pending
+
+    def resolve(self, data) -> Optional[str]:
+        """Cover URL for this presence if it loads, else the default asset key.
+
+        Doesn't block: while the cover is still being checked, the last good
+        cover of the same image item (e.g. a new tag) or the default asset is
+        returned, and settled() turns true once the check is done.
+        """
+        url = cover_url(data, self.cfg)
+        if not url:
+            return None
+        image = art_key(url)[0]
+        pending = self.warm(url)
+        if not pending.done():
+            self._waiting = url
+            good = self._good
+            return good[1] if good is not None and good[0] == image else self.default_asset
+        self._waiting = None
+        if pending.result():
+            self._good = (image, url)
+            return url
+        return self.default_asset
+
+    def settled(self) -> bool:
+        """A check resolve() didn't wait for has finished; resolve again to use it."""
+        url = self._waiting
+        if url is None:
+            return False
+        with self._lock:
+            return self._cached(art_key(url)) is not None
+
+    def maybe_prefetch(self, data, endpoints: EndpointPool, fetch_json: Callable[[str, dict], dict]) -> None:
+        """Near the end of an episode, look up the next one and warm its cover."""
+        end = data.get("end_timestamp")
+        item_id = data.get("item_id")
+        series_id = data.get("series_id")
+        if (not end or data.get("is_paused") or not item_id or not series_id
+                or item_id == self._prefetched or end - time.time() > PREFETCH_WINDOW):
+            return
+        self._prefetched = item_id
+        self._executor.submit(self._prefetch_next, str(series_id), str(item_id), endpoints, fetch_json)
+
+    def _prefetch_next(self, series_id: str, item_id: str, endpoints: EndpointPool,
+                       fetch_json: Callable[[str, dict], dict]) -> None:
+        path = f"/Shows/{series_id}/Episodes"
+        params = {"startItemId": item_id, "limit": 2, "fields": "ImageTags"}
+        try:
+            body = endpoints.call(lambda base: fetch_json(base + path, params))
+        except Exception as e:
+            logging.warning(f"Next-up lookup failed for series {series_id}: {e}")
+            return
+        # The presence sends dashed GUIDs, the items API plain hex
+        current = item_id.replace("-", "").lower()
+        items = [i for i in body.get("Items") or [] if str(i.get("Id")).replace("-", "").lower() != current]
+        if not items:
+            return
+        url = self._next_cover_url(items[0], series_id)
+        if url:
+            logging.info(f"Prefetching next-up artwork: {url}")
+            self.warm(url)
+
+    def _next_cover_url(self, item: dict, series_id: str) -> Optional[str]:
+        # Same URL the plugin will build for that episode: series poster, episode tag
+        base = public_base_url(self.cfg)
+        if not base:
+            return None
+        url = f"{base}/Items/{series_id}/Images/Primary?{COVER_PARAMS}"
+        tag = (item.get("ImageTags") or {}).get("Primary")
+        if tag:
+            url += f"&tag={tag}"
+        return url
@@ -0,0 +1,391 @@
+import argparse
+import gzip
+import itertools
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from payload import build_payload, cover_url, link_buttons
+from poll_trace import TraceRing
+from templates import RESOLVERS, CompiledTemplate
+from presence_diff import PresenceDiff
+from presence_state import PresenceState
+from wire import DEFAULT_FIELDS, MSGPACK_CONTENT_TYPE, PresenceCache, decode_presence, msgpack
+
+# Microbenchmarks for the client hot path.
+#   python bench.py                      run every case
+#   python bench.py templates            run cases whose name contains "templates"
+#   python bench.py --responses r.jsonl  drive loop.* cases with recorded /Presence/Me bodies
+#   python bench.py --save               store results as the baseline
+#   python bench.py --compare            fail (exit 1) on cases slower than the baseline
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+
+NOW = 1710000300.0
+
+SAMPLE_EPISODE = {
+    "active": True,
+    "details": "Doctor Who S01E01",
+    "state": "\"Rose\" • Action, Drama, Mystery • 15:00 left",
+    "large_image": "https://your.jellyfin/Items/2f0c/Images/Primary?quality=90&fillHeight=512&fillWidth=512&tag=abc",
+    "large_text": "Jellyfin",
+    "small_image": "play",
+    "small_text": "Playing",
+    "start_timestamp": 1710000000,
+    "end_timestamp": 1710001200,
+    "is_paused": False,
+    "item_id": "9b1c3c1e-3a52-4a4f-8d8e-111111111111",
+    "item_type": "Episode",
+    "series_id": "2f0c0a7e-1d2b-4c3d-9e8f-222222222222",
+    "cover_image_path": "Items/2f0c0a7e-1d2b-4c3d-9e8f-222222222222/Images/Primary?tag=abc",
+    "public_cover_url": "https://your.jellyfin/Items/2f0c/Images/Primary?quality=90&fillHeight=512&fillWidth=512&tag=abc",
+    "season_episode": "S01E01",
+    "episode_title": "Rose",
+    "series_name": "Doctor Who",
+    "genres": "Action, Drama, Mystery",
+    "links": [
+        {"label": "IMDb", "url": "https://www.imdb.com/title/tt0436992/"},
+        {"label": "TheMovieDb", "url": "https://www.themoviedb.org/tv/57243"},
+    ],
+}
+
+# What the plugin sends without ?fields=: the same data again under NowPlayingItem, plus GUIDs
+SAMPLE_FULL = dict(
+    SAMPLE_EPISODE,
+    user_id="5d7e2c4b-0a1f-4e3d-8c9b-333333333333",
+    NowPlayingItem={
+        "Id": SAMPLE_EPISODE["item_id"],
+        "Name": "Rose",
+        "SeriesName": "Doctor Who",
+        "Type": "Episode",
+        "IndexNumber": 1,
+        "ParentIndexNumber": 1,
+        "SeasonEpisode": "S01E01",
+    },
+)
+
+
+def _projected(body: dict) -> dict:
+    # Mirrors PresenceWire.Project on the plugin side
+    return {k: v for k, v in body.items() if k in DEFAULT_FIELDS and v is not None}
+
+
+def _json_bytes(body: dict) -> bytes:
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+WIRE_BODIES = {
+    "json.full": (_json_bytes(SAMPLE_FULL), "application/json"),
+    "json.projected": (_json_bytes(_projected(SAMPLE_FULL)), "application/json"),
+}
+if msgpack is not None:
+    WIRE_BODIES["msgpack.projected"] = (msgpack.packb(_projected(SAMPLE_FULL)), MSGPACK_CONTENT_TYPE)
+
+# Responses the loop.* cases cycle through; --responses replaces these
+RESPONSES: List[dict] = [
+    SAMPLE_EPISODE,
+    dict(SAMPLE_EPISODE, is_paused=True, end_timestamp=None, small_image="pause", small_text="Paused"),
+    dict(
+        SAMPLE_EPISODE,
+        details="The Matrix",
+        state="Action, Sci-Fi • 1:32:45 left",
+        item_type="Movie",
+        season_episode="",
+        series_name="",
+        episode_title="The Matrix",
+        public_cover_url=None,
+        links=[{"label": "IMDb", "url": "https://www.imdb.com/title/tt0133093/"}],
+    ),
+]
+
+BENCH_CFG = {
+    "jellyfin_url": "https://your.jellyfin",
+    "api_key": "0123456789abcdef",
+    "include_token_in_image_url": False,
+    "Images": {"ENABLE_IMAGES": True},
+}
+
+
+def load_responses(path: Path) -> List[dict]:
+    """Recorded presence bodies: a JSON array or one JSON object per line."""
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return [d for d in json.loads(text) if isinstance(d, dict)]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+DETAILS_TEMPLATE = "{series_or_title}"
+STATE_TEMPLATE = "\"{title}\" • {genres} • {time_left}"
+
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _replace_tokens(template: str, data: dict, now: float) -> str:
+    # Mirrors the plugin's chained string.Replace passes, for comparison
+    out = template
+    for token, fn in RESOLVERS.items():
+        out = out.replace("{" + token + "}", fn(data, now))
+    return out
+
+
+@case("templates.compiled")
+def _bench_compiled():
+    details = CompiledTemplate(DETAILS_TEMPLATE)
+    state = CompiledTemplate(STATE_TEMPLATE)
+    return lambda: (details.render(SAMPLE_EPISODE, NOW), state.render(SAMPLE_EPISODE, NOW))
+
+
+@case("templates.replace")
+def _bench_replace():
+    return lambda: (
+        _replace_tokens(DETAILS_TEMPLATE, SAMPLE_EPISODE, NOW),
+        _replace_tokens(STATE_TEMPLATE, SAMPLE_EPISODE, NOW),
+    )
+
+
+@case("templates.compile")
+def _bench_compile():
+    return lambda: (CompiledTemplate(DETAILS_TEMPLATE), CompiledTemplate(STATE_TEMPLATE))
+
+
+def _active_responses() -> List[PresenceState]:
+    return [PresenceState.from_mapping(d) for d in RESPONSES if d.get("active")] or [PresenceState()]
+
+
+@case("loop.build_payload")
+def _bench_build_payload():
+    it = itertools.cycle(_active_responses())
+    return lambda: build_payload(next(it))
+
+
+@case("loop.cover_url")
+def _bench_cover_url():
+    it = itertools.cycle(_active_responses())
+    return lambda: cover_url(next(it), BENCH_CFG)
+
+
+@case("loop.link_buttons")
+def _bench_link_buttons():
+    it = itertools.cycle(_active_responses())
+    return lambda: link_buttons(next(it))
+
+
+@case("loop.compare_payload")
+def _bench_compare_payload():
+    # main.py: whole-dict payload != last_payload on an unchanged poll
+    pairs = itertools.cycle([(build_payload(d), build_payload(d)) for d in _active_responses()])
+
+    def run():
+        a, b = next(pairs)
+        return a != b
+    return run
+
+
+@case("loop.compare_selfbot")
+def _bench_compare_selfbot():
+    # main_selfbot.py: data != last_payload on the raw response
+    pairs = itertools.cycle([(d, json.loads(json.dumps(d))) for d in RESPONSES])
+
+    def run():
+        a, b = next(pairs)
+        return a != b
+    return run
+
+
+@case("loop.compare_state")
+def _bench_compare_state():
+    # PresenceState equality on an unchanged poll (what both clients now compare)
+    pairs = itertools.cycle([(PresenceState.from_mapping(d), PresenceState.from_mapping(d)) for d in RESPONSES])
+
+    def run():
+        a, b = next(pairs)
+        return a != b
+    return run
+
+
+@case("state.from_mapping")
+def _bench_state_from_mapping():
+    it = itertools.cycle(RESPONSES)
+    return lambda: PresenceState.from_mapping(next(it))
+
+
+@case("loop.iteration")
+def _bench_iteration():
+    # One active poll through main.py, from decoded response to the update decision
+    it = itertools.cycle(_active_responses())
+    last = [None]
+
+    def run():
+        data = next(it)
+        if data == last[0]:
+            return False
+        payload = build_payload(data)
+        url = cover_url(data, BENCH_CFG)
+        if url:
+            payload["large_image"] = url
+        buttons = link_buttons(data)
+        if buttons:
+            payload["buttons"] = buttons
+        last[0] = data
+        return True
+    return run
+
+
+@case("loop.not_modified")
+def _bench_not_modified():
+    # A 304 poll: the cache hands back the published state and the update
+    # decision is an identity check
+    cache = PresenceCache()
+    last_state = cache.store('W/"bench"', _active_responses()[0])
+
+    def run():
+        data = cache.not_modified()
+        return data is not last_state and data != last_state
+    return run
+
+
+@case("diff.should_publish")
+def _bench_should_publish():
+    # Consecutive polls of the same playback: timestamps and "MM:SS left" drift
+    base = _active_responses()[0]
+    drifted = base.to_mapping()
+    drifted["start_timestamp"] = (base.start_timestamp or 0) + 1
+    drifted["end_timestamp"] = (base.end_timestamp or 0) + 1
+    drifted = PresenceState.from_mapping(drifted)
+    differ = PresenceDiff()
+    return lambda: differ.should_publish(drifted, base)
+
+
+@case("trace.commit")
+def _bench_trace_commit():
+    # What the trace ring costs per poll when nobody dumps it
+    trace = TraceRing()
+
+    def run():
+        trace.request_start()
+        trace.response(200, 812)
+        trace.commit("skip")
+    return run
+
+
+def _register_wire_cases() -> None:
+    for fmt, (body, content_type) in WIRE_BODIES.items():
+        case(f"wire.decode.{fmt}")(lambda body=body, ct=content_type: (lambda: decode_presence(body, ct)))
+
+
+_register_wire_cases()
+
+
+def wire_sizes() -> None:
+    """Bytes per poll for each encoding, raw and gzipped."""
+    for fmt, (body, _) in WIRE_BODIES.items():
+        print(f"wire.bytes.{fmt:<23} {len(body):>6} raw  {len(gzip.compress(body)):>6} gzip")
+    if msgpack is None:
+        print("(install msgpack to include the MessagePack encoding)")
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best-of-repeat time per call, in nanoseconds."""
+    best = min(timeit.repeat(fn, number=number, repeat=repeat, timer=time.perf_counter))
+    return best / number * 1e9
+
+
+def measure_alloc(fn: Callable[[], object], number: int = 200) -> float:
+    """Mean peak bytes allocated while one call runs (tracemalloc)."""
+    fn()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(number):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / number
+
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, float]]) -> None:
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "saved_at": int(time.time()),
+        "results": results,
+    }
+    path.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"Saved baseline for {len(results)} case(s) to {path}")
+
+
+def compare_baseline(path: Path, results: Dict[str, Dict[str, float]], tolerance: float) -> int:
+    """Print deltas against a saved baseline; returns the number of regressions."""
+    baseline = json.loads(path.read_text(encoding="utf-8")).get("results", {})
+    regressions = 0
+    print(f"\nvs baseline {path} (tolerance {tolerance:.0%})")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<32} (new)")
+            continue
+        delta = now["ns"] / before["ns"] - 1.0 if before["ns"] else 0.0
+        flag = ""
+        if delta > tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<32} {before['ns']:>10.0f} -> {now['ns']:>10.0f} ns ({delta:+.1%}){flag}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Client hot-path microbenchmarks")
+    ap.add_argument("filter", nargs="?", default="", help="only run cases containing this text")
+    ap.add_argument("-n", "--number", type=int, default=20000, help="calls per repeat")
+    ap.add_argument("--sizes", action="store_true", help="also print wire bytes per poll")
+    ap.add_argument("--responses", type=Path, help="recorded presence bodies (JSON array or JSON lines)")
+    ap.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, type=Path, help="save results as baseline")
+    ap.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, type=Path, help="compare with a saved baseline")
+    ap.add_argument("--tolerance", type=float, default=0.20, help="allowed slowdown before --compare fails")
+    args = ap.parse_args()
+
+    if args.responses:
+        RESPONSES[:] = load_responses(args.responses)
+        print(f"Loaded {len(RESPONSES)} recorded response(s) from {args.responses}")
+    if args.sizes:
+        wire_sizes()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        fn = setup()
+        ns = measure(fn, args.number)
+        peak = 0.0 if args.no_alloc else measure_alloc(fn)
+        results[name] = {"ns": ns, "peak_bytes": peak}
+        alloc = "" if args.no_alloc else f" {peak:>8.0f} B peak/iter"
+        print(f"{name:<32} {ns:>10.0f} ns/iter{alloc}")
+
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare:
+        if not args.compare.exists():
+            print(f"No baseline at {args.compare}; run with --save first")
+            sys.exit(2)
+        if compare_baseline(args.compare, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import re
+import signal
+import socket
+import sys
+import time
+import logging
+from typing import Callable, Optional
+
+# Support for `main.py --daemon`: headless operation under a systemd user
+# service. Everything here is stdlib-only so the daemon doesn't pay for rich.
+
+_MARKUP_RE = re.compile(r"\[/?[a-z_ #0-9]*\]")
+
+REPORT_EVERY = 3600.0
+
+
+class QuietConsole:
+    """Stand-in for rich's Console: markup stripped, written to stderr (journald)."""
+
+    def print(self, *objects, **_kwargs) -> None:
+        text = " ".join(_MARKUP_RE.sub("", str(o)) for o in objects).strip()
+        if text:
+            sys.stderr.write(text + "\n")
+            sys.stderr.flush()
+
+
+def sd_notify(state: str) -> bool:
+    """Send a sd_notify(3) message; a no-op when not started by systemd."""
+    addr = os.environ.get("NOTIFY_SOCKET")
+    if not addr or not hasattr(socket, "AF_UNIX"):
+        return False
+    if addr.startswith("@"):
+        addr = "\0" + addr[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.sendto(state.encode("utf-8"), addr)
+        return True
+    except OSError:
+        return False
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or peak RSS where /proc isn't available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def _watchdog_interval() -> Optional[float]:
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and pid != str(os.getpid())):
+        return None
+    try:
+        return int(usec) / 1_000_000
+    except ValueError:
+        return None
+
+
+class Daemon:
+    """Single timer for the daemon loop.
+
+    Poll sleeps, watchdog pings and the hourly wakeup/RSS report all share one
+    sleep: the watchdog is pinged opportunistically whenever the loop wakes
+    anyway, and a sleep is only cut short when a ping would otherwise be late.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.wakeups = 0
+        self._watchdog = _watchdog_interval()
+        self._last_ping = self.started
+        self._window_start = self.started
+        self._window_wakeups = 0
+
+    def install_signal_handlers(self) -> None:
+        def _terminate(signum, _frame):
+            logging.info(f"Received signal {signum}, shutting down")
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGTERM, _terminate)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, _terminate)
+
+    def ready(self) -> None:
+        sd_notify("READY=1\nSTATUS=Polling Jellyfin")
+
+    def stopping(self) -> None:
+        sd_notify("STOPPING=1")
+
+    def sleep(self, seconds: float, wait: Optional[Callable[[float], bool]] = None) -> bool:
+        """Sleep up to seconds. wait (e.g. an Event's wait) replaces time.sleep
+        so something else can end the sleep early by making it return True;
+        returns whether that happened. Every return from it counts as a wakeup."""
+        deadline = time.monotonic() + max(0.0, seconds)
+        while True:
+            now = time.monotonic()
+            self._tick(now)
+            remaining = deadline - now
+            if remaining <= 0:
+                return False
+            if self._watchdog:
+                remaining = min(remaining, self._last_ping + self._watchdog / 2 - now)
+            if wait is not None:
+                woken = wait(max(0.01, remaining))
+            else:
+                time.sleep(max(0.01, remaining))
+                woken = False
+            self.wakeups += 1
+            self._window_wakeups += 1
+            if woken:
+                self._tick(time.monotonic())
+                return True
+
+    def _tick(self, now: float) -> None:
+        # A quarter of the watchdog period has passed: ping now rather than
+        # schedule a dedicated wakeup for it at the half-way mark
+        if self._watchdog and now - self._last_ping >= self._watchdog / 4:
+            sd_notify("WATCHDOG=1")
+            self._last_ping = now
+        if now - self._window_start >= REPORT_EVERY:
+            self.report(now)
+
+    def report(self, now: Optional[float] = None) -> str:
+        now = time.monotonic() if now is None else now
+        elapsed = max(1e-6, now - self._window_start)
+        per_hour = self._window_wakeups * 3600.0 / elapsed
+        rss = rss_bytes()
+        rss_text = f"{rss / (1024 * 1024):.1f} MiB" if rss is not None else "unknown"
+        line = f"{per_hour:.0f} wakeups/h, RSS {rss_text}"
+        logging.info(f"Daemon stats: {line}")
+        sd_notify(f"STATUS=Polling Jellyfin ({line})")
+        self._window_start = now
+        self._window_wakeups = 0
+        return line
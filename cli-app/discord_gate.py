@@ -0,0 +1,115 @@
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator, List, Optional
+
+# Is anyone there to receive a presence? The clients ask this before each
+# Jellyfin poll and stop polling entirely while the answer is no: for the IPC
+# client that means Discord's discord-ipc-N socket/pipe is missing, for the
+# selfbot client that the local server's /health isn't discord_ready. Both
+# checks are local and cheap compared to a request to Jellyfin.
+
+IPC_SLOTS = 10
+# Where Flatpak/Snap builds of Discord put the socket, relative to the runtime dir
+_SANDBOX_SUBDIRS = ("", "app/com.discordapp.Discord", "app/com.discordapp.DiscordCanary", "snap.discord", "snap.discord-canary")
+_WINDOWS_PIPES = "\\\\.\\pipe\\"
+
+
+def _runtime_dirs() -> Iterator[str]:
+    seen = set()
+    for name in ("XDG_RUNTIME_DIR", "TMPDIR", "TMP", "TEMP"):
+        value = os.environ.get(name)
+        if value and value not in seen:
+            seen.add(value)
+            yield value
+    for value in (tempfile.gettempdir(), "/tmp"):
+        if value not in seen:
+            seen.add(value)
+            yield value
+
+
+def _existing_ipc_paths() -> Iterator[str]:
+    if sys.platform == "win32":
+        try:
+            pipes = set(os.listdir(_WINDOWS_PIPES))
+        except OSError:
+            return
+        for i in range(IPC_SLOTS):
+            if f"discord-ipc-{i}" in pipes:
+                yield _WINDOWS_PIPES + f"discord-ipc-{i}"
+        return
+    exists = os.path.exists
+    for base in _runtime_dirs():
+        for sub in _SANDBOX_SUBDIRS:
+            for i in range(IPC_SLOTS):
+                path = os.path.join(base, sub, f"discord-ipc-{i}")
+                if exists(path):
+                    yield path
+
+
+def ipc_socket_paths() -> List[str]:
+    """Existing discord-ipc-N endpoints (Unix sockets, or named pipes on Windows)."""
+    return list(_existing_ipc_paths())
+
+
+def discord_ipc_available() -> bool:
+    """A discord-ipc socket exists; stops at the first hit, no connection made."""
+    return next(_existing_ipc_paths(), None) is not None
+
+
+def discord_ipc_listening() -> bool:
+    """Stronger check: a socket accepts connections (a stale file after a crash won't)."""
+    if sys.platform == "win32" or not hasattr(socket, "AF_UNIX"):
+        return discord_ipc_available()
+    for path in ipc_socket_paths():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(0.5)
+            try:
+                s.connect(path)
+                return True
+            except OSError:
+                continue
+    return False
+
+
+class ConsumerGate:
+    """Caches positive answers of a consumer check for `ttl` seconds.
+
+    While waiting, the check is repeated after `retry` seconds, then twice as
+    long each time up to `max_retry`, so a machine where Discord stays closed
+    all day isn't woken every few seconds.
+    """
+
+    def __init__(self, check: Callable[[], bool], ttl: float = 0.0, retry: float = 5.0,
+                 confirm: Optional[Callable[[], bool]] = None, max_retry: float = 30.0) -> None:
+        self.check = check
+        self.confirm = confirm or check
+        self.ttl = ttl
+        self.retry = retry
+        self.max_retry = max(retry, max_retry)
+        self._valid_until = 0.0
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        if now < self._valid_until:
+            return True
+        ok = self.check()
+        if ok:
+            self._valid_until = now + self.ttl
+        return ok
+
+    def invalidate(self) -> None:
+        """The consumer just failed us; ask again next time."""
+        self._valid_until = 0.0
+
+    def wait(self, sleep: Callable[[float], None] = time.sleep) -> float:
+        """Block until a consumer is there; returns the seconds waited."""
+        started = time.monotonic()
+        delay = self.retry
+        while not self.confirm():
+            sleep(delay)
+            delay = min(self.max_retry, delay * 2)
+        self._valid_until = time.monotonic() + self.ttl
+        return time.monotonic() - started
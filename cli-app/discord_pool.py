@@ -0,0 +1,129 @@
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+# One Discord application per kind of media, so the bold app name can read
+# "Watching TV" for episodes and "Listening to Music" for tracks. Each client
+# id needs its own IPC connection; the pool keeps them open (connected once at
+# startup) so moving from a track to an episode is a clear on one connection
+# and an update on another, both already handshaken. Once nothing has played
+# for idle_timeout seconds the spare connections are closed; the next
+# publish (playback is back) reopens them right after its update, so the
+# switch after that is warm again.
+#
+#   "discord_client_ids": {"episodes": "...", "movies": "...", "music": "..."}
+#
+# Kinds missing from the mapping use discord_client_id.
+
+KINDS = ("episodes", "movies", "music")
+DEFAULT_IDLE_TIMEOUT = 900.0
+
+_MUSIC_TYPES = frozenset(("Audio", "MusicAlbum", "MusicArtist"))
+
+
+def media_kind(item_type: Optional[str]) -> str:
+    """Template section the plugin uses for item_type (Episodes, Music or Movies)."""
+    if item_type == "Episode":
+        return "episodes"
+    if item_type in _MUSIC_TYPES:
+        return "music"
+    return "movies"
+
+
+class _Slot:
+    __slots__ = ("client_id", "rpc", "last_used")
+
+    def __init__(self, client_id: str, rpc: Any) -> None:
+        self.client_id = client_id
+        self.rpc = rpc
+        self.last_used = time.monotonic()
+
+
+class PresencePool:
+    """Connected Presence per Discord client id; one of them shows the activity."""
+
+    def __init__(self, connect: Callable[[str], Any], default_id: str, ids: Optional[dict] = None,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> None:
+        self.connect = connect
+        self.default_id = default_id
+        self.ids = {k: str(v) for k, v in (ids or {}).items() if k in KINDS and v}
+        self.idle_timeout = idle_timeout
+        self.active: Optional[str] = None
+        self._slots: Dict[str, _Slot] = {}
+        # Prewarmed ids closed by evict_idle, for rewarm()
+        self._cold: set = set()
+
+    def client_id_for(self, item_type: Optional[str]) -> str:
+        return self.ids.get(media_kind(item_type), self.default_id)
+
+    def get(self, client_id: str) -> Any:
+        """Connection for client_id, opened now if the pool doesn't have one."""
+        slot = self._slots.get(client_id)
+        if slot is None:
+            started = time.perf_counter()
+            slot = self._slots[client_id] = _Slot(client_id, self.connect(client_id))
+            logging.info(f"Connected Discord app {client_id} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        slot.last_used = time.monotonic()
+        return slot.rpc
+
+    def prewarm(self) -> None:
+        """Open a connection for every configured client id ahead of need."""
+        for client_id in {self.default_id, *self.ids.values()}:
+            if client_id not in self._slots:
+                try:
+                    self.get(client_id)
+                except Exception as e:
+                    logging.warning(f"Could not pre-connect Discord app {client_id}: {e}")
+
+    def switch(self, client_id: str) -> Any:
+        """Make client_id the app showing the activity, clearing the previous one's."""
+        rpc = self.get(client_id)
+        previous = self._slots.get(self.active) if self.active else None
+        if previous is not None and previous.client_id != client_id:
+            try:
+                previous.rpc.clear()
+            except Exception as e:
+                logging.warning(f"Failed to clear Discord app {previous.client_id}: {e}")
+        self.active = client_id
+        return rpc
+
+    def rewarm(self) -> None:
+        """Reopen the connections evict_idle closed; call after a publish."""
+        cold, self._cold = self._cold, set()
+        for client_id in cold:
+            if client_id not in self._slots:
+                try:
+                    self.get(client_id)
+                except Exception as e:
+                    logging.warning(f"Could not re-connect Discord app {client_id}: {e}")
+
+    def evict_idle(self, now: Optional[float] = None, busy: bool = False) -> int:
+        """Close connections unused for idle_timeout, except the active one.
+        busy (something is playing) keeps them all: a spare may be needed any moment."""
+        if busy:
+            return 0
+        now = time.monotonic() if now is None else now
+        idle = [s for s in self._slots.values()
+                if s.client_id != self.active and now - s.last_used >= self.idle_timeout]
+        for slot in idle:
+            del self._slots[slot.client_id]
+            self._cold.add(slot.client_id)
+            try:
+                slot.rpc.close()
+            except Exception:
+                pass
+            logging.info(f"Closed idle connection to Discord app {slot.client_id}")
+        return len(idle)
+
+    def close_all(self) -> None:
+        for slot in self._slots.values():
+            try:
+                slot.rpc.close()
+            except Exception:
+                pass
+        self._slots.clear()
+        self._cold.clear()
+        self.active = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Callable, Deque, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
+
+try:
+    import requests
+except Exception:  # pragma: no cover
+    requests = None  # only needed for probes; bench.py imports the URL helpers without it
+
+# jellyfin_url may be a list (e.g. the LAN address and the public HTTPS URL).
+# EndpointPool keeps a latency estimate per endpoint, sends each request to
+# the fastest healthy one, fails over on errors and can hedge a slow request
+# with a second one to the next endpoint. URLs handed to Discord always use
+# the public endpoint (public_base_url), whichever one served the request.
+
+T = TypeVar("T")
+
+PING_PATH = "/Plugins/DiscordRpc/Ping"
+PROBE_EVERY = 60.0
+BACKOFF_MIN = 5.0
+BACKOFF_MAX = 120.0
+# Hedging needs a few samples before the p95 means anything
+HEDGE_MIN_SAMPLES = 20
+
+
+def _url_key(cfg: dict) -> Union[str, Tuple[str, ...]]:
+    value = cfg.get("jellyfin_url") or ""
+    return value if isinstance(value, str) else tuple(str(u) for u in value)
+
+
+@lru_cache(maxsize=16)
+def _split_urls(value: Union[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    parts = value.split(",") if isinstance(value, str) else value
+    return tuple(u.strip().rstrip("/") for u in parts if u.strip())
+
+
+@lru_cache(maxsize=16)
+def _public(explicit: str, value: Union[str, Tuple[str, ...]]) -> Optional[str]:
+    explicit = explicit.strip().rstrip("/")
+    if explicit:
+        return explicit
+    urls = _split_urls(value)
+    return next((u for u in urls if u.startswith("https://")), urls[0] if urls else None)
+
+
+def jellyfin_urls(cfg: dict) -> List[str]:
+    """jellyfin_url as a list; accepts a single string, a comma-separated string or a list."""
+    return list(_split_urls(_url_key(cfg)))
+
+
+def public_base_url(cfg: dict) -> Optional[str]:
+    """public_url if set, else the first https endpoint, else the first endpoint."""
+    # Memoized: cover_url asks on every payload build
+    return _public(cfg.get("public_url") or "", _url_key(cfg))
+
+
+def rebase_url(url: str, cfg: dict) -> str:
+    """Point a server-built URL (e.g. public_cover_url) at the public endpoint."""
+    public = public_base_url(cfg)
+    if not public or url.startswith(public + "/"):
+        return url
+    origin = urlsplit(url)
+    for base in _split_urls(_url_key(cfg)):
+        b = urlsplit(base)
+        if (origin.scheme, origin.netloc) == (b.scheme, b.netloc) and base != public:
+            return public + url[len(f"{b.scheme}://{b.netloc}"):]
+    return url
+
+
+class Endpoint:
+    __slots__ = ("url", "ewma", "samples", "failures", "retry_at")
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.ewma: Optional[float] = None
+        self.samples: Deque[float] = deque(maxlen=200)
+        self.failures = 0
+        self.retry_at = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.failures == 0 or time.monotonic() >= self.retry_at
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class EndpointPool:
+    """Latency-ranked Jellyfin endpoints with failover and optional hedging."""
+
+    def __init__(self, urls: List[str], hedge: bool = False, timeout: float = 10.0) -> None:
+        if not urls:
+            raise ValueError("no Jellyfin endpoints configured")
+        self.endpoints = [Endpoint(u) for u in urls]
+        self.hedge = hedge and len(urls) > 1
+        self.timeout = timeout
+        self.hedged = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._next_probe = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(2, len(self.endpoints)), thread_name_prefix="endpoint")
+        return self._executor
+
+    def ranked(self) -> List[Endpoint]:
+        """Healthy endpoints fastest first, then endpoints still backing off."""
+        with self._lock:
+            def key(ep: Endpoint):
+                return (not ep.healthy, ep.ewma if ep.ewma is not None else float("inf"))
+            return sorted(self.endpoints, key=key)
+
+    def record(self, ep: Endpoint, seconds: Optional[float], sample: bool = True) -> None:
+        """seconds=None records a failure; probes pass sample=False to keep them out of the p95."""
+        with self._lock:
+            if seconds is None:
+                ep.failures += 1
+                backoff = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (ep.failures - 1))
+                ep.retry_at = time.monotonic() + backoff
+                return
+            if ep.failures:
+                logging.info(f"Endpoint {ep.url} is back")
+            ep.failures = 0
+            if sample:
+                ep.samples.append(seconds)
+            ep.ewma = seconds if ep.ewma is None else 0.8 * ep.ewma + 0.2 * seconds
+
+    def probe(self, wait_for: bool = False) -> None:
+        """Time the anonymous Ping endpoint on every endpoint (in the background)."""
+        self._next_probe = time.monotonic() + PROBE_EVERY
+        futures = [self._pool().submit(self._probe_one, ep) for ep in self.endpoints]
+        if wait_for:
+            wait(futures, timeout=self.timeout)
+
+    def _probe_one(self, ep: Endpoint) -> None:
+        started = time.perf_counter()
+        try:
+            requests.get(ep.url + PING_PATH, timeout=min(5.0, self.timeout)).raise_for_status()
+        except Exception:
+            self.record(ep, None)
+            return
+        self.record(ep, time.perf_counter() - started, sample=False)
+
+    def _timed(self, ep: Endpoint, fn: Callable[[str], T]) -> T:
+        started = time.perf_counter()
+        try:
+            result = fn(ep.url)
+        except Exception:
+            self.record(ep, None)
+            raise
+        self.record(ep, time.perf_counter() - started)
+        return result
+
+    def call(self, fn: Callable[[str], T]) -> T:
+        """Run fn(base_url) on the best endpoint, failing over down the ranking.
+
+        fn should raise on transport errors and 5xx so the next endpoint is tried.
+        """
+        if len(self.endpoints) > 1 and time.monotonic() >= self._next_probe:
+            self.probe()
+        ranked = self.ranked()
+        last_error: Optional[BaseException] = None
+        # Endpoints a hedged first attempt used; the failover skips them
+        tried: List[Endpoint] = []
+        if self.hedge and len(ranked) > 1:
+            try:
+                return self._hedged(ranked[0], ranked[1], fn, tried)
+            except Exception as e:
+                last_error = e
+                logging.warning(f"Endpoint {' and '.join(ep.url for ep in tried)} failed ({e}); trying the next one")
+        for ep in ranked[len(tried):]:
+            try:
+                return self._timed(ep, fn)
+            except Exception as e:
+                last_error = e
+                logging.warning(f"Endpoint {ep.url} failed ({e}); trying the next one")
+        assert last_error is not None
+        raise last_error
+
+    def _hedged(self, first: Endpoint, second: Endpoint, fn: Callable[[str], T], tried: List[Endpoint]) -> T:
+        tried.append(first)
+        threshold = first.p95()
+        primary: Future = self._pool().submit(self._timed, first, fn)
+        if threshold is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        # Slower than this endpoint's p95: race a copy on the runner-up
+        self.hedged += 1
+        tried.append(second)
+        backup: Future = self._pool().submit(self._timed, second, fn)
+        racers = {primary: first, backup: second}
+        pending = set(racers)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    # The other request can't be recalled; _timed records its
+                    # latency or failure against its endpoint when it ends
+                    for other, ep in racers.items():
+                        if other is not f:
+                            other.add_done_callback(lambda lf, ep=ep: self._lost(ep, lf))
+                    return f.result()
+                error = f.exception()
+        assert error is not None
+        raise error
+
+    def _lost(self, ep: Endpoint, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            logging.warning(f"Endpoint {ep.url} failed in a hedged race the other endpoint won: {error}")
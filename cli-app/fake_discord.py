@@ -0,0 +1,317 @@
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Tuple
+
+# A stand-in for the Discord client's RPC endpoint: a Unix socket named
+# discord-ipc-0 that speaks the same framing as the real one (little-endian
+# opcode + length header, JSON body). It answers the handshake with READY and
+# acknowledges SET_ACTIVITY, recording every activity it receives. It can also
+# misbehave on purpose: answer slowly, rate-limit SET_ACTIVITY like Discord
+# does, or drop the connection mid-update as a Discord crash would.
+#
+#   server = FakeDiscord(runtime_dir, delay=0.02, throttle=(5, 20.0))
+#   server.start()      # then point XDG_RUNTIME_DIR at runtime_dir
+#   ...
+#   server.stop(); server.received
+#
+# Used by ipc_load.py; Linux/macOS only (no named pipes).
+
+OP_HANDSHAKE = 0
+OP_FRAME = 1
+OP_CLOSE = 2
+OP_PING = 3
+OP_PONG = 4
+
+_HEADER = struct.Struct("<II")
+
+# What Discord itself allows before it starts holding SET_ACTIVITY back
+DISCORD_THROTTLE = (5, 20.0)
+
+
+class ServerError(Exception):
+    """Discord answered with evt ERROR; the pipe is still usable."""
+
+
+def read_frame(sock: socket.socket) -> Tuple[int, dict]:
+    header = _recv_exact(sock, _HEADER.size)
+    op, length = _HEADER.unpack(header)
+    body = _recv_exact(sock, length) if length else b"{}"
+    return op, json.loads(body.decode("utf-8"))
+
+
+def write_frame(sock: socket.socket, op: int, body: dict) -> None:
+    data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(op, len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise ConnectionError("pipe closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+@dataclass
+class Received:
+    """One SET_ACTIVITY as the server saw it; activity is None for a clear."""
+
+    at: float
+    connection: int
+    client_id: str
+    nonce: Optional[str]
+    activity: Optional[dict]
+    outcome: str  # ok | throttled | dropped
+
+
+class FakeDiscord:
+    """Threaded fake of Discord's IPC socket for offline tests."""
+
+    def __init__(
+        self,
+        runtime_dir: str,
+        delay: float = 0.0,
+        throttle: Optional[Tuple[int, float]] = None,
+        throttle_wait: bool = False,
+        drop_every: int = 0,
+        slot: int = 0,
+    ) -> None:
+        self.path = os.path.join(runtime_dir, f"discord-ipc-{slot}")
+        self.delay = delay
+        # (updates, seconds) across connections, so reconnecting doesn't reset
+        # it; throttle_wait holds the reply until the window has room instead
+        # of answering with an error
+        self.throttle = throttle
+        self.throttle_wait = throttle_wait
+        # Close the pipe instead of answering every Nth SET_ACTIVITY
+        self.drop_every = drop_every
+        self.received: List[Received] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._sent: Deque[float] = deque()
+
+    def start(self) -> "FakeDiscord":
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(8)
+        self._sock.settimeout(0.2)
+        t = threading.Thread(target=self._accept_loop, name="fake-discord", daemon=True)
+        t.start()
+        self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        """Stop listening and remove the socket, as when Discord quits."""
+        self._stopping.set()
+        for t in self._threads:
+            t.join(timeout=2)
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self) -> "FakeDiscord":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def activities(self) -> List[Optional[dict]]:
+        """Activities Discord would be showing, in order (acknowledged ones only)."""
+        with self._lock:
+            return [r.activity for r in self.received if r.outcome == "ok"]
+
+    def apps(self) -> List[str]:
+        """Client id each acknowledged activity (not clears) was set for, in order."""
+        with self._lock:
+            return [r.client_id for r in self.received if r.outcome == "ok" and r.activity is not None]
+
+    def _accept_loop(self) -> None:
+        assert self._sock is not None
+        while not self._stopping.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with self._lock:
+                self.connections += 1
+                number = self.connections
+            t = threading.Thread(target=self._serve, args=(conn, number), name=f"fake-discord-{number}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _serve(self, conn: socket.socket, number: int) -> None:
+        updates = 0
+        conn.settimeout(5.0)
+        with conn:
+            try:
+                client_id = self._handshake(conn)
+                if client_id is None:
+                    return
+                while not self._stopping.is_set():
+                    # Wait in select so stop() is noticed; a frame, once
+                    # started, is read whole
+                    if not select.select([conn], [], [], 0.2)[0]:
+                        continue
+                    op, body = read_frame(conn)
+                    if op == OP_CLOSE:
+                        return
+                    if op == OP_PING:
+                        write_frame(conn, OP_PONG, body)
+                        continue
+                    if body.get("cmd") != "SET_ACTIVITY":
+                        write_frame(conn, OP_FRAME, self._error(body, 4000, f"unsupported command {body.get('cmd')}"))
+                        continue
+                    updates += 1
+                    if not self._set_activity(conn, number, client_id, body, updates):
+                        return
+            except (ConnectionError, OSError, ValueError):
+                return
+
+    def _handshake(self, conn: socket.socket) -> Optional[str]:
+        op, body = read_frame(conn)
+        if op != OP_HANDSHAKE or not body.get("client_id"):
+            write_frame(conn, OP_CLOSE, {"code": 4000, "message": "Invalid Client ID"})
+            return None
+        write_frame(conn, OP_FRAME, {
+            "cmd": "DISPATCH",
+            "evt": "READY",
+            "data": {
+                "v": 1,
+                "config": {"cdn_host": "cdn.discordapp.com", "api_endpoint": "//discord.com/api", "environment": "production"},
+                "user": {"id": "0", "username": "fake", "discriminator": "0", "avatar": None},
+            },
+            "nonce": None,
+        })
+        return str(body["client_id"])
+
+    def _set_activity(self, conn: socket.socket, number: int, client_id: str, body: dict, updates: int) -> bool:
+        received_at = time.monotonic()
+        nonce = body.get("nonce")
+        activity = (body.get("args") or {}).get("activity")
+
+        if self.drop_every and updates % self.drop_every == 0:
+            self._record(received_at, number, client_id, nonce, activity, "dropped")
+            return False
+
+        if self.throttle is not None:
+            wait = self._throttle_wait(received_at)
+            if wait is None:
+                self._record(received_at, number, client_id, nonce, activity, "throttled")
+                write_frame(conn, OP_FRAME, self._error(body, 5000, "You are being rate limited"))
+                return True
+            if wait:
+                time.sleep(wait)
+
+        if self.delay:
+            time.sleep(self.delay)
+        self._record(received_at, number, client_id, nonce, activity, "ok")
+        write_frame(conn, OP_FRAME, {"cmd": "SET_ACTIVITY", "evt": None, "data": activity, "nonce": nonce})
+        return True
+
+    def _throttle_wait(self, now: float) -> Optional[float]:
+        # Seconds to hold this update back, or None to reject it
+        assert self.throttle is not None
+        limit, window = self.throttle
+        with self._lock:
+            sent = self._sent
+            while sent and now - sent[0] >= window:
+                sent.popleft()
+            if len(sent) < limit:
+                sent.append(now)
+                return 0.0
+            if not self.throttle_wait:
+                return None
+            # Slot frees when the oldest of the last `limit` updates ages out
+            at = sent[-limit] + window
+            sent.append(at)
+            return at - now
+
+    def _record(self, at: float, number: int, client_id: str, nonce: Optional[str], activity: Optional[dict],
+                outcome: str) -> None:
+        with self._lock:
+            self.received.append(Received(at, number, client_id, nonce, activity, outcome))
+
+    @staticmethod
+    def _error(body: dict, code: int, message: str) -> dict:
+        return {"cmd": body.get("cmd"), "evt": "ERROR", "data": {"code": code, "message": message}, "nonce": body.get("nonce")}
+
+
+class RawPresence:
+    """Bare IPC client with Presence's connect/update/clear/close surface.
+
+    For exercising the fake server where pypresence isn't installed; it builds
+    the same SET_ACTIVITY shape but none of pypresence's validation.
+    """
+
+    def __init__(self, client_id: str, path: str) -> None:
+        self.client_id = client_id
+        self.path = path
+        self._sock: Optional[socket.socket] = None
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(30.0)
+        sock.connect(self.path)
+        write_frame(sock, OP_HANDSHAKE, {"v": 1, "client_id": self.client_id})
+        _, ready = read_frame(sock)
+        if ready.get("evt") != "READY":
+            sock.close()
+            raise ConnectionError(f"handshake failed: {ready}")
+        self._sock = sock
+
+    def _send(self, activity: Optional[dict]) -> dict:
+        if self._sock is None:
+            raise ConnectionError("not connected")
+        nonce = str(uuid.uuid4())
+        write_frame(self._sock, OP_FRAME, {"cmd": "SET_ACTIVITY", "args": {"pid": os.getpid(), "activity": activity}, "nonce": nonce})
+        _, reply = read_frame(self._sock)
+        if reply.get("evt") == "ERROR":
+            raise ServerError(reply["data"]["message"])
+        return reply
+
+    def update(self, start=None, end=None, large_image=None, large_text=None,
+               small_image=None, small_text=None, buttons=None, **fields) -> dict:
+        activity = {k: v for k, v in fields.items() if v is not None}
+        timestamps = {k: v for k, v in (("start", start), ("end", end)) if v is not None}
+        assets = {k: v for k, v in (("large_image", large_image), ("large_text", large_text),
+                                    ("small_image", small_image), ("small_text", small_text)) if v is not None}
+        if timestamps:
+            activity["timestamps"] = timestamps
+        if assets:
+            activity["assets"] = assets
+        if buttons:
+            activity["buttons"] = buttons
+        activity["instance"] = True
+        return self._send(activity)
+
+    def clear(self) -> dict:
+        return self._send(None)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                write_frame(self._sock, OP_CLOSE, {})
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,359 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+try:
+    import requests
+except Exception:  # pragma: no cover
+    requests = None  # the Hub and the HTTP side need only the stdlib
+
+from endpoints import EndpointPool, jellyfin_urls
+from presence_diff import DEFAULT_TOLERANCE, PresenceDiff
+from presence_state import PresenceState
+from wire import PresenceCache, accept_header, decode_body, fields_param
+
+# LAN presence gateway. One process polls the plugin's Presence/All (every
+# user's presence in one request, admin API key) and clients on the LAN
+# subscribe to their user over a Server-Sent Events stream:
+#
+#   python gateway.py --listen 0.0.0.0:8790      # on one machine, gateway_token set
+#   "gateway_url": "http://gateway-host:8790"    # in each client's config.json
+#
+# Jellyfin sees one poller instead of one per seat, and a change reaches the
+# subscribers as soon as the gateway's poll sees it. Only meaningful changes
+# are pushed (PresenceDiff), so clock drift costs no traffic either.
+#
+#   GET /presence/<user>          current presence (JSON)
+#   GET /presence/<user>/stream   text/event-stream; one event per change
+#   GET /health                   users, subscribers, polls
+#
+# It serves every user's playback, so it listens on loopback unless told
+# otherwise and won't listen anywhere else without a gateway_token.
+
+DEFAULT_LISTEN = "127.0.0.1:8790"
+HEARTBEAT = 15.0
+ALL_PATH = "/Plugins/DiscordRpc/Presence/All"
+_IDLE = {"active": False}
+
+
+class Hub:
+    """Latest presence per user (lower-cased name) with change notification."""
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE) -> None:
+        self.tolerance = tolerance
+        # One per user: each keeps its own suppressed count
+        self._differs: Dict[str, PresenceDiff] = {}
+        self._users: Dict[str, Tuple[int, PresenceState, bytes]] = {}
+        self._seq = 0
+        # Event ids are "<epoch>.<seq>" so a restarted gateway isn't mistaken
+        # for one that has nothing newer than the client's Last-Event-ID
+        self.epoch = str(int(time.time()))
+        self._changed = threading.Condition()
+        self.subscribers = 0
+        self.polls = 0
+
+    def publish(self, bodies: Dict[str, dict]) -> int:
+        """Replace the whole household's state; returns how many users changed."""
+        changed = 0
+        with self._changed:
+            self.polls += 1
+            for name in set(self._users) | set(bodies):
+                body = bodies.get(name, _IDLE)
+                state = PresenceState.from_mapping(body)
+                previous = self._users.get(name)
+                differ = self._differs.get(name)
+                if differ is None:
+                    differ = self._differs[name] = PresenceDiff(self.tolerance)
+                if previous is not None and not differ.should_publish(state, previous[1]):
+                    continue
+                if previous is None and not state.active:
+                    continue
+                self._seq += 1
+                self._users[name] = (self._seq, state, json.dumps(body, separators=(",", ":")).encode("utf-8"))
+                changed += 1
+            if changed:
+                self._changed.notify_all()
+        return changed
+
+    def unchanged(self) -> None:
+        """A poll the server answered with 304: nothing to decode or compare."""
+        with self._changed:
+            self.polls += 1
+
+    def suppressed(self, name: str) -> int:
+        """Drift-only updates not pushed to name's subscribers."""
+        differ = self._differs.get(name.lower())
+        return differ.suppressed if differ is not None else 0
+
+    def get(self, name: str) -> Tuple[int, bytes]:
+        entry = self._users.get(name.lower())
+        if entry is None:
+            return 0, b'{"active":false}'
+        return entry[0], entry[2]
+
+    def wait(self, name: str, after: int, timeout: float) -> Tuple[int, bytes]:
+        """Block until name's presence is newer than seq `after` (or timeout)."""
+        key = name.lower()
+        with self._changed:
+            self._changed.wait_for(lambda: self._users.get(key, (0,))[0] > after, timeout)
+        return self.get(key)
+
+    def subscribed(self, delta: int) -> None:
+        with self._changed:
+            self.subscribers += delta
+
+    def health(self) -> dict:
+        return {"ok": True, "users": len(self._users), "subscribers": self.subscribers, "polls": self.polls}
+
+
+def poll_forever(hub: Hub, endpoints: EndpointPool, api_key: str, interval: float,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+    headers = {"X-Emby-Token": api_key, "Accept": accept_header(), "User-Agent": "theater.cx-rpc-gateway/1.0"}
+    params = {"fields": fields_param()}
+    cache = PresenceCache()
+
+    def fetch(base_url: str):
+        r = requests.get(base_url + ALL_PATH, headers={**headers, **cache.headers()}, params=params, timeout=(3.05, 10))
+        if r.status_code >= 500:
+            r.raise_for_status()
+        return r
+
+    while True:
+        started = time.monotonic()
+        try:
+            r = endpoints.call(fetch)
+            if r.status_code == 304:
+                # Same bytes as last time: every user's presence is unchanged
+                cache.not_modified()
+                hub.unchanged()
+                bodies = None
+            elif r.status_code in (401, 403):
+                logging.error(f"Presence/All answered {r.status_code}: the gateway needs an admin API key")
+                bodies = None
+            else:
+                r.raise_for_status()
+                decoded = decode_body(r.content, r.headers.get("Content-Type"))
+                bodies = {str(u.get("user_name") or "").lower(): u for u in decoded.get("users") or () if u.get("user_name")}
+                cache.store(r.headers.get("ETag"), bodies)
+            if bodies is not None:
+                changed = hub.publish(bodies)
+                if changed:
+                    logging.info(f"{changed} user(s) changed; {hub.subscribers} subscriber(s)")
+        except Exception as e:
+            logging.warning(f"Presence/All poll failed: {e}")
+        sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hub: Hub
+    token: Optional[str] = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args) -> None:
+        logging.debug("%s " + fmt, self.address_string(), *args)
+
+    def _authorized(self, query: dict) -> bool:
+        if not self.token:
+            return True
+        # The header keeps the token out of proxy and access logs; ?token= is for
+        # clients that can't set headers
+        given = self.headers.get("Authorization", "").removeprefix("Bearer ").strip() or (query.get("token") or [""])[0]
+        return hmac.compare_digest(given.encode("utf-8"), self.token.encode("utf-8"))
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        segments = [s for s in parts.path.split("/") if s]
+        if segments == ["health"]:
+            self._send(200, json.dumps(self.hub.health()).encode("utf-8"))
+            return
+        if not self._authorized(query):
+            self._send(401, b'{"error":"unauthorized"}')
+            return
+        if len(segments) == 2 and segments[0] == "presence":
+            self._send(200, self.hub.get(unquote(segments[1]))[1])
+            return
+        if len(segments) == 3 and segments[0] == "presence" and segments[2] == "stream":
+            self._stream(unquote(segments[1]))
+            return
+        self._send(404, b'{"error":"not found"}')
+
+    def _stream(self, user: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # One chunk per event, so a client reading chunks as they arrive gets
+        # each event at once instead of waiting for a read buffer to fill
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        epoch, _, seq = (self.headers.get("Last-Event-ID") or "").partition(".")
+        after = int(seq) if epoch == self.hub.epoch and seq.isdigit() else -1
+        self.hub.subscribed(1)
+        try:
+            while True:
+                seq, body = self.hub.wait(user, after, HEARTBEAT)
+                if seq > after:
+                    event = b"id: %s.%d\ndata: %s\n\n" % (self.hub.epoch.encode(), seq, body)
+                    after = seq
+                else:
+                    event = b": ping\n\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+        except OSError:
+            pass  # subscriber went away
+        finally:
+            self.hub.subscribed(-1)
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(hub: Hub, listen: str, token: Optional[str] = None) -> ThreadingHTTPServer:
+    host, _, port = listen.rpartition(":")
+    if not token and not is_loopback(host or "0.0.0.0"):
+        raise ValueError(f"refusing to serve every user's presence on {listen} without a gateway_token")
+    handler = type("Handler", (_Handler,), {"hub": hub, "token": token})
+    server = ThreadingHTTPServer((host.strip("[]") or "0.0.0.0", int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+
+class GatewayFeed:
+    """Client side: follows one user's stream from a gateway in the background."""
+
+    def __init__(self, gateway_url: str, username: str, token: Optional[str] = None) -> None:
+        self.url = f"{gateway_url.rstrip('/')}/presence/{quote(username.lower())}/stream"
+        self.token = token
+        self.body: Optional[dict] = None
+        self.state: Optional[PresenceState] = None
+        self.connected = False
+        self._changed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gateway-feed", daemon=True)
+        self._thread.start()
+
+    def latest(self) -> Optional[PresenceState]:
+        """Newest presence, or None while the gateway is unreachable."""
+        self._changed.clear()
+        return self.state if self.connected else None
+
+    def latest_body(self) -> Optional[dict]:
+        self._changed.clear()
+        return self.body if self.connected else None
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to timeout; returns early (True) when a new presence arrives."""
+        return self._changed.wait(timeout)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        last_id: Optional[str] = None
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            if last_id:
+                headers["Last-Event-ID"] = last_id
+            try:
+                with requests.get(self.url, headers=headers, stream=True, timeout=(3.05, HEARTBEAT * 3)) as r:
+                    r.raise_for_status()
+                    if not self.connected:
+                        logging.info(f"Subscribed to {self.url}")
+                    self.connected = True
+                    backoff = 1.0
+                    data = []
+                    for line in r.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif line.startswith("id:"):
+                            last_id = line[3:].strip()
+                        elif not line and data:
+                            self.body = json.loads("\n".join(data))
+                            self.state = PresenceState.from_mapping(self.body)
+                            data = []
+                            self._changed.set()
+            except Exception as e:
+                logging.warning(f"Gateway stream {self.url} failed: {e}")
+            if self.connected:
+                self.connected = False
+                self._changed.set()
+            time.sleep(backoff)
+            backoff = min(30.0, backoff * 2)
+
+
+def _load_config(path: Optional[Path]) -> dict:
+    here = Path(__file__).resolve().parent
+    appdata = os.environ.get("APPDATA")
+    roaming = (Path(appdata) / "JellyfinDiscordRPC" if appdata else Path.home() / ".config" / "jellyfin-discord-rpc") / "config.json"
+    for p in ([path] if path else [here / "config.json", roaming]):
+        if p.exists():
+            with p.open("r", encoding="utf-8") as f:
+                return json.load(f)
+    return {
+        "jellyfin_url": os.environ.get("JELLYFIN_URL"),
+        "api_key": os.environ.get("JELLYFIN_API_KEY"),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Poll Jellyfin once for every user and push presences to LAN clients")
+    ap.add_argument("--config", type=Path, help="config.json with jellyfin_url and an admin api_key")
+    ap.add_argument("--listen", help=f"host:port to serve on (default gateway_listen or {DEFAULT_LISTEN})")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    cfg = _load_config(args.config)
+    if requests is None:
+        print("requests is not installed (pip install -r requirements.txt)")
+        sys.exit(1)
+    if not cfg.get("jellyfin_url") or not cfg.get("api_key"):
+        print("jellyfin_url and an admin api_key are required")
+        sys.exit(1)
+
+    hub = Hub(float(cfg.get("timestamp_tolerance", DEFAULT_TOLERANCE)))
+    endpoints = EndpointPool(jellyfin_urls(cfg), hedge=bool(cfg.get("hedge_requests", False)))
+    interval = float(cfg.get("interval", 5))
+    listen = args.listen or cfg.get("gateway_listen") or DEFAULT_LISTEN
+    try:
+        server = serve(hub, listen, cfg.get("gateway_token") or None)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    threading.Thread(target=poll_forever, args=(hub, endpoints, str(cfg["api_key"]), interval),
+                     name="poller", daemon=True).start()
+    logging.info(f"Gateway on http://{listen}, polling {ALL_PATH} every {interval:g}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
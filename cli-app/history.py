@@ -0,0 +1,250 @@
+import argparse
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from presence_state import PresenceState
+
+# Local watch history. The clients report each poll's presence to
+# WatchHistory.observe(); it only reacts to transitions (new item, pause,
+# resume, stop) and hands them to a writer thread, which commits them in
+# batched transactions to a SQLite database in WAL mode. One row per span
+# of continuous playback, indexed by time, series and item, so the queries
+# below stay in the milliseconds after years of history:
+#
+#   python history.py top-series --days 365
+#   python history.py weekly --weeks 12
+#   python history.py recent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+    id INTEGER PRIMARY KEY,
+    item_id TEXT,
+    item_type TEXT,
+    series_id TEXT,
+    series_name TEXT,
+    title TEXT,
+    started REAL NOT NULL,
+    ended REAL NOT NULL,
+    end_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS spans_started ON spans (started, ended);
+CREATE INDEX IF NOT EXISTS spans_series ON spans (series_id, started, ended);
+CREATE INDEX IF NOT EXISTS spans_item ON spans (item_id, started);
+"""
+
+# While a span is open the writer wakes at least this often and moves its end
+# time to the last poll that saw it playing, so a crash loses at most this
+# much playback. With nothing open it sleeps until the next transition.
+FLUSH_INTERVAL = 30.0
+# A longer silence between polls (suspend, a stalled client) ends the open
+# span at the last poll rather than stretching it over the gap
+MAX_GAP = 120.0
+# Spans shorter than this (a poll that caught a skip) aren't worth a row
+MIN_SPAN = 5.0
+
+_INSERT = ("INSERT INTO spans (item_id, item_type, series_id, series_name, title, started, ended, end_reason) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def default_history_path() -> Path:
+    """history.sqlite3 next to rpc.log."""
+    appdata = os.environ.get("APPDATA")
+    if appdata:
+        return Path(appdata) / "JellyfinDiscordRPC" / "history.sqlite3"
+    return Path.home() / ".config" / "jellyfin-discord-rpc" / "history.sqlite3"
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(path), timeout=10.0, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def _span_row(state: PresenceState, started: float) -> list:
+    title = state.episode_title or state.details
+    if state.season_episode and state.series_name:
+        title = f"{state.season_episode} {title or ''}".strip()
+    return [state.item_id, state.item_type, state.series_id, state.series_name or None, title, started, started, None]
+
+
+class WatchHistory:
+    """Turns polled presences into playback spans, written off the hot path."""
+
+    def __init__(self, path: Path, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        self._item: Optional[str] = None
+        self._playing = False
+        self._last_seen = 0.0
+        self._thread = threading.Thread(target=self._run, name="history", daemon=True)
+        self._thread.start()
+
+    def observe(self, state: Optional[PresenceState], now: Optional[float] = None) -> None:
+        """Call once per poll; state None (or inactive) means nothing is playing."""
+        now = time.time() if now is None else now
+        if self._playing and now - self._last_seen > MAX_GAP:
+            self._queue.put(("close", (self._last_seen, "stop")))
+            self._item, self._playing = None, False
+        self._last_seen = now
+        active = state is not None and state.active
+        item = (state.item_id or state.details) if active else None
+        playing = active and not state.is_paused
+        if item == self._item and playing == self._playing:
+            return
+        if self._playing:
+            reason = "stop" if item is None else "pause" if item == self._item else "change"
+            self._queue.put(("close", (now, reason)))
+        if playing:
+            self._queue.put(("open", (_span_row(state, now),)))
+        self._item, self._playing = item, playing
+
+    def close(self) -> None:
+        """Close the open span and flush everything; waits for the writer."""
+        self.observe(None)
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        try:
+            db = connect(self.path)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Watch history disabled, cannot open {self.path}: {e}")
+            return
+        open_id: Optional[int] = None
+        open_row: Optional[list] = None
+        stopping = False
+        while not stopping:
+            try:
+                ops = [self._queue.get(timeout=self.flush_interval if open_id is not None else None)]
+            except queue.Empty:
+                ops = []
+            # Everything else queued by now goes into the same transaction
+            while True:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                db.execute("BEGIN")
+                for op in ops:
+                    if op is None:
+                        stopping = True
+                        continue
+                    kind, args = op
+                    if kind == "open":
+                        open_row = args[0]
+                        open_id = db.execute(_INSERT, open_row).lastrowid
+                    elif kind == "close" and open_id is not None:
+                        ended, reason = args
+                        if ended - open_row[5] < MIN_SPAN:
+                            db.execute("DELETE FROM spans WHERE id = ?", (open_id,))
+                        else:
+                            db.execute("UPDATE spans SET ended = ?, end_reason = ? WHERE id = ?", (ended, reason, open_id))
+                        open_id = open_row = None
+                if open_id is not None:
+                    db.execute("UPDATE spans SET ended = ? WHERE id = ?", (max(open_row[5], self._last_seen), open_id))
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logging.warning(f"Watch history write failed: {e}")
+                try:
+                    db.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+        db.close()
+
+
+# Queries
+
+def top_series(db: sqlite3.Connection, since: float, limit: int) -> List[tuple]:
+    return db.execute(
+        "SELECT COALESCE(series_name, title) AS name, SUM(ended - started) / 3600.0 AS hours, COUNT(DISTINCT item_id) "
+        "FROM spans WHERE started >= ? GROUP BY COALESCE(series_id, item_id) ORDER BY hours DESC LIMIT ?",
+        (since, limit),
+    ).fetchall()
+
+
+# 1970-01-01 was a Thursday; shifting by three days makes buckets start on Monday
+_WEEK = 7 * 86400
+_MONDAY = 3 * 86400
+# Every UTC offset in use is a whole number of quarter hours
+_QUARTER = 900
+
+
+def weekly_hours(db: sqlite3.Connection, since: float) -> List[tuple]:
+    """(monday as YYYY-MM-DD, hours) per week, local time."""
+    # SQLite sums per quarter hour instead of a strftime(..., 'localtime') per
+    # row; each quarter then gets its own UTC offset, so weeks on both sides
+    # of a DST change start at local midnight
+    totals: Dict[int, float] = {}
+    rows = db.execute(
+        "SELECT CAST(started / ? AS INTEGER) AS quarter, SUM(ended - started) "
+        "FROM spans WHERE started >= ? GROUP BY quarter",
+        (_QUARTER, since),
+    )
+    for quarter, seconds in rows:
+        start = quarter * _QUARTER
+        week = (start + time.localtime(start).tm_gmtoff + _MONDAY) // _WEEK
+        totals[week] = totals.get(week, 0.0) + seconds
+    return [(time.strftime("%Y-%m-%d", time.gmtime(week * _WEEK - _MONDAY)), totals[week] / 3600.0)
+            for week in sorted(totals)]
+
+
+def recent(db: sqlite3.Connection, limit: int) -> List[tuple]:
+    return db.execute(
+        "SELECT started, ended, COALESCE(series_name, ''), title, end_reason FROM spans ORDER BY started DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Query the Jellyfin RPC watch history")
+    ap.add_argument("--db", type=Path, default=None, help="history database (default: next to rpc.log)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("top-series", help="most watched series and movies")
+    p.add_argument("--days", type=float, default=365.0)
+    p.add_argument("--limit", type=int, default=10)
+    p = sub.add_parser("weekly", help="hours watched per week")
+    p.add_argument("--weeks", type=int, default=12)
+    p = sub.add_parser("recent", help="latest playback spans")
+    p.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+
+    path = args.db or default_history_path()
+    if not path.exists():
+        print(f"No history at {path}")
+        sys.exit(1)
+    db = connect(path)
+    started = time.perf_counter()
+    if args.command == "top-series":
+        rows = top_series(db, time.time() - args.days * 86400, args.limit)
+        took = time.perf_counter() - started
+        for name, hours, items in rows:
+            print(f"{hours:8.1f} h  {items:>4} item(s)  {name}")
+    elif args.command == "weekly":
+        rows = weekly_hours(db, time.time() - args.weeks * 7 * 86400)
+        took = time.perf_counter() - started
+        for week, hours in rows:
+            print(f"{week}  {hours:6.1f} h  {'#' * int(round(hours))}")
+    else:
+        rows = recent(db, args.limit)
+        took = time.perf_counter() - started
+        for start, end, series, title, reason in rows:
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(start))
+            name = f"{series} {title}" if series else title
+            print(f"{stamp}  {(end - start) / 60:5.0f} min  {name}  ({reason or 'open'})")
+    print(f"({len(rows)} row(s) in {took * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
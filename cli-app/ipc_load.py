@@ -0,0 +1,229 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from bench import RESPONSES, load_responses
+from discord_gate import discord_ipc_listening
+from discord_pool import PresencePool
+from artwork import ArtworkResolver
+from fake_discord import DISCORD_THROTTLE, FakeDiscord, RawPresence, ServerError
+from presence_diff import PresenceDiff
+from presence_state import PresenceState
+from publisher import Publisher
+from trace_view import percentile_line
+
+try:
+    from pypresence import Presence, ServerError as PresenceServerError  # type: ignore
+except Exception:  # pragma: no cover
+    Presence = None
+    PresenceServerError = ServerError
+
+# Drives main.py's publish path (publisher.Publisher: the publish decision,
+# the payload and the pool switch + Presence.update, reconnecting when the
+# pipe breaks) against fake_discord.py and reports update rate and latency,
+# then checks that what the server ended up showing is exactly what the
+# client published. No Discord, no Jellyfin.
+#
+#   python ipc_load.py                         500 polls, every poll published
+#   python ipc_load.py --diff --interval 5     realistic: drift suppressed
+#   python ipc_load.py --throttle --sleep 0.5  Discord's 5 updates / 20 s limit, 2 polls/s
+#   python ipc_load.py --delay 50 --drop 25    slow replies, pipe dropped every 25th update
+#   python ipc_load.py --apps --change-every 3 one Discord app per media type (PresencePool)
+#
+# Exits 1 if the published and received activities disagree.
+
+CLIENT_ID = "1199810830972170261"
+APP_IDS = {"episodes": "100000000000000001", "movies": "100000000000000002", "music": "100000000000000003"}
+CFG: dict = {"Images": {"ENABLE_IMAGES": False}}
+
+
+def playback(items: List[dict], polls: int, interval: float, change_every: int,
+             pause_every: int, seed: int) -> Iterator[PresenceState]:
+    """A viewing session as the client would poll it: new item every change_every
+    polls, a short pause every pause_every polls, server clock jitter of ±1 s."""
+    rng = random.Random(seed)
+    now = 1710000000.0
+    for i in range(polls):
+        n = i // change_every
+        item = items[n % len(items)]
+        start, end = item.get("start_timestamp"), item.get("end_timestamp")
+        runtime = end - start if start and end else 1800
+        position = 60 + (i % change_every) * interval
+        paused = bool(pause_every) and i % pause_every >= pause_every - 3
+        start = now - position + rng.uniform(-1.0, 1.0)
+        left = max(0, int(runtime - position))
+        state = f"{item.get('genres') or 'Video'} • {left // 60}:{left % 60:02d} left"
+        yield PresenceState.from_mapping(dict(
+            item,
+            active=True,
+            item_id=f"{item.get('item_id') or 'item'}-{n}",
+            state=state,
+            is_paused=paused,
+            start_timestamp=None if paused else start,
+            end_timestamp=None if paused else start + runtime,
+            small_image="pause" if paused else "play",
+            small_text="Paused" if paused else "Playing",
+        ))
+        now += interval
+
+
+def _expected(payload: dict) -> dict:
+    """payload as Presence.update() puts it into the activity."""
+    activity = {k: payload[k] for k in ("details", "state") if k in payload}
+    timestamps = {k: payload[k] for k in ("start", "end") if k in payload}
+    assets = {k: payload[k] for k in ("large_image", "large_text", "small_image", "small_text") if k in payload}
+    if timestamps:
+        activity["timestamps"] = timestamps
+    if assets:
+        activity["assets"] = assets
+    if payload.get("buttons"):
+        activity["buttons"] = payload["buttons"]
+    return activity
+
+
+def _project(activity: Optional[dict], like: dict) -> Optional[dict]:
+    # Only the keys the client set; pypresence adds instance/type of its own
+    if activity is None:
+        return None
+    return {k: activity.get(k) for k in like}
+
+
+def run(args: argparse.Namespace, runtime_dir: str) -> int:
+    server = FakeDiscord(
+        runtime_dir,
+        delay=args.delay / 1000.0,
+        throttle=DISCORD_THROTTLE if args.throttle else None,
+        throttle_wait=args.throttle_wait,
+        drop_every=args.drop,
+    )
+    os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+
+    def open_presence(client_id: str):
+        client = Presence(client_id) if args.client == "pypresence" else RawPresence(client_id, server.path)
+        client.connect()
+        return client
+
+    # Same pool main.py uses; without --apps it only ever holds CLIENT_ID
+    pool = PresencePool(open_presence, CLIENT_ID, APP_IDS if args.apps else None)
+
+    def connect():
+        rpc = pool.switch(CLIENT_ID)
+        pool.prewarm()
+        return rpc
+
+    items = load_responses(args.responses) if args.responses else RESPONSES
+    items = [d for d in items if d.get("active")]
+    if not items:
+        print("No active presences to play back")
+        return 1
+
+    # main.py's Publisher with a config that has no templates and no images
+    publisher = Publisher(CFG, pool, PresenceDiff(), ArtworkResolver(CFG, "jellyfin"))
+    published: List[dict] = []
+    expected_apps: List[str] = []
+    latencies: List[float] = []
+    errors = reconnects = 0
+    last_state: Optional[PresenceState] = None
+
+    with server:
+        rpc = connect()
+        started = time.perf_counter()
+        for data in playback(items, args.polls, args.interval, args.change_every, args.pause_every, args.seed):
+            if args.diff and not publisher.wants(data, last_state):
+                continue
+            payload = publisher.payload(data)
+            if args.sleep:
+                time.sleep(args.sleep)
+            try:
+                rpc, seconds = publisher.send(data, payload)
+            except (ServerError, PresenceServerError):
+                # Rejected (throttled); main.py keeps the pipe and retries next poll
+                errors += 1
+                continue
+            except Exception:
+                errors += 1
+                if not discord_ipc_listening():
+                    print("Fake Discord went away")
+                    return 1
+                # A dropped pipe: main.py reconnects before its next poll
+                pool.close_all()
+                rpc = connect()
+                reconnects += 1
+                continue
+            latencies.append(seconds * 1000)
+            published.append(payload)
+            expected_apps.append(pool.client_id_for(data.item_type))
+            last_state = data
+        elapsed = time.perf_counter() - started
+        pool.close_all()
+
+    outcomes = {}
+    for r in server.received:
+        outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+    print(f"{args.polls} polls, {len(published)} updates acknowledged in {elapsed:.2f} s "
+          f"({len(published) / elapsed if elapsed else 0:.1f} updates/s)")
+    print(f"suppressed {publisher.differ.suppressed}, errors {errors}, reconnects {reconnects}, "
+          f"server connections {server.connections}")
+    print("server     " + "  ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+    print(percentile_line("update", latencies))
+
+    # Correctness: the server must have shown exactly the acknowledged updates, in order
+    # Clears (switching apps) aren't published updates
+    shown = [a for a in server.activities() if a is not None]
+    mismatches = 0
+    if server.apps() != expected_apps:
+        print("MISMATCH: activities went to the wrong Discord app")
+        mismatches += 1
+    if len(shown) != len(published):
+        print(f"MISMATCH: client got {len(published)} acknowledgements, server recorded {len(shown)}")
+        mismatches += 1
+    for i, (payload, activity) in enumerate(zip(published, shown)):
+        want = _expected(payload)
+        got = _project(activity, want)
+        if got != want:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH at update {i}: sent {want}, server has {got}")
+    if mismatches:
+        return 1
+    print("activities match")
+    return 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load-test the Discord publish path against a fake IPC server")
+    ap.add_argument("--polls", type=int, default=500, help="polls to simulate")
+    ap.add_argument("--interval", type=float, default=5.0, help="simulated seconds between polls (no real sleeping)")
+    ap.add_argument("--sleep", type=float, default=0.0, help="real seconds to wait between polls")
+    ap.add_argument("--diff", action="store_true", help="publish only meaningful changes, as main.py does")
+    ap.add_argument("--change-every", type=int, default=20, help="polls per item")
+    ap.add_argument("--pause-every", type=int, default=0, help="pause for 3 polls out of every N (0 = never)")
+    ap.add_argument("--delay", type=float, default=0.0, help="server reply delay in ms")
+    ap.add_argument("--throttle", action="store_true", help="rate-limit SET_ACTIVITY like Discord (5 per 20 s)")
+    ap.add_argument("--throttle-wait", action="store_true", help="hold throttled replies instead of answering with an error")
+    ap.add_argument("--drop", type=int, default=0, help="drop the pipe on every Nth update of a connection")
+    ap.add_argument("--apps", action="store_true", help="one Discord app per media type, as discord_client_ids does")
+    ap.add_argument("--responses", type=Path, help="recorded presence bodies (JSON array or JSON lines)")
+    ap.add_argument("--client", choices=("pypresence", "raw"), default="pypresence",
+                    help="raw uses fake_discord.RawPresence instead of pypresence")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    if sys.platform == "win32":
+        print("The fake server needs Unix sockets")
+        sys.exit(1)
+    if args.client == "pypresence" and Presence is None:
+        print("pypresence is not installed (pip install pypresence) or use --client raw")
+        sys.exit(1)
+    # Short path: AF_UNIX paths are limited to ~100 bytes
+    with tempfile.TemporaryDirectory(prefix="rpc-") as runtime_dir:
+        sys.exit(run(args, runtime_dir))
+
+
+if __name__ == "__main__":
+    main()
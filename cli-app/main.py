@@ -1,19 +1,46 @@
+import argparse
 import json
 import os
+import sys
 import time
 import random
+import signal
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
 
 import requests
-from pypresence import Presence
-from rich.console import Console
+from pypresence import Presence, ServerError
 import socket
 import platform
 import uuid
 import logging
 
-console = Console(force_terminal=True, color_system="truecolor")
+from artwork import ArtworkResolver
+from discord_gate import ConsumerGate, discord_ipc_available, discord_ipc_listening
+from discord_pool import DEFAULT_IDLE_TIMEOUT, PresencePool
+from endpoints import EndpointPool, jellyfin_urls
+from poll_trace import DEFAULT_SIZE as TRACE_SIZE, TraceRing, default_dump_path
+from presence_diff import DEFAULT_TOLERANCE, PresenceDiff
+from presence_state import PresenceState
+from publisher import Publisher
+from warm_start import DEFAULT_MAX_AGE, WarmStart
+from wire import PresenceCache, accept_header, decode_presence, fields_param
+
+# Optional subsystems (gateway: http.server, history: sqlite3, status file:
+# mmap) are imported where their config is checked, so a --daemon that
+# doesn't use them never loads them
+if TYPE_CHECKING:
+    from gateway import GatewayFeed
+
+# --daemon never touches a terminal, so it skips rich (and its import graph)
+# altogether; decided at import time because console is module-level
+DAEMON = "--daemon" in sys.argv[1:]
+if DAEMON:
+    from daemon import Daemon, QuietConsole
+    console = QuietConsole()
+else:
+    from rich.console import Console
+    console = Console(force_terminal=True, color_system="truecolor")
 
 _ASCII_FONT = {}
 
@@ -21,12 +48,16 @@ def _divider() -> None:
     console.print("[dim]────────────────────────────────────────────────────────────────────────[/dim]")
 
 def _clear_screen() -> None:
+    if DAEMON:
+        return
     try:
         os.system('cls' if os.name == 'nt' else 'clear')
     except Exception:
         pass
 
 def _draw_screen(title_text: str, state_text: str, username: str) -> None:
+    if DAEMON:
+        return
     _clear_screen()
     subtitle = "[bold cyan]theater.cx rpc[/bold cyan]" + (f" [dim]• user: {username}[/dim]" if username else "")
     console.print(subtitle)
@@ -38,11 +69,23 @@ def _draw_screen(title_text: str, state_text: str, username: str) -> None:
             if ln:
                 console.print(f"[bright_black]{ln}[/bright_black]")
 
+def _plain_sleep(seconds: float, wait: Optional[Callable[[float], bool]] = None) -> bool:
+    """Daemon.sleep's signature without the daemon: wait, if given, can end it early."""
+    if wait is not None:
+        return wait(max(0.0, seconds))
+    time.sleep(max(0.0, seconds))
+    return False
+
+# Client modules whose records reach rpc.log; library noise is dropped
+_OWN_MODULES = ('cli-app/main.py', 'cli-app/daemon.py', 'cli-app/endpoints.py', 'cli-app/artwork.py', 'cli-app/history.py',
+                'cli-app/gateway.py', 'cli-app/discord_pool.py', 'cli-app/status_snapshot.py', 'cli-app/publisher.py')
+
+
 class _OnlyThisFile(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
         try:
             p = record.pathname.replace('\\', '/').lower()
-            return p.endswith('cli-app/main.py')
+            return p.endswith(_OWN_MODULES)
         except Exception:
             return True
 
@@ -98,6 +141,12 @@ def _config_paths() -> Tuple[Path, Path]:
     return local, roaming
 
 
+def _snapshot_path() -> Path:
+    # Next to whichever config.json is in use
+    local, roaming = _config_paths()
+    return (local if local.exists() else roaming).with_name("presence_snapshot.json")
+
+
 def load_config() -> dict:
     local, roaming = _config_paths()
     for p in (local, roaming):
@@ -143,7 +192,13 @@ def load_config() -> dict:
     return cfg
 
 
-def get_presence(base_url: str, api_key: str, username: Optional[str] = None) -> Optional[dict]:
+def get_presence(
+    endpoints: EndpointPool,
+    api_key: str,
+    username: Optional[str] = None,
+    cache: Optional[PresenceCache] = None,
+    trace: Optional[TraceRing] = None,
+) -> Optional[PresenceState]:
     device_name = socket.gethostname()
     device_id = uuid.uuid5(uuid.NAMESPACE_DNS, device_name).hex
     client_name = "theater.cx-rpc-cli"
@@ -158,33 +213,56 @@ def get_presence(base_url: str, api_key: str, username: Optional[str] = None) ->
         "X-Emby-OperatingSystem": os_name,
         "X-Emby-Authorization": f"MediaBrowser Client=\"{client_name}\", Device=\"{device_name}\", DeviceId=\"{device_id}\", Version=\"{client_version}\", Token=\"{api_key}\"",
         "Authorization": f"MediaBrowser Token=\"{api_key}\"",
-        "Accept": "application/json",
+        "Accept": accept_header(),
         "User-Agent": f"{client_name}/{client_version}"
     }
-    url = base_url.rstrip("/") + "/Plugins/DiscordRpc/Presence/Me"
-    params = {"api_key": api_key}
+    if cache is not None:
+        headers.update(cache.headers())
+    path = "/Plugins/DiscordRpc/Presence/Me"
+    params = {"api_key": api_key, "fields": fields_param()}
     if username:
         params["username"] = username
+
+    def fetch(base_url: str) -> requests.Response:
+        r = requests.get(base_url + path, headers=headers, params=params, timeout=(3.05, 10))
+        if r.status_code >= 500:
+            r.raise_for_status()  # let the pool try the next endpoint
+        return r
+
+    if trace is not None:
+        trace.request_start()
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
+        resp = endpoints.call(fetch)
+        if trace is not None:
+            trace.response(resp.status_code, len(resp.content))
         if resp.status_code == 401:
             console.print("[red]Unauthorized: check your Jellyfin API key[/red]")
             logging.warning("Unauthorized (401) from Presence endpoint")
             return None
+        if resp.status_code == 304 and cache is not None:
+            return cache.not_modified()
         resp.raise_for_status()
-        return resp.json()
+        data = decode_presence(resp.content, resp.headers.get("Content-Type"))
+        if cache is not None:
+            cache.store(resp.headers.get("ETag"), data)
+        return data
     except Exception as e:
-        logging.error(f"Error fetching presence from {url}: {e}", exc_info=True)
+        logging.error(f"Error fetching presence from {path}: {e}", exc_info=True)
         console.print(f"[red]Error fetching presence: {e}[/red]")
         return None
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Jellyfin Discord RPC client", allow_abbrev=False)
+    parser.add_argument("--daemon", action="store_true",
+                        help="headless mode for a systemd user service: no TTY output, sd_notify readiness/watchdog, clears presence on SIGTERM")
+    args = parser.parse_args()
+
     setup_logging()
     cfg = load_config()
     logging.info("Starting Jellyfin Discord RPC client")
     logging.info(f"Server URL: {cfg.get('jellyfin_url')}")
-    jellyfin_url = cfg.get("jellyfin_url")
+    endpoints = EndpointPool(jellyfin_urls(cfg), hedge=bool(cfg.get("hedge_requests", False)))
     api_key = cfg.get("api_key")
     username = (cfg.get("username") or "").strip()
     # Use client id from config or env; require present
@@ -193,24 +271,94 @@ def main() -> None:
         console.print("[red]Missing Discord Client ID.[/red] Set discord_client_id in cli-app/config.json or DISCORD_CLIENT_ID env.")
         raise SystemExit(1)
     interval = float(cfg.get("interval", 5))
+    # With a LAN gateway (gateway.py) presences are pushed to us; Jellyfin isn't polled at all
+    gateway_url = str(cfg.get("gateway_url") or "").strip()
+    feed: "Optional[GatewayFeed]" = None
+    if gateway_url:
+        if not username:
+            console.print("[red]gateway_url needs a username to subscribe to.[/red] Set username in cli-app/config.json.")
+            raise SystemExit(1)
+        from gateway import GatewayFeed
+        feed = GatewayFeed(gateway_url, username, cfg.get("gateway_token") or None)
+        logging.info(f"Presence from gateway {gateway_url}")
+    differ = PresenceDiff(float(cfg.get("timestamp_tolerance", DEFAULT_TOLERANCE)))
+
+    # Nothing playing: the wait between polls doubles up to idle_interval_max
+    idle_max = max(interval, float(cfg.get("idle_interval_max", 30)))
+    idle_polls = 0
+
+    # Every wait goes through this one timer, so the daemon's wakeup count
+    # and watchdog see all of them
+    daemon = Daemon() if args.daemon else None
+    sleep = daemon.sleep if daemon else _plain_sleep
+
+    def wait_next(seconds: float) -> None:
+        # With a gateway, a pushed change ends the wait early
+        sleep(seconds, feed.wait if feed is not None else None)
+    if daemon:
+        daemon.install_signal_handlers()
+        # Ready means the service is up; Discord may well not be running yet
+        daemon.ready()
+
+    # Jellyfin is only polled while Discord is there to show the result. The
+    # socket check is a stat; the stricter connect check is only used while
+    # waiting, so a stale socket file left by a crash doesn't count.
+    gate = ConsumerGate(discord_ipc_available, confirm=discord_ipc_listening,
+                        retry=float(cfg.get("discord_check_interval", 5)),
+                        max_retry=float(cfg.get("discord_check_max", 30)))
+
+    def open_presence(client_id: str) -> Presence:
+        client = Presence(client_id)
+        client.connect()
+        return client
+
+    # One connection per Discord app (discord_client_ids maps episodes/movies/
+    # music to their own app); rpc is always the one showing the activity
+    pool = PresencePool(open_presence, discord_client_id, cfg.get("discord_client_ids"),
+                        idle_timeout=float(cfg.get("discord_idle_timeout", DEFAULT_IDLE_TIMEOUT)))
+
+    def connect_discord() -> Presence:
+        while True:
+            gate.wait(sleep)
+            try:
+                client = pool.switch(discord_client_id)
+                pool.prewarm()
+                return client
+            except Exception as e:
+                logging.error(f"Failed to connect to Discord RPC: {e}", exc_info=True)
+                console.print(f"[red]Failed to connect to Discord RPC: {e}[/red]")
+                sleep(gate.retry)
 
-    rpc = Presence(discord_client_id)
-    try:
-        rpc.connect()
-    except Exception as e:
-        logging.error(f"Failed to connect to Discord RPC: {e}", exc_info=True)
-        console.print(f"[red]Failed to connect to Discord RPC: {e}[/red]")
-        raise SystemExit(1)
+    if not gate.available():
+        console.print("[yellow]Waiting for Discord to start...[/yellow]")
+        logging.info("Discord is not running; waiting before polling Jellyfin")
+    rpc = connect_discord()
+    rpc_broken = False
 
     # Moved the connected message after the initial clear/header to avoid wiping it
 
-    last_payload = None
+    last_state: Optional[PresenceState] = None
+    # details/state as rendered into last_state's Discord payload
+    shown: Tuple[Optional[str], Optional[str]] = (None, None)
     paused_since: float | None = None
     long_pause = False
     last_content_key: Optional[str] = None
+    presence_cache = PresenceCache()
+
+    artwork = ArtworkResolver(cfg, str(cfg.get("default_image_asset_key") or "jellyfin"))
+
+    def jellyfin_json(url: str, params: dict) -> dict:
+        r = requests.get(url, headers={"X-Emby-Token": api_key}, params=params, timeout=(3.05, 10))
+        r.raise_for_status()
+        return r.json()
+
+    # Publish decision, payload and Discord update (publisher.py, shared with ipc_load.py)
+    publisher = Publisher(cfg, pool, differ, artwork)
 
     # Helpers for nicer TTY output
     def set_title(title: str) -> None:
+        if daemon:
+            return
         try:
             if os.name == 'nt':
                 os.system(f"title {title}")
@@ -223,148 +371,232 @@ def main() -> None:
     set_title("theater.cx rpc - Idle" + (f" (user: {username})" if username else ""))
     _draw_screen("Idle", "", username)
     console.print("[green]Connected to Discord RPC[/green]")
+    if daemon:
+        logging.info("Running as daemon")
     logging.info(f"Username scope: {username or '(none)'}")
 
-    # Initial small randomized delay to avoid stampeding herd when many clients start
-    time.sleep(random.uniform(0, min(2.0, interval)))
-
-    while True:
-        data = get_presence(jellyfin_url, api_key, username=username or None)
-        if not data:
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
-            continue
-
-        # Optional username scoping: if server can't resolve user from token
-        if username:
-            owner = (data.get("user_name") or "").strip().lower()
-            if owner and owner != username.lower():
-                # Skip updates that aren't for this username
-                time.sleep(interval)
-                continue
+    # Warm start: put the last published presence back before the first poll,
+    # and carry the long-pause timer over from the previous run
+    warm = WarmStart(_snapshot_path(), float(cfg.get("warm_start_max_age", DEFAULT_MAX_AGE)))
+    snap = warm.load()
+    if snap is not None:
+        paused_since = snap.paused_since
+        long_pause = paused_since is not None and time.time() - paused_since >= 180
+        if snap.state is not None and snap.state.active and not long_pause:
+            try:
+                payload = publisher.payload(snap.state)
+                rpc, _ = publisher.send(snap.state, payload)
+                last_state = snap.state
+                last_content_key = snap.content_key
+                shown = (payload.get("details") or "", payload.get("state") or "")
+                title_line = payload.get("details") or ""
+                logging.info(f"Warm start: republished {title_line}")
+                _draw_screen(title_line, payload.get("state") or "", username)
+                set_title(f"theater.cx rpc - {title_line}" if title_line else "theater.cx rpc")
+            except Exception as e:
+                logging.warning(f"Warm start republish failed: {e}")
+
+    # Play/pause/item transitions go to the local watch history (history.py)
+    history = None
+    if cfg.get("watch_history", True):
+        from history import WatchHistory, default_history_path
+        history = WatchHistory(Path(cfg["history_path"]) if cfg.get("history_path") else default_history_path())
+
+    # What's on Discord, shared with status bars and overlays (status_reader.py)
+    status = None
+    if cfg.get("status_snapshot", True):
+        from status_snapshot import open_status
+        status = open_status(cfg)
+    if status:
+        status.publish(last_state, *shown)
+
+    # Per-poll trace ring; dumped next to rpc.log on SIGUSR1 (SIGBREAK on
+    # Windows) or on a crash, and read with trace_view.py
+    trace = TraceRing(int(cfg.get("trace_size", TRACE_SIZE)))
+    trace_path = default_dump_path(os.environ.get("LOG_FILE") or _default_log_path())
+
+    def dump_trace(reason: str) -> None:
+        try:
+            count = trace.dump(trace_path)
+            logging.info(f"Dumped {count} trace records to {trace_path} ({reason})")
+        except OSError as e:
+            logging.error(f"Failed to dump trace to {trace_path}: {e}")
 
-        if not data.get("active"):
-            if last_payload is not None:
-                try:
-                    rpc.clear()
-                except Exception:
-                    pass
-                last_payload = None
-            paused_since = None
-            long_pause = False
-            content_key = "idle"
-            if content_key != last_content_key:
-                _draw_screen("Idle", "", username)
-                set_title("theater.cx rpc - Idle")
-                last_content_key = content_key
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
-            continue
-
-        payload = {
-            "details": data.get("details") or None,
-            "state": data.get("state") or None,
-            "large_image": data.get("large_image") or None,
-            "large_text": data.get("large_text") or None,
-            "small_image": data.get("small_image") or None,
-            "small_text": data.get("small_text") or None,
-            "start": int(data.get("start_timestamp")) if data.get("start_timestamp") else None,
-            "end": int(data.get("end_timestamp")) if data.get("end_timestamp") else None,
-        }
+    dump_signal = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if dump_signal is not None:
+        signal.signal(dump_signal, lambda signum, frame: dump_trace("signal"))
 
-        payload = {k: v for k, v in payload.items() if v is not None}
+    if feed is None and len(endpoints.endpoints) > 1:
+        endpoints.probe(wait_for=True)
+        logging.info("Endpoints by latency: " + ", ".join(ep.url for ep in endpoints.ranked()))
 
-        # Handle paused timing and long-pause clearing
-        if data.get("is_paused"):
-            if paused_since is None:
-                paused_since = time.time()
-            paused_elapsed = time.time() - paused_since
-            if paused_elapsed >= 180:  # 3 minutes
-                if last_payload is not None:
+    try:
+        # Initial small randomized delay to avoid stampeding herd when many clients start
+        sleep(random.uniform(0, min(2.0, interval)))
+
+        while True:
+            if rpc_broken or not gate.available():
+                # Nobody to show a presence to: stop polling Jellyfin until
+                # Discord is back, then fetch straight away
+                logging.info("Discord went away; pausing Jellyfin polling")
+                _draw_screen("Waiting for Discord", "", username)
+                set_title("theater.cx rpc - Waiting for Discord")
+                pool.close_all()
+                last_state = None
+                last_content_key = None
+                if history:
+                    history.observe(None)
+                if status:
+                    status.publish(None)
+                rpc = connect_discord()
+                rpc_broken = False
+                logging.info("Discord is back; resuming Jellyfin polling")
+                continue
+            pool.evict_idle(busy=last_state is not None)
+
+            if feed is not None:
+                trace.request_start()
+                data = feed.latest()
+                trace.response(200 if data is not None else 0, 0)
+            else:
+                data = get_presence(endpoints, api_key, username=username or None, cache=presence_cache, trace=trace)
+            if not data:
+                trace.commit("error")
+                wait_next(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+                continue
+
+            # Optional username scoping: if server can't resolve user from token
+            if username:
+                owner = (data.user_name or "").strip().lower()
+                if owner and owner != username.lower():
+                    # Skip updates that aren't for this username
+                    trace.commit("skip")
+                    wait_next(interval)
+                    continue
+
+            if not data.active:
+                decision = "skip"
+                if last_state is not None:
                     try:
                         rpc.clear()
                     except Exception:
                         pass
-                    last_payload = None
-                long_pause = True
-            else:
+                    last_state = None
+                    decision = "clear"
+                paused_since = None
                 long_pause = False
-        else:
-            paused_since = None
-            long_pause = False
-
-        # Jellyfin image handling (client-side fallback)
-        try:
-            enable_images = bool(cfg.get("Images", {}).get("ENABLE_IMAGES", False))
-            if enable_images:
-                public_url = data.get("public_cover_url")
-                cover_path = data.get("cover_image_path")
-                if public_url:
-                    logging.info(f"Using public_cover_url: {public_url}")
-                    payload["large_image"] = public_url
-                elif cover_path and cfg.get("jellyfin_url"):
-                    base = cfg.get("jellyfin_url").rstrip("/")
-                    url = base + "/" + cover_path.lstrip("/")
-                    # Add resize params if missing
-                    sep = '&' if ('?' in url) else '?'
-                    url = f"{url}{sep}quality=90&fillHeight=512&fillWidth=512"
-                    if cfg.get("include_token_in_image_url") and api_key:
-                        url += f"&X-Emby-Token={api_key}"
-                    logging.info(f"Built cover_path URL: {url}")
-                    payload["large_image"] = url
+                if history:
+                    history.observe(None)
+                content_key = "idle"
+                if content_key != last_content_key:
+                    _draw_screen("Idle", "", username)
+                    set_title("theater.cx rpc - Idle")
+                    last_content_key = content_key
+                warm.save(None, last_content_key, None)
+                if status:
+                    status.publish(None)
+                trace.commit(decision)
+                idle_delay = min(idle_max, interval * 2 ** min(idle_polls, 16))
+                idle_polls += 1
+                wait_next(idle_delay + random.uniform(0, 0.5 * max(0.1, interval)))
+                continue
+            idle_polls = 0
+
+            # Handle paused timing and long-pause clearing
+            if data.is_paused:
+                if paused_since is None:
+                    paused_since = time.time()
+                paused_elapsed = time.time() - paused_since
+                if paused_elapsed >= 180:  # 3 minutes
+                    if last_state is not None:
+                        try:
+                            rpc.clear()
+                        except Exception:
+                            pass
+                        last_state = None
+                    long_pause = True
                 else:
-                    logging.warning("No Primary image fields in presence; falling back to default asset")
+                    long_pause = False
             else:
-                logging.info("Images disabled in config; skipping artwork")
-        except Exception as e:
-            logging.error(f"Failed to build image URL for presence: {e}")
-
-        # Map optional links to Discord buttons (max 2)
-        links = data.get("links") or []
-        buttons = []
-        try:
-            for link in links:
-                label = link.get("label")
-                url = link.get("url")
-                if label and url:
-                    buttons.append({"label": str(label)[:32], "url": url})
-                    if len(buttons) == 2:
-                        break
-        except Exception:
-            buttons = []
-
-        if buttons:
-            payload["buttons"] = buttons
-
-        # Show content change once
-        content_key = str(data.get("item_id") or data.get("details") or "unknown")
-        title_line = data.get("details") or ""
-        state_line = data.get("state") or ""
-        if content_key != last_content_key:
-            logging.info(f"Now playing: {title_line} | {state_line}")
-            _draw_screen(title_line, state_line, username)
-            set_title(f"theater.cx rpc - {title_line}" if title_line else "theater.cx rpc")
-            last_content_key = content_key
-
-        if not long_pause and payload != last_payload:
-            try:
-                if "large_image" in payload:
-                    logging.info(f"Updating RPC with large_image: {payload['large_image']}")
-                else:
-                    logging.info("Updating RPC with no large_image (asset-only)")
-                rpc.update(**payload)
-                last_payload = payload
-                # Clear and redraw on every status update
+                paused_since = None
+                long_pause = False
+            if history:
+                history.observe(data)
+
+            # Check the next episode's artwork before this one ends
+            if api_key and cfg.get("Images", {}).get("ENABLE_IMAGES", False):
+                artwork.maybe_prefetch(data, endpoints, jellyfin_json)
+
+            # Only build a Discord payload when Publisher.wants it. A 304 hands
+            # back the published object itself, so the diff is an identity test.
+            payload = None
+            decision = "long-pause" if long_pause else "skip"
+            publish = 0.0
+            if not long_pause and publisher.wants(data, last_state):
+                payload = publisher.payload(data)
+
+            # Show content change once
+            content_key = str(data.item_id or data.details or "unknown")
+            title_line = (payload.get("details") if payload else data.details) or ""
+            state_line = (payload.get("state") if payload else data.state) or ""
+            if content_key != last_content_key:
+                logging.info(f"Now playing: {title_line} | {state_line} ({differ.suppressed} redundant updates suppressed so far)")
                 _draw_screen(title_line, state_line, username)
                 set_title(f"theater.cx rpc - {title_line}" if title_line else "theater.cx rpc")
-            except Exception as e:
-                logging.error(f"Failed to update Discord RPC: {e}")
-                console.print(f"[red]Failed to update RPC: {e}[/red]")
+                last_content_key = content_key
 
-        # Backoff when paused; normal faster polling when playing
-        if data.get("is_paused"):
-            pause_delay = random.uniform(30.0, 45.0)
-            time.sleep(pause_delay)
-        else:
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+            if payload is not None:
+                try:
+                    if "large_image" in payload:
+                        logging.info(f"Updating RPC with large_image: {payload['large_image']}")
+                    else:
+                        logging.info("Updating RPC with no large_image (asset-only)")
+                    rpc, publish = publisher.send(data, payload)
+                    decision = "update"
+                    last_state = data
+                    shown = (payload.get("details") or "", payload.get("state") or "")
+                    # Clear and redraw on every status update
+                    _draw_screen(title_line, state_line, username)
+                    set_title(f"theater.cx rpc - {title_line}" if title_line else "theater.cx rpc")
+                except Exception as e:
+                    decision = "error"
+                    # Discord answering with an error (e.g. rate limited) leaves the
+                    # pipe usable; anything else means it broke, so reconnect
+                    # before the next poll even if Discord itself is still running
+                    rpc_broken = not isinstance(e, ServerError)
+                    logging.error(f"Failed to update Discord RPC: {e}")
+                    console.print(f"[red]Failed to update RPC: {e}[/red]")
+
+            warm.save(last_state, last_content_key, paused_since)
+            if status:
+                status.publish(last_state, *shown)
+            trace.commit(decision, publish)
+
+            # Backoff when paused; normal faster polling when playing
+            if data.is_paused:
+                pause_delay = random.uniform(30.0, 45.0)
+                wait_next(pause_delay)
+            else:
+                wait_next(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+    except Exception:
+        logging.error("Client crashed", exc_info=True)
+        dump_trace("crash")
+        raise
+    finally:
+        if history:
+            history.close()
+        if status:
+            status.close()
+        # Reached on SIGTERM (SystemExit) or Ctrl+C; don't leave a stale activity behind
+        if daemon:
+            daemon.stopping()
+            if last_state is not None:
+                try:
+                    rpc.clear()
+                except Exception:
+                    pass
+            pool.close_all()
+            logging.info(f"Daemon stopped after {daemon.wakeups} wakeups; {daemon.report()}")
 
 
 if __name__ == "__main__":
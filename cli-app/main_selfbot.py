@@ -1,3 +1,4 @@
+import atexit
 import json
 import os
 import time
@@ -12,6 +13,18 @@ import platform
 import uuid
 import logging
 
+from discord_gate import ConsumerGate
+from endpoints import EndpointPool, jellyfin_urls, rebase_url
+from gateway import GatewayFeed
+from history import WatchHistory, default_history_path
+from presence_diff import DEFAULT_TOLERANCE, PresenceDiff
+from presence_state import PresenceState
+from status_reader import SELFBOT_STATUS_FILE
+from status_snapshot import open_status
+from templates import CompiledTemplate, compile_templates
+from warm_start import DEFAULT_MAX_AGE, WarmStart
+from wire import PresenceCache
+
 console = Console()
 
 class _OnlyThisFile(logging.Filter):
@@ -71,6 +84,12 @@ def _config_paths() -> Tuple[Path, Path]:
     return local, roaming
 
 
+def _snapshot_path() -> Path:
+    # Next to whichever config.json is in use
+    local, roaming = _config_paths()
+    return (local if local.exists() else roaming).with_name("presence_snapshot_selfbot.json")
+
+
 def load_config() -> dict:
     local, roaming = _config_paths()
     for p in (local, roaming):
@@ -116,7 +135,12 @@ def load_config() -> dict:
     return cfg
 
 
-def get_presence(base_url: str, api_key: str, username: Optional[str] = None) -> Optional[dict]:
+def get_presence(
+    endpoints: EndpointPool,
+    api_key: str,
+    username: Optional[str] = None,
+    cache: Optional[PresenceCache] = None,
+) -> Optional[dict]:
     device_name = socket.gethostname()
     device_id = uuid.uuid5(uuid.NAMESPACE_DNS, device_name).hex
     client_name = "Jellyfin-Discord-RPC-Selfbot"
@@ -134,24 +158,61 @@ def get_presence(base_url: str, api_key: str, username: Optional[str] = None) ->
         "Accept": "application/json",
         "User-Agent": f"{client_name}/{client_version}"
     }
-    url = base_url.rstrip("/") + "/Plugins/DiscordRpc/Presence/Me"
+    if cache is not None:
+        headers.update(cache.headers())
+    path = "/Plugins/DiscordRpc/Presence/Me"
     params = {"api_key": api_key}
     if username:
         params["username"] = username
+
+    def fetch(base_url: str) -> requests.Response:
+        r = requests.get(base_url + path, headers=headers, params=params, timeout=(3.05, 10))
+        if r.status_code >= 500:
+            r.raise_for_status()  # let the pool try the next endpoint
+        return r
+
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
+        resp = endpoints.call(fetch)
         if resp.status_code == 401:
             console.print("[red]Unauthorized: check your Jellyfin API key[/red]")
             logging.warning("Unauthorized (401) from Presence endpoint")
             return None
+        if resp.status_code == 304 and cache is not None:
+            return cache.not_modified()
         resp.raise_for_status()
-        return resp.json()
+        data = resp.json()
+        if cache is not None:
+            cache.store(resp.headers.get("ETag"), data)
+        return data
     except Exception as e:
-        logging.error(f"Error fetching presence from {url}: {e}", exc_info=True)
+        logging.error(f"Error fetching presence from {path}: {e}", exc_info=True)
         console.print(f"[red]Error fetching presence: {e}[/red]")
         return None
 
 
+def render_presence(data: dict, cfg: dict, details_tpl: Optional[CompiledTemplate],
+                    state_tpl: Optional[CompiledTemplate]) -> dict:
+    """data as it goes to the selfbot server: URLs rebased, templates applied.
+
+    Returns a new dict; data is left alone because it is shared (PresenceCache
+    hands it back on a 304, GatewayFeed keeps it as its body).
+    """
+    if not data.get("active"):
+        return data
+    out = dict(data)
+    # The plugin builds URLs from whichever endpoint served the request
+    for key in ("large_image", "public_cover_url"):
+        value = out.get(key)
+        if isinstance(value, str) and "://" in value:
+            out[key] = rebase_url(value, cfg)
+    # Both render from the server's text, not from each other's output
+    if details_tpl:
+        out["details"] = details_tpl.render(data)
+    if state_tpl:
+        out["state"] = state_tpl.render(data)
+    return out
+
+
 def update_discord_presence(discord_server_url: str, presence_data: dict) -> bool:
     """Send presence data to Discord selfbot server"""
     try:
@@ -203,17 +264,45 @@ def check_discord_server(discord_server_url: str) -> bool:
         return False
 
 
+def selfbot_ready(discord_server_url: str) -> bool:
+    """Quiet version of check_discord_server for the polling gate."""
+    try:
+        response = requests.get(discord_server_url.rstrip("/") + "/health", timeout=2)
+        return response.ok and bool(response.json().get("discord_ready"))
+    except Exception:
+        return False
+
+
 def main() -> None:
     setup_logging()
     cfg = load_config()
     logging.info("Starting Jellyfin Discord RPC selfbot client")
     logging.info(f"Server URL: {cfg.get('jellyfin_url')}")
     
-    jellyfin_url = cfg.get("jellyfin_url")
+    endpoints = EndpointPool(jellyfin_urls(cfg), hedge=bool(cfg.get("hedge_requests", False)))
     api_key = cfg.get("api_key")
     username = (cfg.get("username") or "").strip()
     discord_server_url = cfg.get("discord_server_url", "http://localhost:3001")
     interval = float(cfg.get("interval", 5))
+    # With a LAN gateway (gateway.py) presences are pushed to us; Jellyfin isn't polled at all
+    gateway_url = str(cfg.get("gateway_url") or "").strip()
+    feed: Optional[GatewayFeed] = None
+    if gateway_url:
+        if not username:
+            console.print("[red]gateway_url needs a username to subscribe to.[/red] Set username in cli-app/config.json.")
+            raise SystemExit(1)
+        feed = GatewayFeed(gateway_url, username, cfg.get("gateway_token") or None)
+        logging.info(f"Presence from gateway {gateway_url}")
+
+    def wait_next(seconds: float) -> None:
+        if feed is None:
+            time.sleep(seconds)
+        else:
+            # Pushed changes end the wait early; there's no poll to back off from
+            feed.wait(min(seconds, interval))
+    details_tpl, state_tpl = compile_templates(cfg)
+    templates_tick = any(t is not None and t.time_dependent for t in (details_tpl, state_tpl))
+    differ = PresenceDiff(float(cfg.get("timestamp_tolerance", DEFAULT_TOLERANCE)))
 
     # Clear console on start and print header
     try:
@@ -224,11 +313,22 @@ def main() -> None:
     header = "Jellyfin Discord RPC Selfbot" + (f" (user: {username})" if username else "")
     console.print(f"[bold cyan]{header}[/bold cyan]")
     
+    # Jellyfin is only polled while the selfbot server has Discord ready; a
+    # positive /health answer is trusted for discord_check_ttl seconds
+    gate = ConsumerGate(
+        lambda: selfbot_ready(discord_server_url),
+        ttl=float(cfg.get("discord_check_ttl", 30)),
+        retry=float(cfg.get("discord_check_interval", 5)),
+        max_retry=float(cfg.get("discord_check_max", 30)),
+    )
+
     # Check Discord server connectivity
     if not check_discord_server(discord_server_url):
         console.print("[red]Please start the Discord selfbot server first![/red]")
         console.print(f"[yellow]Run: cd discord-server && npm start[/yellow]")
-        raise SystemExit(1)
+        console.print("[yellow]Waiting for it...[/yellow]")
+        gate.wait()
+        console.print("[green]✅ Discord selfbot server is ready[/green]")
     
     logging.info(f"Username scope: {username or '(none)'}")
     logging.info(f"Discord server: {discord_server_url}")
@@ -245,18 +345,66 @@ def main() -> None:
 
     set_title("Jellyfin RPC Selfbot - Idle" + (f" (user: {username})" if username else ""))
 
-    last_payload = None
+    # Compact record of what was last posted, instead of the whole raw response
+    last_state: Optional[PresenceState] = None
     paused_since: float | None = None
     long_pause = False
     last_content_key: Optional[str] = None
+    presence_cache = PresenceCache()
+    # State of the most recent response, reused as-is when the server answers 304
+    seen_state: Optional[PresenceState] = None
+    last_data: Optional[dict] = None
+    rendered: Optional[dict] = None
+
+    # Warm start: put the last published presence back before the first poll,
+    # and carry the long-pause timer over from the previous run
+    warm = WarmStart(_snapshot_path(), float(cfg.get("warm_start_max_age", DEFAULT_MAX_AGE)))
+    snap = warm.load()
+    if snap is not None:
+        paused_since = snap.paused_since
+        long_pause = paused_since is not None and time.time() - paused_since >= 180
+        if snap.state is not None and snap.state.active and not long_pause:
+            if update_discord_presence(discord_server_url, snap.state.to_mapping()):
+                last_state = snap.state
+                last_content_key = snap.content_key
+                logging.info(f"Warm start: republished {snap.state.details or ''}")
+
+    # Play/pause/item transitions go to the local watch history (history.py)
+    history = None
+    if cfg.get("watch_history", True):
+        history = WatchHistory(Path(cfg["history_path"]) if cfg.get("history_path") else default_history_path())
+        atexit.register(history.close)
+
+    # What's on Discord, shared with status bars and overlays (status_reader.py)
+    status = open_status(cfg, SELFBOT_STATUS_FILE)
+    if status:
+        status.publish(last_state)
+        atexit.register(status.close)
 
     # Initial small randomized delay to avoid stampeding herd when many clients start
     time.sleep(random.uniform(0, min(2.0, interval)))
 
     while True:
-        data = get_presence(jellyfin_url, api_key, username=username or None)
+        if not gate.available():
+            # Nobody to show a presence to: stop polling Jellyfin until the
+            # server reports Discord ready again, then fetch straight away
+            logging.info("Discord selfbot server not ready; pausing Jellyfin polling")
+            set_title("Jellyfin RPC Selfbot - Waiting for Discord")
+            if history:
+                history.observe(None)
+            if status:
+                status.publish(None)
+            gate.wait()
+            last_state = None
+            last_content_key = None
+            logging.info("Discord selfbot server ready; resuming Jellyfin polling")
+
+        if feed is not None:
+            data = feed.latest_body()
+        else:
+            data = get_presence(endpoints, api_key, username=username or None, cache=presence_cache)
         if not data:
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+            wait_next(interval + random.uniform(0, 0.5 * max(0.1, interval)))
             continue
 
         # Optional username scoping: if server can't resolve user from token
@@ -264,21 +412,34 @@ def main() -> None:
             owner = (data.get("user_name") or "").strip().lower()
             if owner and owner != username.lower():
                 # Skip updates that aren't for this username
-                time.sleep(interval)
+                wait_next(interval)
                 continue
 
+        # 304 (or an unchanged gateway body): the same dict comes back, so
+        # reuse what it rendered to last time
+        fresh = data is not last_data or templates_tick
+        if fresh:
+            last_data = data
+            rendered = render_presence(data, cfg, details_tpl, state_tpl)
+        data = rendered
+
         if not data.get("active"):
-            if last_payload is not None:
+            if last_state is not None:
                 update_discord_presence(discord_server_url, {"active": False})
-                last_payload = None
+                last_state = None
             paused_since = None
             long_pause = False
+            if history:
+                history.observe(None)
             content_key = "idle"
             if content_key != last_content_key:
                 console.print("[dim]Idle[/dim]")
                 set_title("Jellyfin RPC Selfbot - Idle")
                 last_content_key = content_key
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+            warm.save(None, last_content_key, None)
+            if status:
+                status.publish(None)
+            wait_next(interval + random.uniform(0, 0.5 * max(0.1, interval)))
             continue
 
         # Handle paused timing and long-pause clearing
@@ -287,9 +448,9 @@ def main() -> None:
                 paused_since = time.time()
             paused_elapsed = time.time() - paused_since
             if paused_elapsed >= 180:  # 3 minutes
-                if last_payload is not None:
+                if last_state is not None:
                     update_discord_presence(discord_server_url, {"active": False})
-                    last_payload = None
+                    last_state = None
                 long_pause = True
             else:
                 long_pause = False
@@ -312,7 +473,7 @@ def main() -> None:
             type_color = "green" if media_type == "Episode" else "blue" if media_type == "Movie" else "yellow"
             console.print(f"[{type_color}]Media Type: {media_type}[/{type_color}]")
             
-            logging.info(f"Now playing ({media_type}): {title_line} | {state_line}")
+            logging.info(f"Now playing ({media_type}): {title_line} | {state_line} ({differ.suppressed} redundant updates suppressed so far)")
             if title_line:
                 console.print(f"[bold]{title_line}[/bold]")
                 set_title(f"{title_line}")
@@ -322,17 +483,28 @@ def main() -> None:
                         console.print(ln)
             last_content_key = content_key
 
-        if not long_pause and data != last_payload:
+        if fresh or seen_state is None:
+            seen_state = PresenceState.from_mapping(data)
+        if history:
+            history.observe(seen_state)
+        # Clock drift alone (timestamps, "MM:SS left") doesn't warrant a post
+        if not long_pause and (templates_tick or differ.should_publish(seen_state, last_state)):
             success = update_discord_presence(discord_server_url, data)
             if success:
-                last_payload = data
+                last_state = seen_state
+            else:
+                gate.invalidate()
+
+        warm.save(last_state, last_content_key, paused_since)
+        if status:
+            status.publish(last_state)
 
         # Backoff when paused; normal faster polling when playing
         if data.get("is_paused"):
             pause_delay = random.uniform(30.0, 45.0)
-            time.sleep(pause_delay)
+            wait_next(pause_delay)
         else:
-            time.sleep(interval + random.uniform(0, 0.5 * max(0.1, interval)))
+            wait_next(interval + random.uniform(0, 0.5 * max(0.1, interval)))
 
 
 if __name__ == "__main__":
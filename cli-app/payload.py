@@ -0,0 +1,59 @@
+from typing import List, Optional
+
+from endpoints import public_base_url, rebase_url
+from templates import CompiledTemplate
+
+# Per-poll payload construction for pypresence, split out of main.py's loop so
+# bench.py can measure it without a Discord connection.
+
+COVER_PARAMS = "quality=90&fillHeight=512&fillWidth=512"
+
+
+def build_payload(
+    data,
+    details_tpl: Optional[CompiledTemplate] = None,
+    state_tpl: Optional[CompiledTemplate] = None,
+) -> dict:
+    """Map a presence response to Presence.update() kwargs, dropping empty fields."""
+    payload = {
+        "details": data.get("details") or None,
+        "state": data.get("state") or None,
+        "large_image": data.get("large_image") or None,
+        "large_text": data.get("large_text") or None,
+        "small_image": data.get("small_image") or None,
+        "small_text": data.get("small_text") or None,
+        "start": int(data.get("start_timestamp")) if data.get("start_timestamp") else None,
+        "end": int(data.get("end_timestamp")) if data.get("end_timestamp") else None,
+    }
+    if details_tpl:
+        payload["details"] = details_tpl.render(data) or None
+    if state_tpl:
+        payload["state"] = state_tpl.render(data) or None
+
+    return {k: v for k, v in payload.items() if v is not None}
+
+
+def cover_url(data, cfg: dict) -> Optional[str]:
+    """public_cover_url if the server sent one, else a URL built from cover_image_path.
+
+    Either way the URL points at the public endpoint, not a LAN one.
+    """
+    public_url = data.get("public_cover_url")
+    if public_url:
+        return rebase_url(public_url, cfg)
+    cover_path = data.get("cover_image_path")
+    base_url = public_base_url(cfg)
+    if not cover_path or not base_url:
+        return None
+    url = base_url + "/" + cover_path.lstrip("/")
+    # Add resize params if missing
+    sep = '&' if ('?' in url) else '?'
+    url = f"{url}{sep}{COVER_PARAMS}"
+    if cfg.get("include_token_in_image_url") and cfg.get("api_key"):
+        url += f"&X-Emby-Token={cfg['api_key']}"
+    return url
+
+
+def link_buttons(data) -> List[dict]:
+    """Map presence links to Discord buttons (max 2, labels capped at 32 chars)."""
+    return [{"label": label[:32], "url": url} for label, url in data.links[:2]]
@@ -0,0 +1,102 @@
+import struct
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+# Fixed-size in-memory trace of the last N poll iterations, for answering
+# "my presence lagged" after the fact. Recording is a few attribute stores and
+# one deque append per poll; nothing is formatted or written until dump().
+# trace_view.py reads the dump.
+
+MAGIC = b"JRPT"
+VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+# request start, request end, HTTP status, body bytes, decision, publish seconds
+_RECORD = struct.Struct("<ddHIBf")
+
+DECISIONS = ("skip", "update", "clear", "long-pause", "error")
+_CODES = {name: i for i, name in enumerate(DECISIONS)}
+
+DEFAULT_SIZE = 1024
+
+
+class TraceRecord(NamedTuple):
+    start: float
+    end: float
+    status: int
+    nbytes: int
+    decision: str
+    publish: float
+
+    @property
+    def request_ms(self) -> float:
+        return max(0.0, self.end - self.start) * 1000
+
+    @property
+    def publish_ms(self) -> float:
+        return self.publish * 1000
+
+
+class TraceRing:
+    """Ring buffer of per-iteration records; the oldest fall off the end."""
+
+    __slots__ = ("_records", "_start", "_end", "_status", "_bytes")
+
+    def __init__(self, size: int = DEFAULT_SIZE) -> None:
+        self._records: deque = deque(maxlen=max(1, size))
+        self._start = 0.0
+        self._end = 0.0
+        self._status = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def request_start(self) -> None:
+        self._start = self._end = time.time()
+        self._status = 0
+        self._bytes = 0
+
+    def response(self, status: int, nbytes: int) -> None:
+        self._end = time.time()
+        self._status = status
+        self._bytes = nbytes
+
+    def commit(self, decision: str, publish: float = 0.0) -> None:
+        """Close the current iteration; publish is rpc.update's duration in seconds."""
+        self._records.append((self._start, self._end, self._status, self._bytes, _CODES[decision], publish))
+
+    def dump(self, path: Path) -> int:
+        """Write the buffer to path (atomically); returns the number of records."""
+        records = list(self._records)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(records)))
+            pack = _RECORD.pack
+            for rec in records:
+                f.write(pack(*rec))
+        tmp.replace(path)
+        return len(records)
+
+
+def read_dump(path: Path) -> List[TraceRecord]:
+    with path.open("rb") as f:
+        data = f.read()
+    magic, version, count = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a poll trace dump")
+    return list(_iter_records(data, count))
+
+
+def _iter_records(data: bytes, count: int) -> Iterator[TraceRecord]:
+    offset = _HEADER.size
+    for _ in range(count):
+        start, end, status, nbytes, code, publish = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        yield TraceRecord(start, end, status, nbytes, DECISIONS[code], publish)
+
+
+def default_dump_path(log_file: Optional[str]) -> Path:
+    # Alongside rpc.log
+    return Path(log_file).with_name("rpc_trace.bin") if log_file else Path.cwd() / "rpc_trace.bin"
@@ -0,0 +1,59 @@
+import re
+from operator import attrgetter
+from typing import List, Optional
+
+from presence_state import PresenceState
+
+# Decides whether a new presence is worth sending to Discord. The server
+# recomputes start/end as now -/+ position on every poll and writes "MM:SS
+# left" into the text, so consecutive polls almost never compare equal even
+# though nothing a viewer cares about changed. Fields are split into:
+#   - timestamps: equal within a tolerance (a seek moves them further)
+#   - text: equal once any "MM:SS left" countdown is removed, since Discord
+#     derives the countdown from end_timestamp anyway
+#   - everything else: exact comparison
+
+TIMESTAMP_FIELDS = ("start_timestamp", "end_timestamp")
+TEXT_FIELDS = ("details", "state", "large_text", "small_text")
+EXACT_FIELDS = tuple(f for f in PresenceState.FIELDS if f not in TIMESTAMP_FIELDS + TEXT_FIELDS)
+
+DEFAULT_TOLERANCE = 5.0
+
+_TIME_LEFT_RE = re.compile(r"(?:\s*•\s*)?\b\d{1,2}:\d{2}(?::\d{2})? left\b")
+_exact = attrgetter(*EXACT_FIELDS)
+
+
+def strip_time_left(text: Optional[str]) -> Optional[str]:
+    return _TIME_LEFT_RE.sub("", text).strip() if text else text
+
+
+class PresenceDiff:
+    """Semantic comparison of presences, counting the updates it suppresses."""
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE) -> None:
+        self.tolerance = tolerance
+        self.suppressed = 0
+
+    def changes(self, new: PresenceState, old: Optional[PresenceState]) -> List[str]:
+        """Names of fields that changed meaningfully between old and new."""
+        if old is None:
+            return list(PresenceState.FIELDS)
+        changed = [f for f, a, b in zip(EXACT_FIELDS, _exact(new), _exact(old)) if a != b]
+        for f in TIMESTAMP_FIELDS:
+            a, b = getattr(new, f), getattr(old, f)
+            if (a is None) != (b is None) or (a is not None and abs(a - b) > self.tolerance):
+                changed.append(f)
+        for f in TEXT_FIELDS:
+            a, b = getattr(new, f), getattr(old, f)
+            if a != b and strip_time_left(a) != strip_time_left(b):
+                changed.append(f)
+        return changed
+
+    def should_publish(self, new: PresenceState, old: Optional[PresenceState]) -> bool:
+        if new is old or new == old:
+            return False
+        if self.changes(new, old):
+            return True
+        # Different bytes, same presence: only clocks moved
+        self.suppressed += 1
+        return False
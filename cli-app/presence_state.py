@@ -0,0 +1,142 @@
+import sys
+from operator import attrgetter
+from typing import Any, Optional
+
+# Compact, immutable record of one /Presence/Me response. The clients keep the
+# last published one instead of the raw dict, compare it field by field (hash
+# first) to decide whether anything changed, and intern the handful of strings
+# that repeat on every poll so long-running processes hold one copy of each.
+
+_EMPTY_GUID = "00000000-0000-0000-0000-000000000000"
+
+_intern = sys.intern
+_set = object.__setattr__
+
+
+def _interned(value: Any) -> Optional[str]:
+    return _intern(value) if isinstance(value, str) else None
+
+
+def _asset_key(value: Any) -> Optional[str]:
+    # Asset keys ("jellyfin", "play") repeat forever; URLs are per-item
+    if not isinstance(value, str):
+        return None
+    return value if "://" in value else _intern(value)
+
+
+class PresenceState:
+    """One decoded presence response; missing fields are None."""
+
+    __slots__ = (
+        "active",
+        "details",
+        "state",
+        "large_image",
+        "large_text",
+        "small_image",
+        "small_text",
+        "start_timestamp",
+        "end_timestamp",
+        "is_paused",
+        "item_id",
+        "item_type",
+        "series_id",
+        "cover_image_path",
+        "public_cover_url",
+        "season_episode",
+        "episode_title",
+        "series_name",
+        "genres",
+        "links",
+        "user_name",
+        "_key",
+        "_hash",
+    )
+
+    FIELDS = __slots__[:-2]
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.FIELDS:
+            _set(self, name, values.get(name))
+        _set(self, "active", bool(self.active))
+        _set(self, "is_paused", bool(self.is_paused))
+        _set(self, "links", tuple(self.links or ()))
+        self._seal()
+
+    def _seal(self) -> None:
+        key = _values(self)
+        _set(self, "_key", key)
+        _set(self, "_hash", hash(key))
+
+    @classmethod
+    def from_mapping(cls, data: dict) -> "PresenceState":
+        """Build straight from a decoded response, without an intermediate dict."""
+        self = cls.__new__(cls)
+        get = data.get
+        links = []
+        for link in get("links") or ():
+            if isinstance(link, dict) and link.get("label") and link.get("url"):
+                links.append((str(link["label"]), str(link["url"])))
+        item_id = get("item_id")
+        _set(self, "active", bool(get("active")))
+        _set(self, "details", get("details"))
+        _set(self, "state", get("state"))
+        _set(self, "large_image", _asset_key(get("large_image")))
+        _set(self, "large_text", _interned(get("large_text")))
+        _set(self, "small_image", _asset_key(get("small_image")))
+        _set(self, "small_text", _interned(get("small_text")))
+        _set(self, "start_timestamp", get("start_timestamp"))
+        _set(self, "end_timestamp", get("end_timestamp"))
+        _set(self, "is_paused", bool(get("is_paused")))
+        _set(self, "item_id", None if item_id is None else str(item_id))
+        _set(self, "item_type", _interned(get("item_type")))
+        series_id = get("series_id")
+        _set(self, "series_id", str(series_id) if series_id and series_id != _EMPTY_GUID else None)
+        _set(self, "cover_image_path", get("cover_image_path"))
+        _set(self, "public_cover_url", get("public_cover_url"))
+        _set(self, "season_episode", get("season_episode"))
+        _set(self, "episode_title", get("episode_title"))
+        _set(self, "series_name", get("series_name"))
+        _set(self, "genres", get("genres"))
+        _set(self, "links", tuple(links))
+        _set(self, "user_name", get("user_name"))
+        self._seal()
+        return self
+
+    def to_mapping(self) -> dict:
+        """Inverse of from_mapping: the response shape, links as label/url dicts."""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data["links"] = [{"label": label, "url": url} for label, url in self.links]
+        return data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # dict-style access so helpers shared with the selfbot client (which
+        # keeps raw dicts) work on either
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("PresenceState is immutable")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, PresenceState) or self._hash != other._hash:
+            return False
+        return self._key == other._key
+
+    def __ne__(self, other: object) -> bool:
+        if self is other:
+            return False
+        if not isinstance(other, PresenceState) or self._hash != other._hash:
+            return True
+        return self._key != other._key
+
+    def __repr__(self) -> str:
+        return f"PresenceState(item_id={self.item_id!r}, details={self.details!r}, is_paused={self.is_paused!r})"
+
+
+_values = attrgetter(*PresenceState.FIELDS)
@@ -0,0 +1,75 @@
+import logging
+import time
+from typing import Any, Optional, Tuple
+
+from artwork import ArtworkResolver
+from discord_pool import PresencePool
+from endpoints import rebase_url
+from payload import build_payload, link_buttons
+from presence_diff import PresenceDiff
+from presence_state import PresenceState
+from templates import compile_templates
+
+# main.py's publish step, kept out of its loop so ipc_load.py can drive the
+# same code against fake_discord.py: whether a poll is worth sending, the
+# Discord payload it becomes (templates, cover, buttons), and putting it on
+# the right Discord app.
+
+
+class Publisher:
+    def __init__(self, cfg: dict, pool: PresencePool, differ: PresenceDiff, artwork: ArtworkResolver) -> None:
+        self.cfg = cfg
+        self.pool = pool
+        self.differ = differ
+        self.artwork = artwork
+        self.details_tpl, self.state_tpl = compile_templates(cfg)
+        # {time_left}/{progress_percent} templates change on their own
+        self.templates_tick = any(t is not None and t.time_dependent for t in (self.details_tpl, self.state_tpl))
+        self.images = bool(cfg.get("Images", {}).get("ENABLE_IMAGES", False))
+
+    def wants(self, data: PresenceState, last_state: Optional[PresenceState]) -> bool:
+        """Whether data should go to Discord: it changed in a way a viewer would
+        notice (not just clock drift), a client template ticks, or a cover check
+        that has landed since the last update replaces the stand-in image."""
+        return self.templates_tick or self.differ.should_publish(data, last_state) or self.artwork.settled()
+
+    def payload(self, data: PresenceState) -> dict:
+        payload = build_payload(data, self.details_tpl, self.state_tpl)
+
+        # Jellyfin image handling (client-side fallback)
+        try:
+            if self.images:
+                url = self.artwork.resolve(data)
+                if url:
+                    logging.info(f"Using cover: {url}")
+                    payload["large_image"] = url
+                else:
+                    logging.warning("No Primary image fields in presence; falling back to default asset")
+            else:
+                logging.info("Images disabled in config; skipping artwork")
+        except Exception as e:
+            logging.error(f"Failed to build image URL for presence: {e}")
+
+        # Map optional links to Discord buttons (max 2)
+        buttons = link_buttons(data)
+
+        # The plugin builds URLs from whichever endpoint served the request
+        large_image = payload.get("large_image")
+        if large_image and "://" in large_image:
+            payload["large_image"] = rebase_url(large_image, self.cfg)
+
+        if buttons:
+            payload["buttons"] = buttons
+        return payload
+
+    def send(self, data: PresenceState, payload: dict) -> Tuple[Any, float]:
+        """Update the Discord app for data's media type; the connection now
+        showing the activity and the seconds the update took. Raises whatever
+        Presence.update raises."""
+        started = time.perf_counter()
+        # Another Discord app for this kind of media: its connection is already open
+        rpc = self.pool.switch(self.pool.client_id_for(data.item_type))
+        rpc.update(**payload)
+        elapsed = time.perf_counter() - started
+        self.pool.rewarm()
+        return rpc, elapsed
@@ -0,0 +1,232 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+# Reader for the presence snapshot the clients keep in a small memory-mapped
+# file (status_snapshot.py writes it). Nothing but the standard library, so
+# it can be copied next to a status bar script on its own. Reading maps the
+# file and unpacks the fields in place: no network, no Jellyfin request, no
+# log scraping.
+#
+#   python status_reader.py                        # one line, e.g. for tmux
+#   python status_reader.py --follow --waybar      # waybar custom module
+#   python status_reader.py --follow               # polybar (tail = true)
+#   python status_reader.py --follow --output now_playing.txt   # OBS text source
+#
+# Layout (little-endian, SIZE bytes): HEADER, then each of FIELDS as a u16
+# byte length and that field's fixed UTF-8 capacity. seq is odd while the
+# writer is mid-update; a reader that sees it odd, or changed by the end of
+# its read, reads again.
+
+MAGIC = b"JRPS"
+VERSION = 1
+SIZE = 4096
+# magic, version, reserved, seq, updated, start, end, flags, writer pid
+HEADER = struct.Struct("<4sHHQdqqII")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+LENGTH = struct.Struct("<H")
+ACTIVE, PAUSED = 1, 2
+
+FIELDS = (
+    ("details", 256),
+    ("state", 256),
+    ("large_text", 128),
+    ("small_text", 128),
+    ("item_id", 64),
+    ("item_type", 32),
+    ("series_name", 256),
+    ("season_episode", 16),
+    ("episode_title", 256),
+    ("user_name", 64),
+    ("public_cover_url", 1024),
+)
+
+
+def _offsets() -> tuple:
+    out, offset = [], HEADER.size
+    for name, capacity in FIELDS:
+        out.append((name, offset, capacity))
+        offset += LENGTH.size + capacity
+    assert offset <= SIZE
+    return tuple(out)
+
+
+OFFSETS = _offsets()
+
+
+# Each client writes its own file; two writers on one seqlock would clobber each other
+STATUS_FILE = "status.snap"
+SELFBOT_STATUS_FILE = "status_selfbot.snap"
+
+
+def default_status_path(filename: str = STATUS_FILE) -> Path:
+    """filename in $XDG_RUNTIME_DIR (tmpfs on most Linux desktops), else next to rpc.log."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime) / "jellyfin-discord-rpc" / filename
+    appdata = os.environ.get("APPDATA")
+    if appdata:
+        return Path(appdata) / "JellyfinDiscordRPC" / filename
+    return Path.home() / ".config" / "jellyfin-discord-rpc" / filename
+
+
+def _clock(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    h, rest = divmod(seconds, 3600)
+    return f"{h}:{rest // 60:02}:{rest % 60:02}" if h else f"{rest // 60:02}:{rest % 60:02}"
+
+
+@dataclass(frozen=True)
+class Status:
+    seq: int
+    updated: float
+    pid: int
+    active: bool
+    paused: bool
+    start: Optional[int]
+    end: Optional[int]
+    details: str
+    state: str
+    large_text: str
+    small_text: str
+    item_id: str
+    item_type: str
+    series_name: str
+    season_episode: str
+    episode_title: str
+    user_name: str
+    public_cover_url: str
+
+    def play_state(self) -> str:
+        return "Idle" if not self.active else "Paused" if self.paused else "Playing"
+
+    def fields(self, now: Optional[float] = None) -> dict:
+        """Everything a --format string can use."""
+        now = time.time() if now is None else now
+        out = asdict(self)
+        out["play_state"] = self.play_state()
+        out["summary"] = " • ".join(t for t in (self.details, self.state) if t) if self.active else ""
+        out["elapsed"] = _clock(now - self.start) if self.active and self.start else ""
+        # Frozen while paused: the writer only updates on a change
+        out["remaining"] = _clock(self.end - now) if self.active and self.end and not self.paused else ""
+        return out
+
+
+class StatusReader:
+    """Keeps the snapshot mapped; each read() is a few unpacks from shared memory."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or default_status_path()
+        self._map: Optional[mmap.mmap] = None
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        if self._map is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None  # no client running yet, or a short file
+        return self._map
+
+    def seq(self) -> int:
+        """Sequence number alone; cheap enough to poll for changes."""
+        m = self._mapped()
+        return SEQ.unpack_from(m, SEQ_OFFSET)[0] if m is not None else 0
+
+    def read(self, attempts: int = 1000) -> Optional[Status]:
+        """Consistent snapshot, or None if there's no (valid) file."""
+        m = self._mapped()
+        if m is None:
+            return None
+        for _ in range(attempts):
+            magic, version, _, seq, updated, start, end, flags, pid = HEADER.unpack_from(m, 0)
+            if magic != MAGIC or version != VERSION:
+                return None
+            if seq & 1:
+                time.sleep(0)  # writer mid-update
+                continue
+            texts = {}
+            for name, offset, capacity in OFFSETS:
+                length = min(LENGTH.unpack_from(m, offset)[0], capacity)
+                start_at = offset + LENGTH.size
+                texts[name] = m[start_at:start_at + length].decode("utf-8", "replace")
+            if SEQ.unpack_from(m, SEQ_OFFSET)[0] != seq:
+                continue
+            return Status(seq=seq, updated=updated, pid=pid, active=bool(flags & ACTIVE), paused=bool(flags & PAUSED),
+                          start=start or None, end=end or None, **texts)
+        return None
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _render(status: Optional[Status], args: argparse.Namespace) -> str:
+    if args.json:
+        return json.dumps(status.fields() if status else None, ensure_ascii=False)
+    text = args.format.format(**status.fields()) if status and status.active else args.idle
+    if args.waybar:
+        tooltip = "\n".join(t for t in (status.details, status.state) if t) if status and status.active else ""
+        css = status.play_state().lower() if status else "idle"
+        return json.dumps({"text": text, "tooltip": tooltip, "class": css, "alt": css}, ensure_ascii=False)
+    return text
+
+
+def _emit(line: str, output: Optional[Path]) -> None:
+    if output is None:
+        print(line, flush=True)
+        return
+    # Replace, don't rewrite in place, so OBS never reads a half-written file
+    tmp = output.with_name(output.name + ".tmp")
+    tmp.write_text(line, encoding="utf-8")
+    os.replace(tmp, output)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Print the Jellyfin RPC client's current presence")
+    ap.add_argument("--path", type=Path, default=None, help="snapshot file (default: status_snapshot_path or the runtime dir)")
+    ap.add_argument("--selfbot", action="store_true", help=f"read the selfbot client's {SELFBOT_STATUS_FILE} instead of {STATUS_FILE}")
+    ap.add_argument("--format", default="{summary}", help="format string over the snapshot's fields, e.g. '{details} ({remaining})'")
+    ap.add_argument("--idle", default="", help="text when nothing is playing")
+    ap.add_argument("--waybar", action="store_true", help="waybar JSON (text, tooltip, class playing/paused/idle)")
+    ap.add_argument("--json", action="store_true", help="every field as JSON")
+    ap.add_argument("--follow", action="store_true", help="print again whenever the output changes")
+    ap.add_argument("--interval", type=float, default=1.0, help="seconds between checks with --follow")
+    ap.add_argument("--output", type=Path, default=None, help="write to this file instead of stdout (OBS text source)")
+    args = ap.parse_args()
+
+    reader = StatusReader(args.path or default_status_path(SELFBOT_STATUS_FILE if args.selfbot else STATUS_FILE))
+    if not args.follow:
+        status = reader.read()
+        _emit(_render(status, args), args.output)
+        sys.exit(0 if status is not None else 1)
+
+    last: Optional[str] = None
+    clocked = "{remaining" in args.format or "{elapsed" in args.format or args.json
+    seen = -1
+    try:
+        while True:
+            seq = reader.seq()
+            # Only countdowns need a render without a new seq
+            if seq != seen or clocked:
+                seen = seq
+                line = _render(reader.read(), args)
+                if line != last:
+                    _emit(line, args.output)
+                    last = line
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import logging
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from presence_state import PresenceState
+from status_reader import ACTIVE, HEADER, LENGTH, MAGIC, OFFSETS, PAUSED, SEQ, SEQ_OFFSET, SIZE, STATUS_FILE, VERSION, default_status_path
+
+# The presence currently on Discord, published for other local processes
+# (status bars, tmux, OBS) in a fixed-layout memory-mapped file; the layout
+# and the reader live in status_reader.py. The clients call publish() where
+# they save the warm-start snapshot. It compares against what is already in
+# the file and writes nothing unless something changed, so an unchanged
+# presence costs one tuple comparison per poll and no syscalls.
+
+
+def _encode(value: Optional[str], capacity: int) -> bytes:
+    data = (value or "").encode("utf-8")
+    if len(data) > capacity:
+        # Cut on a character boundary
+        data = data[:capacity].decode("utf-8", "ignore").encode("utf-8")
+    return data
+
+
+def _row(state: Optional[PresenceState], details: Optional[str], state_text: Optional[str]) -> tuple:
+    if state is None or not state.active:
+        return (0, 0, 0) + ("",) * len(OFFSETS)
+    flags = ACTIVE | (PAUSED if state.is_paused else 0)
+    texts = {
+        "details": details if details is not None else state.details,
+        "state": state_text if state_text is not None else state.state,
+    }
+    return (int(state.start_timestamp or 0), int(state.end_timestamp or 0), flags) + tuple(
+        texts[name] if name in texts else getattr(state, name) or "" for name, _, _ in OFFSETS
+    )
+
+
+class StatusSnapshot:
+    """Writer side of the shared snapshot; one per client process."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < SIZE:
+                os.ftruncate(fd, SIZE)
+            self._map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        # Readers keep the file mapped across client restarts, so carry on
+        # from the sequence number already there (even: finish a torn write)
+        magic = self._map[:len(MAGIC)]
+        seq = SEQ.unpack_from(self._map, SEQ_OFFSET)[0] if magic == MAGIC else 0
+        self._seq = seq + (seq & 1)
+        self._written: Optional[tuple] = None
+        self.writes = 0
+        self.publish(None)
+
+    def publish(self, state: Optional[PresenceState], details: Optional[str] = None,
+                state_text: Optional[str] = None) -> bool:
+        """Show state (None: nothing playing); details/state_text override its text.
+        Returns whether the file was written."""
+        row = _row(state, details, state_text)
+        if row == self._written or self._map is None:
+            return False
+        m = self._map
+        start, end, flags = row[:3]
+        # Odd while writing: readers that catch it retry
+        SEQ.pack_into(m, SEQ_OFFSET, self._seq + 1)
+        HEADER.pack_into(m, 0, MAGIC, VERSION, 0, self._seq + 1, time.time(), start, end, flags, os.getpid())
+        for (_, offset, capacity), value in zip(OFFSETS, row[3:]):
+            data = _encode(value, capacity)
+            LENGTH.pack_into(m, offset, len(data))
+            m[offset + LENGTH.size:offset + LENGTH.size + len(data)] = data
+        self._seq += 2
+        SEQ.pack_into(m, SEQ_OFFSET, self._seq)
+        self._written = row
+        self.writes += 1
+        return True
+
+    def close(self) -> None:
+        """Mark nothing playing and unmap; readers see the client is gone."""
+        if self._map is None:
+            return
+        self.publish(None)
+        self._map.close()
+        self._map = None
+
+
+def open_status(cfg: dict, filename: str = STATUS_FILE) -> Optional[StatusSnapshot]:
+    """The snapshot the config asks for (status_snapshot, status_snapshot_path), if it can be opened.
+    filename is the client's default file name when status_snapshot_path isn't set."""
+    if not cfg.get("status_snapshot", True):
+        return None
+    path = Path(cfg["status_snapshot_path"]) if cfg.get("status_snapshot_path") else default_status_path(filename)
+    try:
+        return StatusSnapshot(path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Status snapshot disabled, cannot map {path}: {e}")
+        return None
@@ -0,0 +1,126 @@
+import re
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Optional, Tuple
+
+# Client-side presence templates. Uses the same tokens as the plugin's
+# ReplaceTokens, but each template is parsed once into a format string plus
+# a tuple of resolvers, so a render is a single str.format call.
+
+_TOKEN_RE = re.compile(r"\{([a-z_]+)\}")
+
+
+def _fmt_left(seconds: int) -> str:
+    h, rem = divmod(max(0, seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02d}:{m:02d}:{s:02d} left" if h else f"{m:02d}:{s:02d} left"
+
+
+def _title(data: dict, now: float) -> str:
+    return data.get("episode_title") or data.get("details") or ""
+
+
+def _series_or_title(data: dict, now: float) -> str:
+    series = data.get("series_name") or ""
+    code = data.get("season_episode") or ""
+    if series and code:
+        return f"{series} {code}"
+    return series or _title(data, now)
+
+
+def _time_left(data: dict, now: float) -> str:
+    end = data.get("end_timestamp")
+    if not end or data.get("is_paused"):
+        return ""
+    return _fmt_left(int(end) - int(now))
+
+
+def _progress_percent(data: dict, now: float) -> str:
+    start = data.get("start_timestamp")
+    end = data.get("end_timestamp")
+    if not start or not end or end <= start:
+        return "0"
+    pct = round(100.0 * (now - start) / (end - start))
+    return str(min(100, max(0, pct)))
+
+
+def _activity(data: dict, now: float) -> str:
+    return "Listening" if (data.get("item_type") or "") == "Audio" else "Watching"
+
+
+_RESOLVERS: Dict[str, Callable[[dict, float], str]] = {
+    "title": _title,
+    "episode_code_title": _title,
+    "season_episode": lambda d, now: d.get("season_episode") or "",
+    "series_name": lambda d, now: d.get("series_name") or "",
+    "genres": lambda d, now: d.get("genres") or "",
+    "play_state": lambda d, now: "Paused" if d.get("is_paused") else "Playing",
+    "progress_percent": _progress_percent,
+    "time_left": _time_left,
+    "activity": _activity,
+    "series_or_title": _series_or_title,
+}
+
+TOKENS = tuple(_RESOLVERS)
+
+# Read-only token -> resolver(data, now) view, for renderers that don't compile (bench.py)
+RESOLVERS = MappingProxyType(_RESOLVERS)
+
+_TIME_RESOLVERS = (_time_left, _progress_percent)
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class CompiledTemplate:
+    """A template parsed once into a format string and its token resolvers.
+
+    Unknown tokens are left in the output verbatim, like the plugin does.
+    When the template uses the "•" separator, segments that render empty are
+    dropped so a paused item doesn't end in a dangling " • ".
+    """
+
+    __slots__ = ("source", "time_dependent", "_fmt", "_resolvers", "_bullets")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        parts = []
+        resolvers = []
+        pos = 0
+        for m in _TOKEN_RE.finditer(source):
+            fn = _RESOLVERS.get(m.group(1))
+            if fn is None:
+                continue
+            parts.append(_escape(source[pos:m.start()]))
+            parts.append("{}")
+            resolvers.append(fn)
+            pos = m.end()
+        parts.append(_escape(source[pos:]))
+        self._fmt = "".join(parts)
+        self._resolvers: Tuple[Callable[[dict, float], str], ...] = tuple(resolvers)
+        self._bullets = "•" in source
+        # Output changes with the clock even when the presence doesn't
+        self.time_dependent = any(fn in _TIME_RESOLVERS for fn in resolvers)
+
+    def render(self, data: dict, now: Optional[float] = None) -> str:
+        if not self._resolvers:
+            return self.source
+        if now is None:
+            now = time.time()
+        text = self._fmt.format(*[fn(data, now) for fn in self._resolvers])
+        if self._bullets:
+            text = " • ".join(p for p in (s.strip() for s in text.split("•")) if p)
+        return text.strip()
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.source!r})"
+
+
+def compile_templates(cfg: dict) -> Tuple[Optional[CompiledTemplate], Optional[CompiledTemplate]]:
+    """Compile the optional details_template/state_template config keys."""
+    compiled = []
+    for key in ("details_template", "state_template"):
+        src = cfg.get(key)
+        compiled.append(CompiledTemplate(str(src)) if src else None)
+    return compiled[0], compiled[1]
@@ -0,0 +1,80 @@
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+from poll_trace import TraceRecord, read_dump
+
+# Summarises a poll trace dump (rpc_trace.bin, written by main.py on SIGUSR1
+# or when it crashes): latency percentiles, decisions, HTTP statuses, and a
+# per-poll timeline.
+
+
+def pct(values: List[float], q: float) -> float:
+    """The q-quantile of values (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def percentile_line(label: str, values: List[float]) -> str:
+    """One "label p50 .. p90 .. p99 .. max .. ms" summary line; ipc_load.py prints these too."""
+    if not values:
+        return f"{label:<10} (none)"
+    return (f"{label:<10} p50 {pct(values, 0.5):8.1f}  p90 {pct(values, 0.9):8.1f}  "
+            f"p99 {pct(values, 0.99):8.1f}  max {max(values):8.1f} ms  (n={len(values)})")
+
+
+def summary(records: List[TraceRecord]) -> None:
+    first, last = records[0].start, records[-1].end
+    print(f"{len(records)} polls from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))} "
+          f"to {time.strftime('%H:%M:%S', time.localtime(last))} ({(last - first) / 60:.1f} min)")
+    requests_ms = [r.request_ms for r in records if r.status]
+    publish_ms = [r.publish_ms for r in records if r.decision == "update"]
+    print(percentile_line("request", requests_ms))
+    print(percentile_line("publish", publish_ms))
+    gaps = [(b.start - a.start) * 1000 for a, b in zip(records, records[1:])]
+    print(percentile_line("interval", gaps))
+    decisions = Counter(r.decision for r in records)
+    print("decisions  " + "  ".join(f"{k}={v}" for k, v in decisions.most_common()))
+    statuses = Counter(r.status or "no response" for r in records)
+    print("statuses   " + "  ".join(f"{k}={v}" for k, v in statuses.most_common()))
+    sized = [r.nbytes for r in records if r.status == 200]
+    if sized:
+        print(f"body bytes avg {sum(sized) / len(sized):.0f}, max {max(sized)}")
+
+
+def timeline(records: List[TraceRecord], slow_ms: float) -> None:
+    for r in records:
+        stamp = time.strftime("%H:%M:%S", time.localtime(r.start)) + f".{int(r.start * 1000) % 1000:03d}"
+        flag = " SLOW" if r.request_ms >= slow_ms or r.publish_ms >= slow_ms else ""
+        publish = f"pub {r.publish_ms:7.1f} ms" if r.decision == "update" else ""
+        line = (f"{stamp}  req {r.request_ms:7.1f} ms  {r.status or '---':>3}  {r.nbytes:>6} B  "
+                f"{r.decision:<10} {publish}{flag}")
+        print(line.rstrip())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Summarise a Jellyfin RPC poll trace dump")
+    ap.add_argument("dump", type=Path, help="rpc_trace.bin (next to rpc.log)")
+    ap.add_argument("--tail", type=int, default=40, help="timeline entries to show (0 for none, -1 for all)")
+    ap.add_argument("--slow", type=float, default=1000.0, help="flag polls slower than this many ms")
+    args = ap.parse_args()
+
+    try:
+        records = read_dump(args.dump)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not records:
+        print("Trace is empty")
+        return
+    summary(records)
+    if args.tail:
+        print()
+        timeline(records if args.tail < 0 else records[-args.tail:], args.slow)
+
+
+if __name__ == "__main__":
+    main()
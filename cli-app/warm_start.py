@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from presence_state import PresenceState
+
+# Last published presence persisted next to the config, so a restarted client
+# can put it back on Discord straight away and keep the long-pause timer
+# running across restarts instead of starting from nothing.
+
+DEFAULT_MAX_AGE = 600.0
+
+
+@dataclass
+class Snapshot:
+    state: Optional[PresenceState]
+    content_key: Optional[str]
+    paused_since: Optional[float]
+    saved_at: float
+
+    def is_fresh(self, max_age: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if now - self.saved_at > max_age:
+            return False
+        # A playing item whose end time has passed has certainly moved on
+        end = self.state.end_timestamp if self.state is not None else None
+        return not (end and not self.state.is_paused and end < now)
+
+
+class WarmStart:
+    """Reads and writes the snapshot file; writes only when something changed."""
+
+    def __init__(self, path: Path, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+        self._written: Optional[tuple] = None
+        self._saved_at = 0.0
+
+    def load(self) -> Optional[Snapshot]:
+        """The saved snapshot if it is still fresh, else None."""
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                raw = json.load(f)
+            presence = raw.get("presence")
+            snap = Snapshot(
+                state=PresenceState.from_mapping(presence) if presence else None,
+                content_key=raw.get("content_key"),
+                paused_since=raw.get("paused_since"),
+                saved_at=float(raw.get("saved_at") or 0),
+            )
+        except (OSError, ValueError, TypeError, AttributeError):
+            return None
+        if not snap.is_fresh(self.max_age):
+            return None
+        self._written = (snap.state, snap.content_key, snap.paused_since)
+        self._saved_at = snap.saved_at
+        return snap
+
+    def save(self, state: Optional[PresenceState], content_key: Optional[str], paused_since: Optional[float]) -> bool:
+        current = (state, content_key, paused_since)
+        now = time.time()
+        # Unchanged: only rewrite often enough to keep the snapshot fresh
+        if current == self._written and now - self._saved_at < self.max_age / 2:
+            return False
+        body = {
+            "presence": state.to_mapping() if state is not None else None,
+            "content_key": content_key,
+            "paused_since": paused_since,
+            "saved_at": now,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(body, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            return False
+        self._written = current
+        self._saved_at = now
+        return True
@@ -0,0 +1,89 @@
+import json
+from typing import Any, Optional, Tuple
+
+from presence_state import PresenceState
+
+try:
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover
+    msgpack = None  # optional; falls back to JSON
+
+# Negotiated wire format for /Presence/Me: the client asks for only the fields
+# it uses (?fields=...), accepts gzip (requests does this by default) and, when
+# the msgpack package is installed, MessagePack instead of JSON. Older plugins
+# ignore all of this and send the full JSON body, which decodes the same way.
+#
+# Newer plugins also send an ETag; PresenceCache replays it as If-None-Match
+# and hands back the previous decoded object on a 304, so an unchanged poll
+# costs neither a body nor a parse.
+
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+
+# Fields main.py reads; everything else (NowPlayingItem, GUIDs) stays on the server
+DEFAULT_FIELDS = (
+    "active",
+    "details",
+    "state",
+    "large_image",
+    "large_text",
+    "small_image",
+    "small_text",
+    "start_timestamp",
+    "end_timestamp",
+    "is_paused",
+    "item_id",
+    "item_type",
+    "series_id",
+    "cover_image_path",
+    "public_cover_url",
+    "season_episode",
+    "episode_title",
+    "series_name",
+    "genres",
+    "links",
+    "user_name",
+)
+
+
+def accept_header() -> str:
+    if msgpack is not None:
+        return f"{MSGPACK_CONTENT_TYPE}, application/json;q=0.9"
+    return "application/json"
+
+
+def fields_param(fields: Tuple[str, ...] = DEFAULT_FIELDS) -> str:
+    return ",".join(fields)
+
+
+def decode_body(content: bytes, content_type: Optional[str]) -> dict:
+    if msgpack is not None and content_type and MSGPACK_CONTENT_TYPE in content_type:
+        return msgpack.unpackb(content, raw=False)
+    return json.loads(content)
+
+
+def decode_presence(content: bytes, content_type: Optional[str]) -> PresenceState:
+    return PresenceState.from_mapping(decode_body(content, content_type))
+
+
+class PresenceCache:
+    """Last ETag and the presence decoded from that response."""
+
+    __slots__ = ("etag", "value", "hits")
+
+    def __init__(self) -> None:
+        self.etag: Optional[str] = None
+        self.value: Any = None
+        self.hits = 0
+
+    def headers(self) -> dict:
+        return {"If-None-Match": self.etag} if self.etag and self.value is not None else {}
+
+    def not_modified(self) -> Any:
+        """Value for a 304: the very object returned last time."""
+        self.hits += 1
+        return self.value
+
+    def store(self, etag: Optional[str], value: Any) -> Any:
+        self.etag = etag
+        self.value = value
+        return value
@@ -12,6 +12,7 @@ using System.Net.Http;
 using System.Text.Json;
 using System.Threading.Tasks;
 using System.Net;
+using Microsoft.Extensions.Options;
 
 namespace Jellyfin.Plugin.DiscordRpc.Controllers;
 
@@ -39,27 +40,125 @@ public class PresenceController : ControllerBase
                 return Unauthorized(new { error = "Unauthorized" });
             }
 
-            var sessions = sessionManager.Sessions.ToList();
-            var scoped = string.IsNullOrEmpty(requestedUser)
-                ? sessions.Where(s => s.UserId == userId)
-                : sessions.Where(s => (s.UserName ?? string.Empty).Equals(requestedUser, StringComparison.OrdinalIgnoreCase));
-            var userSessions = scoped.ToList();
-            var candidates = userSessions.Where(s => s.NowPlayingItem != null).ToList();
+            IEnumerable<SessionInfo> scoped;
+            var index = HttpContext.RequestServices.GetService<SessionIndex>();
+            if (index != null)
+            {
+                // O(1) per poll: only this user's playing sessions
+                scoped = string.IsNullOrEmpty(requestedUser) ? index.ForUser(userId) : index.ForUserName(requestedUser);
+            }
+            else
+            {
+                var sessions = sessionManager.Sessions.ToList();
+                scoped = string.IsNullOrEmpty(requestedUser)
+                    ? sessions.Where(s => s.UserId == userId)
+                    : sessions.Where(s => (s.UserName ?? string.Empty).Equals(requestedUser, StringComparison.OrdinalIgnoreCase));
+            }
+            var candidates = scoped.Where(s => s.NowPlayingItem != null).ToList();
             if (candidates.Count == 0)
             {
-                return Ok(new { active = false });
+                var idleTag = PresenceETag(userId, requestedUser, "idle");
+                return NotModified(idleTag) ?? Wire(new { active = false }, idleTag);
             }
 
-        // Prefer actively playing over paused, then by last activity timestamp
-        var session = candidates
+            var session = PickSession(candidates);
+            var config = Plugin.Instance?.Configuration ?? new PluginConfiguration();
+
+            // Same item, play state and (bucketed) position as the client's copy: skip rendering
+            var etag = PresenceETag(userId, requestedUser, SessionTag(session, config));
+            return NotModified(etag) ?? Wire(RenderPresence(session, userId, config), etag);
+        }
+        catch (Exception ex)
+        {
+            return StatusCode(500, new { error = ex.Message });
+        }
+    }
+
+    [HttpGet("Presence/Me")] // Convenience alias
+    public async Task<IActionResult> GetPresenceMe()
+    {
+        return await GetPresence();
+    }
+
+    // Every user's presence in one response, for the LAN gateway (gateway.py):
+    // one poll per cycle for a whole household or office instead of one per
+    // seat. Needs an admin token since it exposes every user's playback.
+    [HttpGet("Presence/All")]
+    [Authorize(Policy = "RequiresElevation")]
+    public IActionResult GetAllPresences()
+    {
+        try
+        {
+            var sessionManager = HttpContext.RequestServices.GetService(typeof(ISessionManager)) as ISessionManager;
+            if (sessionManager == null)
+            {
+                return StatusCode(501, new { error = "Session manager unavailable" });
+            }
+            var config = Plugin.Instance?.Configuration ?? new PluginConfiguration();
+            var index = HttpContext.RequestServices.GetService<SessionIndex>();
+            var playing = index != null
+                ? index.Playing()
+                : sessionManager.Sessions.Where(s => s.NowPlayingItem != null && s.UserId != Guid.Empty).ToList();
+            var sessions = playing
+                .GroupBy(s => s.UserId)
+                .Select(g => PickSession(g))
+                .OrderBy(s => s.UserName, StringComparer.OrdinalIgnoreCase)
+                .ToList();
+
+            var etag = PresenceETag("all", string.Join(",", sessions.Select(s => $"{s.UserId}/{SessionTag(s, config)}")));
+            var notModified = NotModified(etag);
+            if (notModified != null)
+            {
+                return notModified;
+            }
+
+            // Users with nothing playing are simply absent; ?fields= applies to each entry
+            var jsonOptions = HttpContext.RequestServices.GetService<IOptions<JsonOptions>>()?.Value.JsonSerializerOptions;
+            var fields = Request.Query["fields"].FirstOrDefault();
+            var users = sessions
+                .Select(s => PresenceWire.Project(JsonSerializer.SerializeToElement(RenderPresence(s, s.UserId, config), jsonOptions), fields))
+                .ToList();
+            return WireElement(JsonSerializer.SerializeToElement(new { users }, jsonOptions), etag);
+        }
+        catch (Exception ex)
+        {
+            return StatusCode(500, new { error = ex.Message });
+        }
+    }
+
+    // Prefer actively playing over paused, then by last activity timestamp
+    private static SessionInfo PickSession(IEnumerable<SessionInfo> candidates)
+    {
+        return candidates
             .OrderByDescending(s => (s.PlayState != null && s.PlayState.IsPaused == false) ? 1 : 0)
             .ThenByDescending(s => s.LastActivityDate)
             .First();
+    }
 
+    // What a rendered presence depends on besides the clock: item, play state,
+    // bucketed position and the {progress_percent} value, which moves while
+    // the start time (and so the bucket) stays put
+    private static string SessionTag(SessionInfo session, PluginConfiguration config)
+    {
+        var isPaused = session.PlayState?.IsPaused == true;
+        var bucket = config.IncludeTimestamps ? PresenceWire.TimeBucket(session.PlayState?.PositionTicks, isPaused) : 0;
+        return $"{session.NowPlayingItem.Id}/{isPaused}/{bucket}/{ProgressPercent(session)}";
+    }
+
+    private static int ProgressPercent(SessionInfo session)
+    {
         var item = session.NowPlayingItem;
         var playState = session.PlayState;
+        return playState?.PositionTicks.HasValue == true && item.RunTimeTicks.HasValue && item.RunTimeTicks.Value > 0
+            ? (int)Math.Round(100.0 * playState.PositionTicks.Value / item.RunTimeTicks.Value)
+            : 0;
+    }
 
-        var config = Plugin.Instance?.Configuration ?? new PluginConfiguration();
+    // The presence body for one session's now-playing item
+    private object RenderPresence(SessionInfo session, Guid userId, PluginConfiguration config)
+    {
+        var item = session.NowPlayingItem;
+        var playState = session.PlayState;
 
         var title = item.Name ?? "";
         var seriesName = item.SeriesName ?? string.Empty;
@@ -68,57 +167,52 @@ public class PresenceController : ControllerBase
         var seasonEpisode = item.IndexNumber.HasValue
             ? (item.ParentIndexNumber.HasValue ? $"S{item.ParentIndexNumber:00}E{item.IndexNumber:00}" : $"E{item.IndexNumber:00}")
             : string.Empty;
-        var progressPercent = playState?.PositionTicks.HasValue == true && item.RunTimeTicks.HasValue && item.RunTimeTicks.Value > 0
-            ? (int)Math.Round(100.0 * playState.PositionTicks.Value / item.RunTimeTicks.Value)
-            : 0;
+        var progressPercent = ProgressPercent(session);
         var isPaused = playState?.IsPaused == true;
         var playStateText = isPaused ? "Paused" : "Playing";
 
-        string ReplaceTokens(string template)
-        {
-            var mediaType = item.MediaType.ToString();
-            var activity = string.Equals(mediaType, "Audio", StringComparison.OrdinalIgnoreCase) ? "Listening" : "Watching";
-            var seriesOrTitle = string.IsNullOrEmpty(seriesName) ? title : seriesName;
-            var seriesOrTitleWithCode = (!string.IsNullOrEmpty(seriesName) && !string.IsNullOrEmpty(seasonEpisode)) ? $"{seriesName} {seasonEpisode}" : seriesOrTitle;
-            var episodeCodeTitle = title; // simple layout
-            return template
-                .Replace("{title}", title)
-                .Replace("{season_episode}", seasonEpisode)
-                .Replace("{progress_percent}", progressPercent.ToString())
-                .Replace("{play_state}", playStateText)
-                .Replace("{genres}", genres)
-                .Replace("{series_name}", seriesName)
-                .Replace("{time_left}", "")
-                .Replace("{activity}", activity)
-                .Replace("{series_or_title}", seriesOrTitleWithCode)
-                .Replace("{episode_code_title}", episodeCodeTitle);
-        }
-
-        // Select appropriate template based on media type
-        string detailsTemplate, stateTemplate;
+        var mediaType = item.MediaType.ToString();
+        var seriesOrTitle = string.IsNullOrEmpty(seriesName) ? title : seriesName;
+        var values = new string[PresenceTemplate.TokenCount];
+        values[(int)PresenceToken.Title] = title;
+        values[(int)PresenceToken.SeasonEpisode] = seasonEpisode;
+        values[(int)PresenceToken.ProgressPercent] = progressPercent.ToString();
+        values[(int)PresenceToken.PlayState] = playStateText;
+        values[(int)PresenceToken.Genres] = genres;
+        values[(int)PresenceToken.SeriesName] = seriesName;
+        // Rendered empty, as before: a client keeps a 304ed body for as long as
+        // SessionTag is unchanged, which a countdown would outlive
+        values[(int)PresenceToken.TimeLeft] = string.Empty;
+        values[(int)PresenceToken.Activity] = string.Equals(mediaType, "Audio", StringComparison.OrdinalIgnoreCase) ? "Listening" : "Watching";
+        values[(int)PresenceToken.SeriesOrTitle] = (!string.IsNullOrEmpty(seriesName) && !string.IsNullOrEmpty(seasonEpisode)) ? $"{seriesName} {seasonEpisode}" : seriesOrTitle;
+        values[(int)PresenceToken.EpisodeCodeTitle] = title; // simple layout
+
+        // Select appropriate template based on media type; parsed once per configuration
+        var templates = PresenceTemplates.For(config);
+        PresenceTemplate detailsTemplate, stateTemplate;
         
         if (itemType.Equals("Episode", StringComparison.OrdinalIgnoreCase))
         {
-            detailsTemplate = config.Episodes.DetailsTemplate;
-            stateTemplate = config.Episodes.StateTemplate;
+            detailsTemplate = templates.EpisodeDetails;
+            stateTemplate = templates.EpisodeState;
         }
         else if (itemType.Equals("Audio", StringComparison.OrdinalIgnoreCase) || 
                  itemType.Equals("MusicAlbum", StringComparison.OrdinalIgnoreCase) ||
                  itemType.Equals("MusicArtist", StringComparison.OrdinalIgnoreCase))
         {
-            detailsTemplate = config.Music.DetailsTemplate;
-            stateTemplate = config.Music.StateTemplate;
+            detailsTemplate = templates.MusicDetails;
+            stateTemplate = templates.MusicState;
         }
         else // Movies, Series, and other content
         {
-            detailsTemplate = config.Movies.DetailsTemplate;
-            stateTemplate = config.Movies.StateTemplate;
+            detailsTemplate = templates.MovieDetails;
+            stateTemplate = templates.MovieState;
         }
 
-        var details = ReplaceTokens(detailsTemplate);
-        var state = ReplaceTokens(stateTemplate);
-        var largeText = ReplaceTokens(config.LargeImageTextTemplate);
-        var smallText = ReplaceTokens(config.SmallImageTextTemplate);
+        var details = detailsTemplate.Render(values);
+        var state = stateTemplate.Render(values);
+        var largeText = templates.LargeText.Render(values);
+        var smallText = templates.SmallText.Render(values);
 
         long? startTimestamp = null;
         long? endTimestamp = null;
@@ -136,19 +230,6 @@ public class PresenceController : ControllerBase
             }
         }
 
-        // Compute time left string from endTimestamp if available and not paused
-        string timeLeft = string.Empty;
-        if (!isPaused && endTimestamp.HasValue)
-        {
-            var secondsLeft = (int)Math.Max(0, endTimestamp.Value - DateTimeOffset.UtcNow.ToUnixTimeSeconds());
-            var ts = TimeSpan.FromSeconds(secondsLeft);
-            timeLeft = ts.Hours > 0 ? $"{ts.Hours:D2}:{ts.Minutes:D2}:{ts.Seconds:D2} left" : $"{ts.Minutes:D2}:{ts.Seconds:D2} left";
-        }
-
-        // Re-apply time_left into state and details
-        details = details.Replace("{time_left}", timeLeft);
-        state = state.Replace("{time_left}", timeLeft);
-
         // Resolve cover image relative path for Primary if available
         string? coverPath = null;
         string? primaryTag = null;
@@ -207,61 +288,52 @@ public class PresenceController : ControllerBase
         }
         catch { }
 
-            var baseUrl = $"{Request.Scheme}://{Request.Host}";
-            // Always provide a direct Jellyfin image URL (HTTPS required for official Discord)
-            var idForUrl = coverItemId != Guid.Empty ? coverItemId : item.Id;
-            string? publicCoverUrl = $"{baseUrl}/Items/{idForUrl}/Images/Primary?quality=90&fillHeight=512&fillWidth=512";
-            if (!string.IsNullOrEmpty(primaryTag))
-            {
-                publicCoverUrl += $"&tag={WebUtility.UrlEncode(primaryTag)}";
-            }
-
-            return Ok(new
-            {
-                active = true,
-                details,
-                state,
-                large_image = publicCoverUrl ?? largeImageKey ?? config.DefaultImageAssetKey,
-                large_text = largeText,
-                small_image = config.SmallImageKey,
-                small_text = smallText,
-                start_timestamp = startTimestamp,
-                end_timestamp = isPaused ? null : endTimestamp,
-                is_paused = isPaused,
-                user_id = userId,
-                item_id = item.Id,
-                item_type = itemType,
-                series_id = (item.SeriesId.HasValue ? item.SeriesId.Value : Guid.Empty),
-                cover_image_path = coverPath,
-                public_cover_url = publicCoverUrl,
-                season_episode = seasonEpisode,
-                episode_title = title,
-                series_name = seriesName,
-                NowPlayingItem = new {
-                    Id = item.Id,
-                    Name = title,
-                    SeriesName = seriesName,
-                    Type = itemType,
-                    IndexNumber = item.IndexNumber,
-                    ParentIndexNumber = item.ParentIndexNumber,
-                    SeasonEpisode = seasonEpisode
-                },
-                links = new [] {
-                    imdbUrl != null ? new { label = "IMDb", url = imdbUrl } : null,
-                    tmdbUrl != null ? new { label = "TheMovieDb", url = tmdbUrl } : null
-                }.Where(x => x != null)
-            });
-        }
-        catch (Exception ex)
+        var baseUrl = $"{Request.Scheme}://{Request.Host}";
+        // Always provide a direct Jellyfin image URL (HTTPS required for official Discord)
+        var idForUrl = coverItemId != Guid.Empty ? coverItemId : item.Id;
+        string? publicCoverUrl = $"{baseUrl}/Items/{idForUrl}/Images/Primary?quality=90&fillHeight=512&fillWidth=512";
+        if (!string.IsNullOrEmpty(primaryTag))
         {
-            return StatusCode(500, new { error = ex.Message });
+            publicCoverUrl += $"&tag={WebUtility.UrlEncode(primaryTag)}";
         }
-    }
 
-    [HttpGet("Presence/Me")] // Convenience alias
-    public async Task<IActionResult> GetPresenceMe()
-    {
-        return await GetPresence();
+        return new
+        {
+            active = true,
+            details,
+            state,
+            large_image = publicCoverUrl ?? largeImageKey ?? config.DefaultImageAssetKey,
+            large_text = largeText,
+            small_image = config.SmallImageKey,
+            small_text = smallText,
+            start_timestamp = startTimestamp,
+            end_timestamp = isPaused ? null : endTimestamp,
+            is_paused = isPaused,
+            user_id = userId,
+            user_name = session.UserName,
+            item_id = item.Id,
+            item_type = itemType,
+            series_id = (item.SeriesId.HasValue ? item.SeriesId.Value : Guid.Empty),
+            cover_image_path = coverPath,
+            public_cover_url = publicCoverUrl,
+            season_episode = seasonEpisode,
+            episode_title = title,
+            series_name = seriesName,
+            genres,
+            NowPlayingItem = new {
+                Id = item.Id,
+                Name = title,
+                SeriesName = seriesName,
+                Type = itemType,
+                IndexNumber = item.IndexNumber,
+                ParentIndexNumber = item.ParentIndexNumber,
+                SeasonEpisode = seasonEpisode
+            },
+            links = new [] {
+                imdbUrl != null ? new { label = "IMDb", url = imdbUrl } : null,
+                tmdbUrl != null ? new { label = "TheMovieDb", url = tmdbUrl } : null
+            }.Where(x => x != null)
+        };
     }
 
     [HttpGet("Ping")]
@@ -279,6 +351,72 @@ public class PresenceController : ControllerBase
         }
     }
 
+    // ETag for one user's presence: the caller's parts plus everything else
+    // that shapes the body (settings, ?fields=, format, host used in URLs)
+    private string PresenceETag(params object?[] parts)
+    {
+        return PresenceWire.ETag(
+            string.Join("/", parts),
+            Plugin.Instance?.ConfigurationVersion,
+            Request.Query["fields"].FirstOrDefault(),
+            PresenceWire.AcceptsMessagePack(Request.Headers["Accept"].ToString()),
+            Request.Host.Value);
+    }
+
+    // Body-less 304 when the client already holds this version, otherwise null
+    private IActionResult? NotModified(string etag)
+    {
+        if (!PresenceWire.Matches(Request.Headers["If-None-Match"].ToString(), etag))
+        {
+            return null;
+        }
+        Response.Headers["ETag"] = etag;
+        Response.Headers["Vary"] = "Accept, Accept-Encoding";
+        Response.Headers["Cache-Control"] = "private, no-cache";
+        return StatusCode(304);
+    }
+
+    // Applies ?fields= projection, MessagePack negotiation and compression to a presence body
+    private IActionResult Wire(object body, string? etag = null)
+    {
+        // Serialize with the server's MVC options so names and Guid formats match Ok(...)
+        var jsonOptions = HttpContext.RequestServices.GetService<IOptions<JsonOptions>>()?.Value.JsonSerializerOptions;
+        var element = JsonSerializer.SerializeToElement(body, jsonOptions);
+        return WireElement(PresenceWire.Project(element, Request.Query["fields"].FirstOrDefault()), etag);
+    }
+
+    // MessagePack negotiation and compression for an already projected body
+    private IActionResult WireElement(JsonElement element, string? etag)
+    {
+        var jsonOptions = HttpContext.RequestServices.GetService<IOptions<JsonOptions>>()?.Value.JsonSerializerOptions;
+        byte[] bytes;
+        string contentType;
+        if (PresenceWire.AcceptsMessagePack(Request.Headers["Accept"].ToString()))
+        {
+            bytes = PresenceWire.ToMessagePack(element);
+            contentType = PresenceWire.MessagePackContentType;
+        }
+        else
+        {
+            bytes = JsonSerializer.SerializeToUtf8Bytes(element, jsonOptions);
+            contentType = "application/json; charset=utf-8";
+        }
+
+        Response.Headers["Vary"] = "Accept, Accept-Encoding";
+        if (etag != null)
+        {
+            Response.Headers["ETag"] = etag;
+            Response.Headers["Cache-Control"] = "private, no-cache";
+        }
+        var encoding = PresenceWire.PickEncoding(Request.Headers["Accept-Encoding"].ToString());
+        if (encoding != null && bytes.Length >= PresenceWire.MinCompressBytes)
+        {
+            bytes = PresenceWire.Compress(bytes, encoding);
+            Response.Headers["Content-Encoding"] = encoding;
+        }
+        return File(bytes, contentType);
+    }
+
     private Guid GetCurrentUserId()
     {
         var idClaim = User?.Claims?.FirstOrDefault(c =>
@@ -337,9 +475,10 @@ public class PresenceController : ControllerBase
             using var stream = await resp.Content.ReadAsStreamAsync();
             using var doc = await JsonDocument.ParseAsync(stream);
             var root = doc.RootElement;
+            var idleTag = PresenceETag(apiKey, requestedUser, "idle");
             if (root.ValueKind != JsonValueKind.Array || root.GetArrayLength() == 0)
             {
-                return Ok(new { active = false });
+                return NotModified(idleTag) ?? Wire(new { active = false }, idleTag);
             }
 
             JsonElement? firstWithItem = null;
@@ -360,7 +499,7 @@ public class PresenceController : ControllerBase
             }
             if (firstWithItem == null)
             {
-                return Ok(new { active = false });
+                return NotModified(idleTag) ?? Wire(new { active = false }, idleTag);
             }
 
             var sessionEl = firstWithItem.Value;
@@ -375,6 +514,13 @@ public class PresenceController : ControllerBase
             long? posTicks = play.TryGetProperty("PositionTicks", out var pt) && pt.TryGetInt64(out var pl) ? pl : (long?)null;
             long? runTicks = item.TryGetProperty("RunTimeTicks", out var rt) && rt.TryGetInt64(out var rl) ? rl : (long?)null;
             bool isPaused = play.TryGetProperty("IsPaused", out var ip) && ip.ValueKind == JsonValueKind.True;
+            string itemIdForTag = item.TryGetProperty("Id", out var tagId) ? tagId.ToString() : title;
+            var etag = PresenceETag(apiKey, requestedUser, itemIdForTag, isPaused, PresenceWire.TimeBucket(posTicks, isPaused));
+            var notModified = NotModified(etag);
+            if (notModified != null)
+            {
+                return notModified;
+            }
             int progress = (posTicks.HasValue && runTicks.HasValue && runTicks.Value > 0) ? (int)Math.Round(100.0 * posTicks.Value / runTicks.Value) : 0;
 
             // Genres (top 3)
@@ -416,15 +562,10 @@ public class PresenceController : ControllerBase
                 itemTypeFromJson = typeEl.GetString() ?? "Movie";
             }
 
-            // Format details and state based on media type
+            // Format details and state based on media type. No "MM:SS left":
+            // a 304 would replay a stale countdown, and Discord counts down
+            // from end_timestamp anyway
             string details, state;
-            string timeLeft = string.Empty;
-            if (!isPaused && endTs.HasValue)
-            {
-                var secondsLeft = Math.Max(0, endTs.Value - DateTimeOffset.UtcNow.ToUnixTimeSeconds());
-                var ts = TimeSpan.FromSeconds(secondsLeft);
-                timeLeft = ts.Hours > 0 ? $"{ts.Hours:D2}:{ts.Minutes:D2}:{ts.Seconds:D2} left" : $"{ts.Minutes:D2}:{ts.Seconds:D2} left";
-            }
 
             if (itemTypeFromJson.Equals("Episode", StringComparison.OrdinalIgnoreCase))
             {
@@ -432,12 +573,11 @@ public class PresenceController : ControllerBase
                 details = !string.IsNullOrEmpty(seriesName) && !string.IsNullOrEmpty(seasonEpisode) 
                     ? $"{seriesName} {seasonEpisode}" 
                     : (!string.IsNullOrEmpty(seriesName) ? seriesName : title);
-                // State: "Episode Title" • Genres • Time left
+                // State: "Episode Title" • Genres
                 var episodeTitle = !string.IsNullOrEmpty(title) && title != seriesName ? $"\"{title}\"" : "";
                 var stateParts = new List<string>();
                 if (!string.IsNullOrEmpty(episodeTitle)) stateParts.Add(episodeTitle);
                 if (!string.IsNullOrEmpty(genres)) stateParts.Add(genres);
-                if (!string.IsNullOrEmpty(timeLeft)) stateParts.Add(timeLeft);
                 state = string.Join(" • ", stateParts);
             }
             else
@@ -446,7 +586,6 @@ public class PresenceController : ControllerBase
                 details = title;
                 var stateParts = new List<string>();
                 if (!string.IsNullOrEmpty(genres)) stateParts.Add(genres);
-                if (!string.IsNullOrEmpty(timeLeft)) stateParts.Add(timeLeft);
                 state = string.Join(" • ", stateParts);
             }
 
@@ -478,7 +617,7 @@ public class PresenceController : ControllerBase
                 }
             }
 
-            return Ok(new
+            return Wire(new
             {
                 active = true,
                 details,
@@ -488,7 +627,7 @@ public class PresenceController : ControllerBase
                 is_paused = isPaused,
                 cover_image_path = coverImagePath,
                 public_cover_url = publicCoverUrl
-            });
+            }, etag);
         }
         catch (Exception ex)
         {
@@ -1,6 +1,7 @@
 using System;
 using System.IO;
 using System.Collections.Generic;
+using System.Threading;
 using MediaBrowser.Common.Configuration;
 using MediaBrowser.Common.Plugins;
 using MediaBrowser.Model.Plugins;
@@ -22,6 +23,18 @@ public class Plugin : BasePlugin<PluginConfiguration>, IHasWebPages
 
     public override Guid Id => new Guid("7f1e77a0-6e64-4b3c-9a78-2f6f3e23f2f6");
 
+    private int _configurationVersion;
+
+    // Bumped on every save (dashboard or Settings page) so anything derived
+    // from the configuration, like presence ETags, goes stale with it
+    public int ConfigurationVersion => Volatile.Read(ref _configurationVersion);
+
+    public override void UpdateConfiguration(BasePluginConfiguration configuration)
+    {
+        base.UpdateConfiguration(configuration);
+        Interlocked.Increment(ref _configurationVersion);
+    }
+
     public IEnumerable<PluginPageInfo> GetPages()
     {
         var htmlRes = GetType().Namespace + ".Configuration.config.html";
@@ -0,0 +1,15 @@
+using MediaBrowser.Controller;
+using MediaBrowser.Controller.Plugins;
+using Microsoft.Extensions.DependencyInjection;
+
+namespace Jellyfin.Plugin.DiscordRpc;
+
+// Registers the plugin's server-side services with Jellyfin's container
+public class PluginServiceRegistrator : IPluginServiceRegistrator
+{
+    public void RegisterServices(IServiceCollection serviceCollection, IServerApplicationHost applicationHost)
+    {
+        serviceCollection.AddSingleton<SessionIndex>();
+        serviceCollection.AddHostedService(provider => provider.GetRequiredService<SessionIndex>());
+    }
+}
@@ -0,0 +1,178 @@
+using System;
+using System.Collections.Generic;
+using System.Text;
+
+namespace Jellyfin.Plugin.DiscordRpc;
+
+// Token values for one render, indexed by PresenceTemplate's token ids
+public enum PresenceToken
+{
+    Title,
+    SeasonEpisode,
+    ProgressPercent,
+    PlayState,
+    Genres,
+    SeriesName,
+    TimeLeft,
+    Activity,
+    SeriesOrTitle,
+    EpisodeCodeTitle,
+}
+
+// A configured template split once into literal text and {token} segments,
+// rendered in a single pass into a per-thread StringBuilder. Unknown {names}
+// stay as literal text, as they did with string.Replace.
+public sealed class PresenceTemplate
+{
+    public static readonly int TokenCount = Enum.GetValues<PresenceToken>().Length;
+
+    private static readonly Dictionary<string, PresenceToken> TokenNames = new(StringComparer.Ordinal)
+    {
+        ["title"] = PresenceToken.Title,
+        ["season_episode"] = PresenceToken.SeasonEpisode,
+        ["progress_percent"] = PresenceToken.ProgressPercent,
+        ["play_state"] = PresenceToken.PlayState,
+        ["genres"] = PresenceToken.Genres,
+        ["series_name"] = PresenceToken.SeriesName,
+        ["time_left"] = PresenceToken.TimeLeft,
+        ["activity"] = PresenceToken.Activity,
+        ["series_or_title"] = PresenceToken.SeriesOrTitle,
+        ["episode_code_title"] = PresenceToken.EpisodeCodeTitle,
+    };
+
+    [ThreadStatic]
+    private static StringBuilder? _builder;
+
+    // Literal text, or null where the token at the same index goes
+    private readonly string?[] _literals;
+    private readonly PresenceToken[] _tokens;
+    private readonly string? _constant;
+
+    private PresenceTemplate(List<string?> literals, List<PresenceToken> tokens)
+    {
+        _literals = literals.ToArray();
+        _tokens = tokens.ToArray();
+        if (_literals.Length == 0)
+        {
+            _constant = string.Empty;
+        }
+        else if (_literals.Length == 1 && _literals[0] != null)
+        {
+            _constant = _literals[0];
+        }
+    }
+
+    public static PresenceTemplate Parse(string? template)
+    {
+        var literals = new List<string?>();
+        var tokens = new List<PresenceToken>();
+        var text = template ?? string.Empty;
+        var literalStart = 0;
+        var i = 0;
+        while (i < text.Length)
+        {
+            var open = text.IndexOf('{', i);
+            if (open < 0)
+            {
+                break;
+            }
+            var close = text.IndexOf('}', open + 1);
+            if (close < 0)
+            {
+                break;
+            }
+            if (TokenNames.TryGetValue(text.Substring(open + 1, close - open - 1), out var token))
+            {
+                if (open > literalStart)
+                {
+                    literals.Add(text.Substring(literalStart, open - literalStart));
+                    tokens.Add(default);
+                }
+                literals.Add(null);
+                tokens.Add(token);
+                literalStart = close + 1;
+                i = close + 1;
+            }
+            else
+            {
+                // Not a token: keep scanning from the next character so "{{title}" still finds {title}
+                i = open + 1;
+            }
+        }
+        if (literalStart < text.Length)
+        {
+            literals.Add(text.Substring(literalStart));
+            tokens.Add(default);
+        }
+        return new PresenceTemplate(literals, tokens);
+    }
+
+    public string Render(string[] values)
+    {
+        if (_constant != null)
+        {
+            return _constant;
+        }
+        var sb = _builder ??= new StringBuilder(128);
+        sb.Clear();
+        for (var i = 0; i < _literals.Length; i++)
+        {
+            sb.Append(_literals[i] ?? values[(int)_tokens[i]]);
+        }
+        return sb.ToString();
+    }
+}
+
+// Every template in the configuration, parsed. Rebuilt when the plugin's
+// configuration is saved (ConfigurationVersion moves) or replaced.
+public sealed class PresenceTemplates
+{
+    private static PresenceTemplates? _current;
+
+    private readonly PluginConfiguration _config;
+    private readonly int _version;
+
+    private PresenceTemplates(PluginConfiguration config, int version)
+    {
+        _config = config;
+        _version = version;
+        EpisodeDetails = PresenceTemplate.Parse(config.Episodes?.DetailsTemplate);
+        EpisodeState = PresenceTemplate.Parse(config.Episodes?.StateTemplate);
+        MusicDetails = PresenceTemplate.Parse(config.Music?.DetailsTemplate);
+        MusicState = PresenceTemplate.Parse(config.Music?.StateTemplate);
+        MovieDetails = PresenceTemplate.Parse(config.Movies?.DetailsTemplate);
+        MovieState = PresenceTemplate.Parse(config.Movies?.StateTemplate);
+        LargeText = PresenceTemplate.Parse(config.LargeImageTextTemplate);
+        SmallText = PresenceTemplate.Parse(config.SmallImageTextTemplate);
+    }
+
+    public PresenceTemplate EpisodeDetails { get; }
+
+    public PresenceTemplate EpisodeState { get; }
+
+    public PresenceTemplate MusicDetails { get; }
+
+    public PresenceTemplate MusicState { get; }
+
+    public PresenceTemplate MovieDetails { get; }
+
+    public PresenceTemplate MovieState { get; }
+
+    public PresenceTemplate LargeText { get; }
+
+    public PresenceTemplate SmallText { get; }
+
+    public static PresenceTemplates For(PluginConfiguration config)
+    {
+        var version = Plugin.Instance?.ConfigurationVersion ?? 0;
+        var current = _current;
+        if (current != null && ReferenceEquals(current._config, config) && current._version == version)
+        {
+            return current;
+        }
+        // A race here only parses twice; the last one wins
+        current = new PresenceTemplates(config, version);
+        _current = current;
+        return current;
+    }
+}
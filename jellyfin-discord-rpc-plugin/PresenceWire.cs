@@ -0,0 +1,260 @@
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.IO.Compression;
+using System.Linq;
+using System.Security.Cryptography;
+using System.Text;
+using System.Text.Json;
+
+namespace Jellyfin.Plugin.DiscordRpc;
+
+// Encodes presence bodies for the wire: optional field projection (?fields=a,b),
+// MessagePack when the client accepts application/x-msgpack, and gzip/brotli
+// when the client advertises it in Accept-Encoding. Also builds the ETags that
+// let polling clients get a body-less 304 when nothing changed.
+public static class PresenceWire
+{
+    public const string MessagePackContentType = "application/x-msgpack";
+
+    // Bodies smaller than this (e.g. { active = false }) grow when compressed
+    public const int MinCompressBytes = 256;
+
+    // start_timestamp is recomputed as now - position on every request, so it
+    // wobbles by a second or two; bucketing keeps the ETag stable until a seek
+    public const int ETagBucketSeconds = 30;
+
+    // Weak ETag over the parts that decide the presence body
+    public static string ETag(params object?[] parts)
+    {
+        var joined = string.Join("|", parts.Select(p => p?.ToString() ?? string.Empty));
+        var hash = SHA256.HashData(Encoding.UTF8.GetBytes(joined));
+        return "W/\"" + Convert.ToHexString(hash, 0, 8).ToLowerInvariant() + "\"";
+    }
+
+    // Paused: the position itself. Playing: the bucketed start time, which
+    // stays put while playback runs at normal speed.
+    public static long TimeBucket(long? positionTicks, bool isPaused)
+    {
+        if (!positionTicks.HasValue)
+        {
+            return -1;
+        }
+        var positionSeconds = positionTicks.Value / TimeSpan.TicksPerSecond;
+        if (isPaused)
+        {
+            return positionSeconds;
+        }
+        return (DateTimeOffset.UtcNow.ToUnixTimeSeconds() - positionSeconds) / ETagBucketSeconds;
+    }
+
+    // If-None-Match with weak comparison (RFC 9110 section 13.1.2)
+    public static bool Matches(string? ifNoneMatch, string etag)
+    {
+        if (string.IsNullOrEmpty(ifNoneMatch))
+        {
+            return false;
+        }
+        var opaque = StripWeak(etag);
+        foreach (var candidate in ifNoneMatch.Split(',', StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries))
+        {
+            if (candidate == "*" || StripWeak(candidate) == opaque)
+            {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    private static string StripWeak(string tag)
+    {
+        return tag.StartsWith("W/", StringComparison.Ordinal) ? tag.Substring(2) : tag;
+    }
+
+    public static JsonElement Project(JsonElement body, string? fields)
+    {
+        if (string.IsNullOrWhiteSpace(fields) || body.ValueKind != JsonValueKind.Object)
+        {
+            return body;
+        }
+        var wanted = new HashSet<string>(
+            fields.Split(',', StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries),
+            StringComparer.OrdinalIgnoreCase);
+        // Always keep "active" so clients can tell idle from a trimmed body
+        wanted.Add("active");
+
+        using var buffer = new MemoryStream();
+        using (var writer = new Utf8JsonWriter(buffer))
+        {
+            writer.WriteStartObject();
+            foreach (var prop in body.EnumerateObject())
+            {
+                if (wanted.Contains(prop.Name) && prop.Value.ValueKind != JsonValueKind.Null)
+                {
+                    prop.WriteTo(writer);
+                }
+            }
+            writer.WriteEndObject();
+        }
+        using var doc = JsonDocument.Parse(buffer.ToArray());
+        return doc.RootElement.Clone();
+    }
+
+    public static bool AcceptsMessagePack(string? accept)
+    {
+        return !string.IsNullOrEmpty(accept) && accept.Contains(MessagePackContentType, StringComparison.OrdinalIgnoreCase);
+    }
+
+    // Returns "br", "gzip" or null depending on what the client accepts
+    public static string? PickEncoding(string? acceptEncoding)
+    {
+        if (string.IsNullOrEmpty(acceptEncoding))
+        {
+            return null;
+        }
+        var accepted = acceptEncoding.Split(',').Select(e => e.Split(';')[0].Trim().ToLowerInvariant()).ToList();
+        if (accepted.Contains("br")) return "br";
+        if (accepted.Contains("gzip")) return "gzip";
+        return null;
+    }
+
+    public static byte[] Compress(byte[] data, string encoding)
+    {
+        using var output = new MemoryStream();
+        using (Stream zip = encoding == "br"
+            ? new BrotliStream(output, CompressionLevel.Fastest, leaveOpen: true)
+            : new GZipStream(output, CompressionLevel.Fastest, leaveOpen: true))
+        {
+            zip.Write(data, 0, data.Length);
+        }
+        return output.ToArray();
+    }
+
+    public static byte[] ToMessagePack(JsonElement element)
+    {
+        using var output = new MemoryStream();
+        WriteMessagePack(output, element);
+        return output.ToArray();
+    }
+
+    // Minimal MessagePack writer covering the JSON value kinds presence bodies use
+    private static void WriteMessagePack(Stream s, JsonElement el)
+    {
+        switch (el.ValueKind)
+        {
+            case JsonValueKind.Object:
+                var props = el.EnumerateObject().ToList();
+                WriteHeader(s, props.Count, 0x80, 0xde, 0xdf);
+                foreach (var p in props)
+                {
+                    WriteString(s, p.Name);
+                    WriteMessagePack(s, p.Value);
+                }
+                break;
+            case JsonValueKind.Array:
+                var items = el.EnumerateArray().ToList();
+                WriteHeader(s, items.Count, 0x90, 0xdc, 0xdd);
+                foreach (var i in items)
+                {
+                    WriteMessagePack(s, i);
+                }
+                break;
+            case JsonValueKind.String:
+                WriteString(s, el.GetString() ?? string.Empty);
+                break;
+            case JsonValueKind.Number:
+                if (el.TryGetInt64(out var l))
+                {
+                    WriteInt(s, l);
+                }
+                else
+                {
+                    s.WriteByte(0xcb);
+                    WriteBigEndian(s, BitConverter.DoubleToInt64Bits(el.GetDouble()), 8);
+                }
+                break;
+            case JsonValueKind.True:
+                s.WriteByte(0xc3);
+                break;
+            case JsonValueKind.False:
+                s.WriteByte(0xc2);
+                break;
+            default:
+                s.WriteByte(0xc0);
+                break;
+        }
+    }
+
+    private static void WriteHeader(Stream s, int count, byte fix, byte marker16, byte marker32)
+    {
+        if (count < 16)
+        {
+            s.WriteByte((byte)(fix | count));
+        }
+        else if (count <= ushort.MaxValue)
+        {
+            s.WriteByte(marker16);
+            WriteBigEndian(s, count, 2);
+        }
+        else
+        {
+            s.WriteByte(marker32);
+            WriteBigEndian(s, count, 4);
+        }
+    }
+
+    private static void WriteString(Stream s, string value)
+    {
+        var bytes = Encoding.UTF8.GetBytes(value);
+        if (bytes.Length < 32)
+        {
+            s.WriteByte((byte)(0xa0 | bytes.Length));
+        }
+        else if (bytes.Length <= byte.MaxValue)
+        {
+            s.WriteByte(0xd9);
+            s.WriteByte((byte)bytes.Length);
+        }
+        else if (bytes.Length <= ushort.MaxValue)
+        {
+            s.WriteByte(0xda);
+            WriteBigEndian(s, bytes.Length, 2);
+        }
+        else
+        {
+            s.WriteByte(0xdb);
+            WriteBigEndian(s, bytes.Length, 4);
+        }
+        s.Write(bytes, 0, bytes.Length);
+    }
+
+    private static void WriteInt(Stream s, long v)
+    {
+        if (v >= 0 && v < 128)
+        {
+            s.WriteByte((byte)v);
+        }
+        else if (v < 0 && v >= -32)
+        {
+            s.WriteByte((byte)(0xe0 | (v + 32)));
+        }
+        else if (v >= int.MinValue && v <= int.MaxValue)
+        {
+            s.WriteByte(0xd2);
+            WriteBigEndian(s, v, 4);
+        }
+        else
+        {
+            s.WriteByte(0xd3);
+            WriteBigEndian(s, v, 8);
+        }
+    }
+
+    private static void WriteBigEndian(Stream s, long v, int size)
+    {
+        for (var i = size - 1; i >= 0; i--)
+        {
+            s.WriteByte((byte)(v >> (8 * i)));
+        }
+    }
+}
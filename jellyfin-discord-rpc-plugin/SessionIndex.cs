@@ -0,0 +1,146 @@
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Linq;
+using System.Threading;
+using System.Threading.Tasks;
+using MediaBrowser.Controller.Library;
+using MediaBrowser.Controller.Session;
+using Microsoft.Extensions.Hosting;
+
+namespace Jellyfin.Plugin.DiscordRpc;
+
+// Sessions that have something playing, keyed by user, kept current from
+// ISessionManager events so GetPresence doesn't scan every session on the
+// server for each poll. SessionInfo objects are live, so play state and
+// position stay current without events; only membership is tracked here.
+public class SessionIndex : IHostedService
+{
+    private readonly ISessionManager _sessionManager;
+    private readonly ConcurrentDictionary<Guid, ConcurrentDictionary<string, SessionInfo>> _byUser = new();
+    private readonly ConcurrentDictionary<string, Guid> _userIdsByName = new(StringComparer.OrdinalIgnoreCase);
+
+    public SessionIndex(ISessionManager sessionManager)
+    {
+        _sessionManager = sessionManager;
+    }
+
+    public Task StartAsync(CancellationToken cancellationToken)
+    {
+        _sessionManager.PlaybackStart += OnPlayback;
+        _sessionManager.PlaybackProgress += OnPlayback;
+        _sessionManager.PlaybackStopped += OnPlaybackStopped;
+        _sessionManager.SessionStarted += OnSession;
+        _sessionManager.SessionEnded += OnSessionEnded;
+
+        // Playback that started before the plugin loaded
+        foreach (var session in _sessionManager.Sessions)
+        {
+            Track(session);
+        }
+        return Task.CompletedTask;
+    }
+
+    public Task StopAsync(CancellationToken cancellationToken)
+    {
+        _sessionManager.PlaybackStart -= OnPlayback;
+        _sessionManager.PlaybackProgress -= OnPlayback;
+        _sessionManager.PlaybackStopped -= OnPlaybackStopped;
+        _sessionManager.SessionStarted -= OnSession;
+        _sessionManager.SessionEnded -= OnSessionEnded;
+        return Task.CompletedTask;
+    }
+
+    // Playing sessions for a user id; empty when nothing is playing
+    public IReadOnlyCollection<SessionInfo> ForUser(Guid userId)
+    {
+        return _byUser.TryGetValue(userId, out var sessions)
+            ? sessions.Values.Where(s => s.NowPlayingItem != null).ToList()
+            : Array.Empty<SessionInfo>();
+    }
+
+    // Same, by case-insensitive user name (the ?username= scope)
+    public IReadOnlyCollection<SessionInfo> ForUserName(string userName)
+    {
+        return _userIdsByName.TryGetValue(userName, out var userId)
+            ? ForUser(userId)
+            : Array.Empty<SessionInfo>();
+    }
+
+    // Every user's playing sessions (Presence/All)
+    public IReadOnlyCollection<SessionInfo> Playing()
+    {
+        return _byUser.Values
+            .SelectMany(sessions => sessions.Values)
+            .Where(s => s.NowPlayingItem != null)
+            .ToList();
+    }
+
+    private void OnPlayback(object? sender, PlaybackProgressEventArgs e)
+    {
+        if (e.Session != null)
+        {
+            Track(e.Session);
+        }
+    }
+
+    private void OnPlaybackStopped(object? sender, PlaybackStopEventArgs e)
+    {
+        if (e.Session != null)
+        {
+            Remove(e.Session);
+        }
+    }
+
+    private void OnSession(object? sender, SessionEventArgs e)
+    {
+        if (e.SessionInfo != null)
+        {
+            Track(e.SessionInfo);
+        }
+    }
+
+    private void OnSessionEnded(object? sender, SessionEventArgs e)
+    {
+        if (e.SessionInfo != null)
+        {
+            Remove(e.SessionInfo);
+        }
+    }
+
+    private void Track(SessionInfo session)
+    {
+        if (session.NowPlayingItem == null || session.UserId == Guid.Empty)
+        {
+            Remove(session);
+            return;
+        }
+        _byUser.GetOrAdd(session.UserId, _ => new ConcurrentDictionary<string, SessionInfo>())[session.Id] = session;
+        if (!string.IsNullOrEmpty(session.UserName))
+        {
+            _userIdsByName[session.UserName] = session.UserId;
+        }
+    }
+
+    private void Remove(SessionInfo session)
+    {
+        if (!_byUser.TryGetValue(session.UserId, out var sessions))
+        {
+            return;
+        }
+        sessions.TryRemove(session.Id, out _);
+        // Drop users with nothing playing so the index doesn't keep everyone ever seen
+        if (sessions.IsEmpty && _byUser.TryRemove(new KeyValuePair<Guid, ConcurrentDictionary<string, SessionInfo>>(session.UserId, sessions)))
+        {
+            if (!string.IsNullOrEmpty(session.UserName))
+            {
+                _userIdsByName.TryRemove(new KeyValuePair<string, Guid>(session.UserName, session.UserId));
+            }
+            // A Track that slipped in between the check and the removal: put it back
+            foreach (var raced in sessions.Values)
+            {
+                Track(raced);
+            }
+        }
+    }
+}
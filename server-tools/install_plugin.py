@@ -1,11 +1,16 @@
+import argparse
+import hashlib
 import os
 import shutil
 import subprocess
 import sys
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
@@ -23,9 +28,72 @@ def find_repo_root(start: Path) -> Path:
     )
 
 
-def build_plugin(plugin_dir: Path) -> Path:
+# Content-hash manifests let repeat installs skip work: the source manifest
+# decides whether dotnet publish runs, and the deploy manifest (kept in the
+# installed plugin folder) records which files this installer put there.
+SOURCE_MANIFEST = Path("obj") / "installer-sources.json"
+DEPLOY_MANIFEST = ".install-manifest.json"
+SOURCE_SUFFIXES = {".cs", ".csproj", ".html", ".js", ".json"}
+
+
+def hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_manifest(root: Path, files: List[Path]) -> Dict[str, str]:
+    return {p.relative_to(root).as_posix(): hash_file(p) for p in sorted(files)}
+
+
+def _read_manifest(path: Path) -> Dict[str, str]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _write_manifest(path: Path, manifest: Dict[str, str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def source_manifest(plugin_dir: Path) -> Dict[str, str]:
+    files = [
+        p for p in plugin_dir.rglob("*")
+        if p.is_file()
+        and p.suffix.lower() in SOURCE_SUFFIXES
+        and p.relative_to(plugin_dir).parts[0] not in ("bin", "obj")
+    ]
+    return build_manifest(plugin_dir, files)
+
+
+def publish_manifest(publish_dir: Path) -> Dict[str, str]:
+    files = [p for p in publish_dir.rglob("*") if p.is_file() and not p.name.startswith(".")]
+    return build_manifest(publish_dir, files)
+
+
+def publish_is_current(plugin_dir: Path, publish_dir: Path) -> bool:
+    if not any(publish_dir.glob("*.dll")):
+        return False
+    return _read_manifest(plugin_dir / SOURCE_MANIFEST) == source_manifest(plugin_dir)
+
+
+def build_plugin(plugin_dir: Path, force: bool = False) -> Path:
     publish_dir = plugin_dir / "bin" / "installer_publish"
     publish_dir.mkdir(parents=True, exist_ok=True)
+    if not force and publish_is_current(plugin_dir, publish_dir):
+        print("Plugin sources unchanged; skipping dotnet publish")
+        return publish_dir
+    if not shutil.which("dotnet"):
+        raise FileNotFoundError(
+            "dotnet SDK not found. Install .NET 8 SDK from https://dotnet.microsoft.com/ and rerun."
+        )
     cmd = [
         "dotnet",
         "publish",
@@ -35,6 +103,7 @@ def build_plugin(plugin_dir: Path) -> Path:
         str(publish_dir),
     ]
     subprocess.run(cmd, cwd=str(plugin_dir), check=True)
+    _write_manifest(plugin_dir / SOURCE_MANIFEST, source_manifest(plugin_dir))
     return publish_dir
 
 
@@ -89,29 +158,113 @@ def choose_plugin_dir() -> Path:
     )
 
 
-def install_publish(publish_dir: Path, plugins_root: Path) -> Path:
-    target_dir = plugins_root / "DiscordRpc"
-    if target_dir.exists():
+def _install_state_dir(plugins_root: Path) -> Path:
+    # Kept beside (not inside) the plugins folder so Jellyfin never loads the
+    # staged or previous copy as a second plugin
+    return plugins_root.parent / ".discordrpc-install"
+
+
+def _deploy_changes(publish_dir: Path, target_dir: Path, wanted: Dict[str, str], previous: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """Relative paths to copy from publish_dir, and stale paths to remove."""
+    copy: List[str] = []
+    for rel, digest in wanted.items():
+        dest = target_dir / rel
+        if dest.is_file() and previous.get(rel) == digest and hash_file(dest) == digest:
+            continue
+        copy.append(rel)
+    # Only files a previous install deployed count as stale; anything else in
+    # the folder (e.g. Jellyfin's meta.json) is left alone
+    remove = [rel for rel in previous if rel not in wanted and (target_dir / rel).exists()]
+    return copy, remove
+
+
+def _apply_changes(publish_dir: Path, target_dir: Path, wanted: Dict[str, str], copy: List[str], remove: List[str]) -> None:
+    for rel in copy:
+        dest = target_dir / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(publish_dir / rel, dest)
+    for rel in remove:
         try:
-            shutil.rmtree(target_dir)
-        except Exception:
-            # Fallback to removing files inside
-            for child in target_dir.glob("**/*"):
-                try:
-                    if child.is_file() or child.is_symlink():
-                        child.unlink()
-                except Exception:
-                    pass
-    target_dir.mkdir(parents=True, exist_ok=True)
+            (target_dir / rel).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not remove stale file {rel}: {e}")
+    _write_manifest(target_dir / DEPLOY_MANIFEST, wanted)
+
+
+def _swap_dirs(staging: Path, live: Path, previous: Path) -> None:
+    """Move live to previous, then staging to live.
 
-    for item in publish_dir.iterdir():
-        dest = target_dir / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest, dirs_exist_ok=True)
+    Two renames, not one atomic swap: between them there is no live folder at
+    all (a Jellyfin starting in that instant would not load the plugin). If
+    the second rename fails, the first is undone.
+    """
+    shutil.rmtree(previous, ignore_errors=True)
+    if live.exists():
+        os.replace(live, previous)
+    try:
+        os.replace(staging, live)
+    except OSError:
+        if previous.exists() and not live.exists():
+            os.replace(previous, live)
+        raise
+
+
+def install_publish(publish_dir: Path, plugins_root: Path) -> Tuple[Path, List[str]]:
+    """Install changed publish outputs into plugins/DiscordRpc.
+
+    The new version is assembled in a staging directory and swapped in with two
+    renames (see _swap_dirs); the version it replaces is kept for
+    rollback_install(). If staging or the swap fails (e.g. staging is on
+    another filesystem, or Windows has the DLLs locked) the install is
+    aborted with OSError and the live folder is left as it was; it is never
+    patched in place.
+
+    Returns the target directory and the relative paths that were written or
+    removed; an empty list means the deployed binaries were already identical.
+    """
+    target_dir = plugins_root / "DiscordRpc"
+    wanted = publish_manifest(publish_dir)
+    previous = _read_manifest(target_dir / DEPLOY_MANIFEST)
+    copy, remove = _deploy_changes(publish_dir, target_dir, wanted, previous)
+    changed = copy + remove
+    if not changed:
+        return target_dir, []
+
+    state_dir = _install_state_dir(plugins_root)
+    staging = state_dir / "staging"
+    try:
+        shutil.rmtree(staging, ignore_errors=True)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        plugins_root.mkdir(parents=True, exist_ok=True)
+        if target_dir.exists():
+            shutil.copytree(target_dir, staging)
         else:
-            shutil.copy2(item, dest)
+            staging.mkdir()
+        _apply_changes(publish_dir, staging, wanted, copy, remove)
+        _swap_dirs(staging, target_dir, state_dir / "previous")
+    except OSError as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise OSError(f"staged install into {target_dir} failed, nothing was changed: {e}") from e
+    return target_dir, changed
 
-    return target_dir
+
+def rollback_install(plugins_root: Path) -> bool:
+    """Swap the previously installed version back in; run again to undo."""
+    target_dir = plugins_root / "DiscordRpc"
+    state_dir = _install_state_dir(plugins_root)
+    previous = state_dir / "previous"
+    if not previous.is_dir():
+        return False
+    current = state_dir / "rollback"
+    shutil.rmtree(current, ignore_errors=True)
+    if target_dir.exists():
+        os.replace(target_dir, current)
+    os.replace(previous, target_dir)
+    if current.exists():
+        os.replace(current, previous)
+    return True
 
 
 def try_restart_service() -> None:
@@ -145,6 +298,13 @@ def try_restart_service() -> None:
 
 
 def main() -> None:
+    ap = argparse.ArgumentParser(description="Build and install the Discord RPC plugin")
+    ap.add_argument("--force", action="store_true", help="always publish, deploy and restart")
+    ap.add_argument("--rollback", action="store_true", help="swap the previously installed version back in and restart")
+    ap.add_argument("--inventory", type=Path, help="fleet mode: JSON inventory of Jellyfin targets")
+    ap.add_argument("--workers", type=int, default=4, help="fleet mode: targets deployed at once")
+    args = ap.parse_args()
+
     try:
         repo_root = find_repo_root(Path(__file__).parent)
     except FileNotFoundError as e:
@@ -153,29 +313,55 @@ def main() -> None:
 
     plugin_dir = repo_root / "jellyfin-discord-rpc-plugin"
 
-    # Ensure dotnet is available
-    if not shutil.which("dotnet"):
-        print(
-            "Error: dotnet SDK not found. Install .NET 8 SDK from https://dotnet.microsoft.com/ and rerun."
-        )
-        sys.exit(1)
+    if args.rollback and not args.inventory:
+        try:
+            plugins_root = choose_plugin_dir()
+        except PermissionError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not rollback_install(plugins_root):
+            print("No previous install to roll back to")
+            sys.exit(1)
+        print(f"Rolled back {plugins_root / 'DiscordRpc'} to the previous version")
+        try_restart_service()
+        print("Done.")
+        return
+
+    if args.rollback:
+        # Previous installs are on the targets already; nothing to build
+        sys.exit(run_fleet(args.inventory, None, workers=args.workers, force=args.force, rollback=True))
 
     try:
-        publish_dir = build_plugin(plugin_dir)
+        publish_dir = build_plugin(plugin_dir, force=args.force)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     except subprocess.CalledProcessError as e:
         print(f"dotnet publish failed with code {e.returncode}")
         sys.exit(e.returncode)
 
+    if args.inventory:
+        sys.exit(run_fleet(args.inventory, publish_dir, workers=args.workers, force=args.force))
+
     try:
         plugins_root = choose_plugin_dir()
     except PermissionError as e:
         print(f"Error: {e}")
         sys.exit(1)
 
-    target = install_publish(publish_dir, plugins_root)
-    print(f"Installed plugin to: {target}")
-
-    try_restart_service()
+    try:
+        target, changed = install_publish(publish_dir, plugins_root)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if changed:
+        print(f"Installed plugin to: {target} ({len(changed)} file(s) changed)")
+        try_restart_service()
+    elif args.force:
+        print(f"Plugin at {target} already up to date; restarting anyway (--force)")
+        try_restart_service()
+    else:
+        print(f"Plugin at {target} already up to date; skipping restart")
 
     # Optional: auto-configure plugin via Jellyfin API if env vars are present
     jellyfin_url = os.environ.get("JELLYFIN_URL")
@@ -196,57 +382,270 @@ def main() -> None:
                 pass
 
     if jellyfin_url and api_key:
-        _post_config(jellyfin_url, api_key)
+        print(_post_config(jellyfin_url, api_key)[1])
     else:
         print("Skipping config update (set env vars or cli-app/config.json)")
 
     print("Done.")
 
 
-def _wait_server(jellyfin_url: str, timeout: int = 60) -> bool:
-    end = time.time() + timeout
+def _probe(jellyfin_url: str, timeout: float = 2.0) -> bool:
     url = jellyfin_url.rstrip('/') + "/System/Info/Public"
+    try:
+        with urlopen(url, timeout=timeout) as resp:
+            return resp.status == 200
+    except Exception:
+        return False
+
+
+def _wait_server(jellyfin_url: str, timeout: int = 60, expect_down: float = 0.0) -> bool:
+    """Poll /System/Info/Public until it answers, backing off 0.25s -> 2s.
+
+    With expect_down > 0, first wait up to that many seconds for the server to
+    stop answering, so a restart that hasn't begun yet isn't mistaken for ready.
+    """
+    end = time.time() + timeout
+    if expect_down > 0:
+        down_by = min(end, time.time() + expect_down)
+        while time.time() < down_by and _probe(jellyfin_url, timeout=1.0):
+            time.sleep(0.25)
+    delay = 0.25
     while time.time() < end:
-        try:
-            with urlopen(url, timeout=5) as resp:
-                if resp.status == 200:
-                    return True
-        except Exception:
-            time.sleep(2)
+        if _probe(jellyfin_url):
+            return True
+        time.sleep(min(delay, max(0.0, end - time.time())))
+        delay = min(2.0, delay * 1.5)
     return False
 
 
-def _post_config(jellyfin_url: str, api_key: str) -> None:
-    if not _wait_server(jellyfin_url, timeout=90):
-        print("Server did not come back online in time; skipping config push")
-        return
+PLUGIN_ID = "7f1e77a0-6e64-4b3c-9a78-2f6f3e23f2f6"
+
+DEFAULT_PLUGIN_CONFIG = {
+    "DetailsTemplate": "{series_or_title}",
+    "StateTemplate": "{genres} • {time_left}",
+    "LargeImageKey": "jellyfin",
+    "LargeImageTextTemplate": "Jellyfin",
+    "SmallImageKey": "play",
+    "SmallImageTextTemplate": "{play_state}",
+    "IncludeTimestamps": True,
+    "UseItemCoverAsLargeImage": False,
+    "AssetKeyPrefix": "cover_",
+    "DefaultImageAssetKey": "jellyfin",
+    "Images": {"ENABLE_IMAGES": True}
+}
+
+
+def _merge_defaults(current: dict, defaults: dict) -> dict:
+    """Fill in defaults only where the server has no value, keeping admin edits."""
+    merged = dict(current)
+    for key, value in defaults.items():
+        if isinstance(value, dict):
+            existing = merged.get(key)
+            merged[key] = _merge_defaults(existing if isinstance(existing, dict) else {}, value)
+        elif merged.get(key) is None:
+            merged[key] = value
+    return merged
+
+
+def _changed_keys(old: dict, new: dict, prefix: str = "") -> List[str]:
+    keys: List[str] = []
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            keys.extend(_changed_keys(old[key], value, f"{prefix}{key}."))
+        elif old.get(key) != value:
+            keys.append(prefix + key)
+    return keys
+
+
+def _get_config(jellyfin_url: str, api_key: str) -> dict:
+    url = jellyfin_url.rstrip('/') + f"/Plugins/Configuration/{PLUGIN_ID}?api_key={api_key}"
+    req = Request(url, method='GET')
+    req.add_header('Accept', 'application/json')
+    with urlopen(req, timeout=10) as resp:
+        data = json.loads(resp.read().decode('utf-8') or "{}")
+    return data if isinstance(data, dict) else {}
+
+
+def _post_config(jellyfin_url: str, api_key: str, wait: bool = True) -> Tuple[bool, str]:
+    """Read the plugin config, add any missing defaults and POST only if that changed it."""
+    if wait and not _wait_server(jellyfin_url, timeout=90):
+        return False, "Server did not come back online in time; skipping config push"
+
+    try:
+        current = _get_config(jellyfin_url, api_key)
+    except HTTPError as e:
+        return False, f"Failed to read config: HTTP {e.code}"
+    except URLError as e:
+        return False, f"Failed to read config: {e}"
 
-    plugin_id = "7f1e77a0-6e64-4b3c-9a78-2f6f3e23f2f6"
-    cfg = {
-        "DetailsTemplate": "{series_or_title}",
-        "StateTemplate": "{genres} • {time_left}",
-        "LargeImageKey": "jellyfin",
-        "LargeImageTextTemplate": "Jellyfin",
-        "SmallImageKey": "play",
-        "SmallImageTextTemplate": "{play_state}",
-        "IncludeTimestamps": True,
-        "UseItemCoverAsLargeImage": False,
-        "AssetKeyPrefix": "cover_",
-        "DefaultImageAssetKey": "jellyfin",
-        "Images": {"ENABLE_IMAGES": True}
-    }
-
-    url = jellyfin_url.rstrip('/') + f"/Plugins/Configuration/{plugin_id}?api_key={api_key}"
+    cfg = _merge_defaults(current, DEFAULT_PLUGIN_CONFIG)
+    changed = _changed_keys(current, cfg)
+    if not changed:
+        return True, "Plugin configuration already up to date"
+
+    url = jellyfin_url.rstrip('/') + f"/Plugins/Configuration/{PLUGIN_ID}?api_key={api_key}"
     body = json.dumps(cfg).encode('utf-8')
     req = Request(url, data=body, method='POST')
     req.add_header('Content-Type', 'application/json')
     try:
         with urlopen(req, timeout=10) as resp:
-            print(f"Updated plugin configuration: HTTP {resp.status}")
+            return True, f"Updated plugin configuration ({', '.join(changed)}): HTTP {resp.status}"
     except HTTPError as e:
-        print(f"Failed to update config: HTTP {e.code}")
+        return False, f"Failed to update config: HTTP {e.code}"
     except URLError as e:
-        print(f"Failed to update config: {e}")
+        return False, f"Failed to update config: {e}"
+
+
+# Fleet mode: build once, then deploy/restart/configure many servers concurrently.
+# Inventory format:
+#   {"targets": [{"name": "den", "plugins_dir": "/mnt/den/jellyfin/plugins",
+#                 "jellyfin_url": "http://den:8096", "api_key": "...",
+#                 "restart": "api" | "service" | "none"}]}
+# "restart" defaults to "api" (POST /System/Restart) when a URL and key are
+# given, and to "service" (local systemd/sc) otherwise.
+
+
+@dataclass
+class FleetTarget:
+    name: str
+    plugins_dir: Path
+    jellyfin_url: Optional[str] = None
+    api_key: Optional[str] = None
+    restart: str = "api"
+    local: bool = False
+
+
+@dataclass
+class TargetReport:
+    name: str
+    ok: bool = True
+    changed: int = 0
+    message: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def load_inventory(path: Path) -> List[FleetTarget]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("targets", []) if isinstance(data, dict) else data
+    targets: List[FleetTarget] = []
+    for i, entry in enumerate(entries):
+        url = entry.get("jellyfin_url")
+        key = entry.get("api_key")
+        name = str(entry.get("name") or url or f"target{i + 1}")
+        restart = entry.get("restart") or ("api" if url and key else "none")
+        local = bool(entry.get("local", False))
+        # The service restart acts on this machine's jellyfin, whatever
+        # plugins_dir points at (often a mounted remote install)
+        if restart == "service" and not local:
+            raise ValueError(f'{name}: restart "service" needs "local": true')
+        targets.append(
+            FleetTarget(
+                name=name,
+                plugins_dir=Path(entry["plugins_dir"]).expanduser(),
+                jellyfin_url=url,
+                api_key=key,
+                restart=restart,
+                local=local,
+            )
+        )
+    return targets
+
+
+class _ServiceRestart:
+    """Restarts the local service at most once per run, however many targets ask."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._done = False
+
+    def __call__(self) -> None:
+        with self._lock:
+            if not self._done:
+                self._done = True
+                try_restart_service()
+
+
+def _restart_via_api(jellyfin_url: str, api_key: str) -> None:
+    url = jellyfin_url.rstrip('/') + f"/System/Restart?api_key={api_key}"
+    with urlopen(Request(url, data=b"", method='POST'), timeout=10):
+        pass
+
+
+def deploy_target(target: FleetTarget, publish_dir: Optional[Path], force: bool = False, rollback: bool = False,
+                  restart_service: Callable[[], None] = try_restart_service) -> TargetReport:
+    report = TargetReport(name=target.name)
+    started = time.perf_counter()
+
+    def lap(step: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        report.timings[step] = now - started
+        started = now
+
+    try:
+        if rollback:
+            if not rollback_install(target.plugins_dir):
+                report.ok = False
+                report.message = "no previous install to roll back to"
+                return report
+            changed = ["(rollback)"]
+        else:
+            _, changed = install_publish(publish_dir, target.plugins_dir)
+        report.changed = len(changed)
+        lap("deploy")
+
+        restarted = False
+        if changed or force:
+            if target.restart == "api" and target.jellyfin_url and target.api_key:
+                _restart_via_api(target.jellyfin_url, target.api_key)
+                restarted = True
+            elif target.restart == "service":
+                restart_service()
+                restarted = True
+        lap("restart")
+
+        if target.jellyfin_url:
+            ready = _wait_server(target.jellyfin_url, timeout=90, expect_down=10.0 if restarted else 0.0)
+            lap("ready")
+            if not ready:
+                report.ok = False
+                report.message = "server did not come back online"
+                return report
+            if target.api_key:
+                report.ok, report.message = _post_config(target.jellyfin_url, target.api_key, wait=False)
+                lap("config")
+        if not report.message:
+            report.message = "deployed" if changed else "up to date"
+    except Exception as e:
+        report.ok = False
+        report.message = f"{type(e).__name__}: {e}"
+    return report
+
+
+def run_fleet(inventory: Path, publish_dir: Optional[Path], workers: int = 4, force: bool = False,
+              rollback: bool = False) -> int:
+    try:
+        targets = load_inventory(inventory)
+    except (KeyError, ValueError) as e:
+        print(f"Error in {inventory}: {e}")
+        return 1
+    if not targets:
+        print(f"No targets in {inventory}")
+        return 1
+    print(f"Deploying to {len(targets)} target(s) with {max(1, workers)} worker(s)")
+    restart_service = _ServiceRestart()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        reports = list(pool.map(lambda t: deploy_target(t, publish_dir, force=force, rollback=rollback,
+                                                        restart_service=restart_service), targets))
+
+    steps = ("deploy", "restart", "ready", "config")
+    print(f"{'target':<20} {'status':<6} {'files':>5} " + " ".join(f"{s:>8}" for s in steps) + "    total  message")
+    for r in reports:
+        cols = " ".join(f"{r.timings[s]:>7.2f}s" if s in r.timings else f"{'-':>8}" for s in steps)
+        total = sum(r.timings.values())
+        print(f"{r.name:<20} {'ok' if r.ok else 'FAIL':<6} {r.changed:>5} {cols} {total:>7.2f}s  {r.message}")
+    return 0 if all(r.ok for r in reports) else 1
 
 
 if __name__ == "__main__":
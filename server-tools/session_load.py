@@ -0,0 +1,173 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+# Load script for the plugin's presence lookup. By default it runs against a
+# local stand-in for /Plugins/DiscordRpc/Presence/Me that mirrors the two
+# lookup strategies in PresenceController: scanning every session per request
+# (the old path) and the per-user SessionIndex. Point --url at a real server
+# to measure that instead.
+
+PRESENCE_PATH = "/Plugins/DiscordRpc/Presence/Me"
+
+
+class StandInSessions:
+    """Synthetic sessions; roughly one in three has something playing."""
+
+    def __init__(self, sessions: int, users: int, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.user_names = [f"user{i}" for i in range(users)]
+        self.sessions: List[dict] = []
+        for i in range(sessions):
+            user = rng.randrange(users)
+            playing = rng.random() < 0.33
+            self.sessions.append({
+                "Id": uuid.UUID(int=i).hex,
+                "UserId": user,
+                "UserName": self.user_names[user],
+                "NowPlayingItem": {"Id": i, "Name": f"Item {i}"} if playing else None,
+                "IsPaused": rng.random() < 0.2,
+                "LastActivityDate": rng.random(),
+            })
+        # What SessionIndex holds: playing sessions by user id, ids by name
+        self.by_user: Dict[int, Dict[str, dict]] = {}
+        self.ids_by_name = {name.lower(): uid for uid, name in enumerate(self.user_names)}
+        for s in self.sessions:
+            if s["NowPlayingItem"] is not None:
+                self.by_user.setdefault(s["UserId"], {})[s["Id"]] = s
+
+    def scan(self, user_name: str) -> List[dict]:
+        # sessionManager.Sessions.ToList() + case-insensitive UserName filter
+        sessions = list(self.sessions)
+        wanted = user_name.lower()
+        return [s for s in sessions if s["UserName"].lower() == wanted and s["NowPlayingItem"] is not None]
+
+    def index(self, user_name: str) -> List[dict]:
+        uid = self.ids_by_name.get(user_name.lower())
+        if uid is None:
+            return []
+        return [s for s in self.by_user.get(uid, {}).values() if s["NowPlayingItem"] is not None]
+
+    def presence(self, user_name: str, strategy: str) -> dict:
+        candidates = self.index(user_name) if strategy == "index" else self.scan(user_name)
+        if not candidates:
+            return {"active": False}
+        session = max(candidates, key=lambda s: (not s["IsPaused"], s["LastActivityDate"]))
+        return {"active": True, "details": session["NowPlayingItem"]["Name"], "is_paused": session["IsPaused"]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    store: StandInSessions
+    strategy = "scan"
+    lookup_ns: List[int] = []
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        if parsed.path != PRESENCE_PATH:
+            self.send_error(404)
+            return
+        user = (parse_qs(parsed.query).get("username") or [""])[0]
+        t0 = time.perf_counter_ns()
+        body = json.dumps(self.store.presence(user, self.strategy)).encode("utf-8")
+        elapsed = time.perf_counter_ns() - t0
+        with self.lock:
+            self.lookup_ns.append(elapsed)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_stand_in(store: StandInSessions, strategy: str) -> Tuple[ThreadingHTTPServer, str]:
+    handler = type("Handler", (_Handler,), {"store": store, "strategy": strategy, "lookup_ns": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_clients(url: str, api_key: str, user_names: List[str], clients: int, polls: int) -> List[float]:
+    """Each client polls `polls` times as its own user; returns latencies in ms."""
+
+    def client(i: int) -> List[float]:
+        name = user_names[i % len(user_names)]
+        target = f"{url.rstrip('/')}{PRESENCE_PATH}?username={name}"
+        headers = {"X-Emby-Token": api_key} if api_key else {}
+        out = []
+        for _ in range(polls):
+            t0 = time.perf_counter()
+            with urlopen(Request(target, headers=headers), timeout=10) as resp:
+                resp.read()
+            out.append((time.perf_counter() - t0) * 1000)
+        return out
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    return [ms for r in results for ms in r]
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stand_in_table(session_counts: List[int], users: int, clients: int, polls: int) -> None:
+    print(f"{'sessions':>8}  {'strategy':<8} {'lookup us':>10} {'p50 ms':>8} {'p95 ms':>8} {'cpu ms/cycle':>13}")
+    for count in session_counts:
+        store = StandInSessions(count, users)
+        for strategy in ("scan", "index"):
+            server, url = start_stand_in(store, strategy)
+            try:
+                latencies = run_clients(url, "", store.user_names, clients, polls)
+            finally:
+                server.shutdown()
+                server.server_close()
+            lookup_us = statistics.mean(server.RequestHandlerClass.lookup_ns) / 1000
+            # Lookup CPU for one poll interval with every client polling once
+            per_cycle = lookup_us * clients / 1000
+            print(f"{count:>8}  {strategy:<8} {lookup_us:>10.1f} {_pct(latencies, 0.5):>8.2f} "
+                  f"{_pct(latencies, 0.95):>8.2f} {per_cycle:>13.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load the presence endpoint: per-session scan vs per-user index")
+    ap.add_argument("--sessions", default="100,1000,5000", help="comma-separated session counts for the stand-in")
+    ap.add_argument("--users", type=int, default=50, help="distinct users in the stand-in")
+    ap.add_argument("--clients", type=int, default=32, help="concurrent polling clients")
+    ap.add_argument("--polls", type=int, default=50, help="requests per client")
+    ap.add_argument("--url", help="load a real Jellyfin server instead of the stand-in")
+    ap.add_argument("--api-key", default="", help="API key for --url")
+    ap.add_argument("--usernames", default="", help="comma-separated usernames to poll as (for --url)")
+    args = ap.parse_args()
+
+    if args.url:
+        names = [n for n in args.usernames.split(",") if n] or [""]
+        latencies = run_clients(args.url, args.api_key, names, args.clients, args.polls)
+        print(f"{len(latencies)} requests: p50 {_pct(latencies, 0.5):.2f} ms, "
+              f"p95 {_pct(latencies, 0.95):.2f} ms, max {max(latencies):.2f} ms")
+        return
+
+    try:
+        counts = [int(c) for c in args.sessions.split(",") if c]
+    except ValueError:
+        print("Error: --sessions must be comma-separated integers")
+        sys.exit(1)
+    stand_in_table(counts, args.users, args.clients, args.polls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from session_load import PRESENCE_PATH, _pct, run_clients
+
+# Load script for the plugin's template rendering. The local stand-in for
+# /Plugins/DiscordRpc/Presence/Me renders the four presence strings the way
+# PresenceController does, with either strategy:
+#
+#   replace   ten chained str.replace calls per template per request (old path)
+#   compiled  PresenceTemplate: parsed once per configuration version into
+#             literal/token segments, then one pass per render
+#
+# and reports the render CPU per request (thread CPU time, so other threads
+# don't count). --url loads a real server instead.
+
+TOKENS = ("title", "season_episode", "progress_percent", "play_state", "genres",
+          "series_name", "time_left", "activity", "series_or_title", "episode_code_title")
+
+# PluginConfiguration defaults
+DEFAULT_TEMPLATES = {
+    "Episodes": ("{series_name} {season_episode}", "\"{title}\" • {genres} • {time_left}"),
+    "Movies": ("{title}", "{genres} • {time_left}"),
+    "Music": ("{title}", "{series_name} • {genres}"),
+    "LargeImageText": "Jellyfin",
+    "SmallImageText": "{play_state}",
+}
+
+_TOKEN_RE = re.compile(r"\{(" + "|".join(TOKENS) + r")\}")
+
+
+class CompiledTemplate:
+    """Mirror of PresenceTemplate: parsed once into a positional format string,
+    so a render is a single pass over the template."""
+
+    __slots__ = ("fmt", "constant")
+
+    def __init__(self, template: str) -> None:
+        parts = []
+        pos = 0
+        for m in _TOKEN_RE.finditer(template):
+            parts.append(template[pos:m.start()].replace("{", "{{").replace("}", "}}"))
+            parts.append("{%d}" % TOKENS.index(m.group(1)))
+            pos = m.end()
+        parts.append(template[pos:].replace("{", "{{").replace("}", "}}"))
+        self.fmt = "".join(parts)
+        # No tokens: the template is its own rendering
+        self.constant: Optional[str] = template if pos == 0 else None
+
+    def render(self, values: List[str]) -> str:
+        if self.constant is not None:
+            return self.constant
+        return self.fmt.format(*values)
+
+
+class StandInPresence:
+    """Synthetic now-playing items and the template configuration."""
+
+    def __init__(self, items: int, templates: Dict[str, object], seed: int = 1) -> None:
+        rng = random.Random(seed)
+        genres = ["Drama", "Comedy", "Animation", "Documentary", "Thriller", "Rock", "Jazz"]
+        self.items = []
+        for i in range(items):
+            kind = rng.choice(("Episode", "Movie", "Audio"))
+            self.items.append({
+                "Type": kind,
+                "Name": f"Item {i}",
+                "SeriesName": f"Series {i % 97}" if kind != "Movie" else "",
+                "IndexNumber": rng.randint(1, 24) if kind == "Episode" else None,
+                "ParentIndexNumber": rng.randint(1, 9) if kind == "Episode" else None,
+                "Genres": rng.sample(genres, 3),
+                "Progress": rng.randint(0, 100),
+                "IsPaused": rng.random() < 0.2,
+            })
+        self.templates = templates
+        self.version = 0
+        self._compiled: Optional[Tuple[int, Dict[str, CompiledTemplate]]] = None
+
+    def compiled(self) -> Dict[str, CompiledTemplate]:
+        cached = self._compiled
+        if cached is None or cached[0] != self.version:
+            flat = {f"{k}.{i}": CompiledTemplate(t[i]) for k, t in self.templates.items() if isinstance(t, tuple) for i in (0, 1)}
+            flat["LargeImageText"] = CompiledTemplate(self.templates["LargeImageText"])
+            flat["SmallImageText"] = CompiledTemplate(self.templates["SmallImageText"])
+            cached = self._compiled = (self.version, flat)
+        return cached[1]
+
+    @staticmethod
+    def _values(item: dict) -> List[str]:
+        title, series = item["Name"], item["SeriesName"]
+        code = ""
+        if item["IndexNumber"] is not None:
+            code = f"S{item['ParentIndexNumber']:02}E{item['IndexNumber']:02}" if item["ParentIndexNumber"] is not None else f"E{item['IndexNumber']:02}"
+        return [
+            title, code, str(item["Progress"]), "Paused" if item["IsPaused"] else "Playing",
+            ", ".join(item["Genres"][:3]), series, "", "Listening" if item["Type"] == "Audio" else "Watching",
+            f"{series} {code}" if series and code else (series or title), title,
+        ]
+
+    @staticmethod
+    def _section(item: dict) -> str:
+        return "Episodes" if item["Type"] == "Episode" else "Music" if item["Type"] == "Audio" else "Movies"
+
+    def render(self, index: int, strategy: str) -> dict:
+        item = self.items[index % len(self.items)]
+        section = self._section(item)
+        values = self._values(item)
+        if strategy == "compiled":
+            compiled = self.compiled()
+            texts = [compiled[f"{section}.0"].render(values), compiled[f"{section}.1"].render(values),
+                     compiled["LargeImageText"].render(values), compiled["SmallImageText"].render(values)]
+        else:
+            def replace_tokens(template: str) -> str:
+                for name, value in zip(TOKENS, values):
+                    template = template.replace("{" + name + "}", value)
+                return template
+
+            details, state = self.templates[section]
+            texts = [replace_tokens(details), replace_tokens(state),
+                     replace_tokens(self.templates["LargeImageText"]), replace_tokens(self.templates["SmallImageText"])]
+        return {"active": True, "details": texts[0], "state": texts[1], "large_text": texts[2], "small_text": texts[3]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    store: StandInPresence
+    strategy = "replace"
+    render_ns: List[int] = []
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        if parsed.path != PRESENCE_PATH:
+            self.send_error(404)
+            return
+        user = (parse_qs(parsed.query).get("username") or ["user0"])[0]
+        t0 = time.thread_time_ns()
+        presence = self.store.render(int(user.removeprefix("user") or 0), self.strategy)
+        elapsed = time.thread_time_ns() - t0
+        body = json.dumps(presence).encode("utf-8")
+        with self.lock:
+            self.render_ns.append(elapsed)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_stand_in(store: StandInPresence, strategy: str) -> Tuple[ThreadingHTTPServer, str]:
+    handler = type("Handler", (_Handler,), {"store": store, "strategy": strategy, "render_ns": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load the presence endpoint: chained Replace vs precompiled templates")
+    ap.add_argument("--items", type=int, default=500, help="distinct now-playing items in the stand-in")
+    ap.add_argument("--clients", type=int, default=32, help="concurrent polling clients")
+    ap.add_argument("--polls", type=int, default=100, help="requests per client")
+    ap.add_argument("--templates", help="JSON file with Episodes/Movies/Music [details, state] and LargeImageText/SmallImageText")
+    ap.add_argument("--url", help="load a real Jellyfin server instead of the stand-in")
+    ap.add_argument("--api-key", default="", help="API key for --url")
+    ap.add_argument("--usernames", default="", help="comma-separated usernames to poll as (for --url)")
+    args = ap.parse_args()
+
+    if args.url:
+        names = [n for n in args.usernames.split(",") if n] or [""]
+        latencies = run_clients(args.url, args.api_key, names, args.clients, args.polls)
+        print(f"{len(latencies)} requests: p50 {_pct(latencies, 0.5):.2f} ms, "
+              f"p95 {_pct(latencies, 0.95):.2f} ms, max {max(latencies):.2f} ms")
+        return
+
+    templates: Dict[str, object] = dict(DEFAULT_TEMPLATES)
+    if args.templates:
+        with open(args.templates, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        templates.update({k: tuple(v) if isinstance(v, list) else v for k, v in loaded.items()})
+
+    store = StandInPresence(args.items, templates)
+    names = [f"user{i}" for i in range(args.items)]
+    print(f"{'strategy':<9} {'render us':>10} {'p50 ms':>8} {'p95 ms':>8} {'cpu ms/cycle':>13}")
+    for strategy in ("replace", "compiled"):
+        server, url = start_stand_in(store, strategy)
+        try:
+            latencies = run_clients(url, "", names, args.clients, args.polls)
+        finally:
+            server.shutdown()
+            server.server_close()
+        render_us = statistics.mean(server.RequestHandlerClass.render_ns) / 1000
+        # Render CPU for one poll interval with every client polling once
+        per_cycle = render_us * args.clients / 1000
+        print(f"{strategy:<9} {render_us:>10.1f} {_pct(latencies, 0.5):>8.2f} "
+              f"{_pct(latencies, 0.95):>8.2f} {per_cycle:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
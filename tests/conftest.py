@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# cli-app and server-tools are flat script directories whose modules import
+# each other by name; put them on the path the way running a script there does
+ROOT = Path(__file__).resolve().parent.parent
+for directory in ("cli-app", "server-tools"):
+    sys.path.insert(0, str(ROOT / directory))
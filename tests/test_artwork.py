@@ -0,0 +1,141 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from artwork import BAD_TTL, OK_TTL, ArtworkResolver, art_key  # noqa: E402
+
+
+class _Images(BaseHTTPRequestHandler):
+    hits: list
+    release: threading.Event
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        self.release.wait(5)
+        ok = "/Items/good" in self.path
+        body = b"\x89PNG" if ok else b"<html>"
+        self.send_response(200 if ok else 404)
+        self.send_header("Content-Type", "image/png" if ok else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    handler = type("Images", (_Images,), {"hits": [], "release": threading.Event()})
+    handler.release.set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}"
+    handler.release.set()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _presence(base, item, tag="t1"):
+    return {"public_cover_url": f"{base}/Items/{item}/Images/Primary?quality=90&tag={tag}"}
+
+
+def _settle(resolver, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not resolver.settled():
+        assert time.monotonic() < deadline, "check never finished"
+        time.sleep(0.01)
+
+
+def test_art_key_is_image_item_and_tag():
+    assert art_key("https://x/Items/ABC/Images/Primary?fillWidth=512&tag=t9") == ("abc", "t9")
+    assert art_key("jellyfin") == ("jellyfin", "")
+
+
+def test_first_resolve_doesnt_wait_for_the_check(server):
+    handler, base = server
+    handler.release.clear()
+    resolver = ArtworkResolver({"jellyfin_url": base}, "fallback")
+    started = time.monotonic()
+    assert resolver.resolve(_presence(base, "good")) == "fallback"
+    assert time.monotonic() - started < 0.5
+    assert not resolver.settled()
+    handler.release.set()
+    _settle(resolver)
+    url = resolver.resolve(_presence(base, "good"))
+    assert url.startswith(f"{base}/Items/good/")
+    assert not resolver.settled()
+
+
+def test_good_and_bad_covers_are_cached_for_their_ttls(server):
+    handler, base = server
+    resolver = ArtworkResolver({"jellyfin_url": base}, "fallback")
+    for item in ("good", "bad"):
+        resolver.warm(_presence(base, item)["public_cover_url"]).result(5)
+    assert resolver.resolve(_presence(base, "bad")) == "fallback"
+    assert "/Items/good/" in resolver.resolve(_presence(base, "good"))
+    assert len(handler.hits) == 2
+
+    now = time.monotonic()
+    ok, ok_until = resolver._cache[("good", "t1")]
+    bad, bad_until = resolver._cache[("bad", "t1")]
+    assert ok and ok_until - now == pytest.approx(OK_TTL, abs=5)
+    assert not bad and bad_until - now == pytest.approx(BAD_TTL, abs=5)
+
+    # Expired: checked again
+    resolver._cache[("bad", "t1")] = (False, now - 1)
+    resolver.warm(_presence(base, "bad")["public_cover_url"]).result(5)
+    assert len(handler.hits) == 3
+
+
+def test_new_tag_keeps_the_last_good_cover_until_checked(server):
+    handler, base = server
+    resolver = ArtworkResolver({"jellyfin_url": base}, "fallback")
+    resolver.warm(_presence(base, "good")["public_cover_url"]).result(5)
+    first = resolver.resolve(_presence(base, "good"))
+
+    handler.release.clear()
+    assert resolver.resolve(_presence(base, "good", tag="t2")) == first
+    assert resolver.resolve(_presence(base, "goodother")) == "fallback"
+    handler.release.set()
+    _settle(resolver)
+
+
+def test_concurrent_checks_of_one_cover_share_a_request(server):
+    handler, base = server
+    handler.release.clear()
+    resolver = ArtworkResolver({"jellyfin_url": base}, "fallback")
+    url = _presence(base, "good")["public_cover_url"]
+    futures = [resolver.warm(url) for _ in range(5)]
+    handler.release.set()
+    assert all(f.result(5) for f in futures)
+    assert len(handler.hits) == 1
+
+
+def test_prefetch_warms_the_next_episode(server):
+    handler, base = server
+    resolver = ArtworkResolver({"jellyfin_url": base}, "fallback")
+    calls = []
+
+    class Endpoints:
+        def call(self, fn):
+            return fn(base)
+
+    def fetch_json(url, params):
+        calls.append((url, params))
+        return {"Items": [{"Id": "ep1"}, {"Id": "ep2", "ImageTags": {"Primary": "t5"}}]}
+
+    data = {"item_id": "ep-1", "series_id": "goodseries", "end_timestamp": time.time() + 60, "is_paused": False}
+    resolver.maybe_prefetch(data, Endpoints(), fetch_json)
+    resolver.maybe_prefetch(data, Endpoints(), fetch_json)  # once per item
+    deadline = time.monotonic() + 5
+    while ("goodseries", "t5") not in resolver._cache:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert len(calls) == 1
+    assert calls[0][0] == f"{base}/Shows/goodseries/Episodes"
+    assert handler.hits == ["/Items/goodseries/Images/Primary?quality=90&fillHeight=512&fillWidth=512&tag=t5"]
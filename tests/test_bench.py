@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import bench
+from templates import RESOLVERS, TOKENS
+
+
+def test_resolvers_view_is_read_only():
+    assert tuple(RESOLVERS) == TOKENS
+    with pytest.raises(TypeError):
+        RESOLVERS["title"] = lambda data, now: ""
+
+
+def test_replace_mirror_renders_like_the_compiled_templates():
+    compiled = bench.CASES["templates.compiled"]()()
+    replaced = bench.CASES["templates.replace"]()()
+    assert compiled == replaced == ("Doctor Who S01E01", '"Rose" • Action, Drama, Mystery • 15:00 left')
+
+
+def test_every_case_runs():
+    for name, setup in bench.CASES.items():
+        fn = setup()
+        fn()
+        assert bench.measure(fn, number=5, repeat=1) > 0, name
+
+
+def test_compare_flags_only_slowdowns_past_the_tolerance(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    bench.save_baseline(path, {"a": {"ns": 100.0, "peak_bytes": 0.0}, "b": {"ns": 100.0, "peak_bytes": 0.0}})
+    assert set(json.loads(path.read_text())["results"]) == {"a", "b"}
+
+    results = {"a": {"ns": 115.0}, "b": {"ns": 130.0}, "c": {"ns": 5.0}}
+    assert bench.compare_baseline(path, results, tolerance=0.20) == 1
+    out = capsys.readouterr().out
+    assert "REGRESSION" in out.splitlines()[-2]  # b
+    assert "(new)" in out
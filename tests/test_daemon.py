@@ -0,0 +1,77 @@
+import socket
+import threading
+
+import pytest
+
+import daemon as dm
+
+
+@pytest.fixture
+def notify(tmp_path, monkeypatch):
+    """A NOTIFY_SOCKET that collects the daemon's sd_notify messages."""
+    if not hasattr(socket, "AF_UNIX"):
+        pytest.skip("sd_notify needs Unix sockets")
+    path = str(tmp_path / "notify")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    sock.settimeout(0.01)
+    monkeypatch.setenv("NOTIFY_SOCKET", path)
+
+    def messages():
+        out = []
+        while True:
+            try:
+                out.append(sock.recv(4096).decode())
+            except OSError:
+                return out
+
+    yield messages
+    sock.close()
+
+
+def test_each_sleep_is_one_wakeup(monkeypatch):
+    monkeypatch.delenv("WATCHDOG_USEC", raising=False)
+    d = dm.Daemon()
+    for _ in range(3):
+        assert d.sleep(0.01) is False
+    d.sleep(0)
+    assert d.wakeups == 3
+
+
+def test_watchdog_splits_long_sleeps(monkeypatch, notify):
+    monkeypatch.setenv("WATCHDOG_USEC", "200000")
+    monkeypatch.delenv("WATCHDOG_PID", raising=False)
+    d = dm.Daemon()
+    d.sleep(0.35)
+    # Pinged by the half-way mark of each 0.2 s period: a few wakeups, not one
+    assert 3 <= d.wakeups <= 6
+    assert notify().count("WATCHDOG=1") >= 2
+
+
+def test_early_wake_counts_and_returns_true(monkeypatch):
+    monkeypatch.delenv("WATCHDOG_USEC", raising=False)
+    d = dm.Daemon()
+    event = threading.Event()
+    threading.Timer(0.05, event.set).start()
+    assert d.sleep(5.0, event.wait) is True
+    assert d.wakeups == 1
+    event.clear()
+    assert d.sleep(0.02, event.wait) is False
+    assert d.wakeups == 2
+
+
+def test_report_counts_the_window(monkeypatch, notify):
+    monkeypatch.delenv("WATCHDOG_USEC", raising=False)
+    d = dm.Daemon()
+    d.sleep(0.01)
+    d.sleep(0.01)
+    line = d.report(now=d.started + 3600.0)
+    assert line.startswith("2 wakeups/h, RSS ")
+    assert any(m.startswith("STATUS=Polling Jellyfin (2 wakeups/h") for m in notify())
+    # A new window starts after each report
+    assert d.report(now=d.started + 7200.0).startswith("0 wakeups/h")
+
+
+def test_quiet_console_strips_markup(capsys):
+    dm.QuietConsole().print("[bold red]Failed[/bold red] to connect")
+    assert capsys.readouterr().err == "Failed to connect\n"
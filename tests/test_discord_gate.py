@@ -0,0 +1,94 @@
+import socket
+
+import pytest
+
+import discord_gate as dg
+from discord_gate import ConsumerGate
+
+
+class Clock:
+    """Fake monotonic clock; sleep() advances it and records the delay."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(dg.time, "monotonic", c.monotonic)
+    return c
+
+
+def test_wait_backs_off_to_the_cap(clock):
+    answers = iter([False] * 6 + [True])
+    gate = ConsumerGate(lambda: next(answers), retry=5.0, max_retry=30.0)
+    assert gate.wait(clock.sleep) == 5 + 10 + 20 + 30 + 30 + 30
+    assert clock.sleeps == [5, 10, 20, 30, 30, 30]
+
+
+def test_wait_returns_at_once_when_the_consumer_is_there(clock):
+    gate = ConsumerGate(lambda: True)
+    assert gate.wait(clock.sleep) == 0
+    assert clock.sleeps == []
+
+
+def test_wait_uses_the_stricter_confirm_check(clock):
+    confirms = iter([False, True])
+    gate = ConsumerGate(lambda: True, retry=1.0, confirm=lambda: next(confirms))
+    gate.wait(clock.sleep)
+    assert clock.sleeps == [1.0]
+
+
+def test_positive_answers_are_cached_for_ttl(clock):
+    calls = []
+
+    def check():
+        calls.append(clock.now)
+        return True
+
+    gate = ConsumerGate(check, ttl=30.0)
+    assert gate.available() and gate.available()
+    assert len(calls) == 1
+    clock.now += 31
+    assert gate.available()
+    assert len(calls) == 2
+    gate.invalidate()
+    assert gate.available()
+    assert len(calls) == 3
+
+
+def test_negative_answers_are_not_cached(clock):
+    answers = iter([False, True])
+    gate = ConsumerGate(lambda: next(answers), ttl=30.0)
+    assert not gate.available()
+    assert gate.available()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets")
+def test_ipc_checks_find_the_socket_and_tell_stale_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(dg, "_runtime_dirs", lambda: iter([str(tmp_path)]))
+    assert not dg.discord_ipc_available()
+
+    flatpak = tmp_path / "app" / "com.discordapp.Discord"
+    flatpak.mkdir(parents=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(flatpak / "discord-ipc-0"))
+    server.listen(1)
+    try:
+        assert dg.ipc_socket_paths() == [str(flatpak / "discord-ipc-0")]
+        assert dg.discord_ipc_available()
+        assert dg.discord_ipc_listening()
+    finally:
+        server.close()
+    # The file a crashed Discord leaves behind exists but accepts nothing
+    assert dg.discord_ipc_available()
+    assert not dg.discord_ipc_listening()
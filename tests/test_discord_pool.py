@@ -0,0 +1,98 @@
+import pytest
+
+from discord_pool import PresencePool, media_kind
+
+IDS = {"episodes": "tv", "movies": "film", "music": "tunes", "games": "ignored"}
+
+
+class FakePresence:
+    def __init__(self, client_id, log):
+        self.client_id = client_id
+        self.log = log
+        log.append(("connect", client_id))
+
+    def clear(self):
+        self.log.append(("clear", self.client_id))
+
+    def close(self):
+        self.log.append(("close", self.client_id))
+
+
+@pytest.fixture
+def log():
+    return []
+
+
+@pytest.fixture
+def pool(log):
+    return PresencePool(lambda cid: FakePresence(cid, log), "default", IDS, idle_timeout=100)
+
+
+def test_media_kinds_follow_the_plugin_sections():
+    assert media_kind("Episode") == "episodes"
+    assert media_kind("Audio") == media_kind("MusicAlbum") == "music"
+    assert media_kind("Movie") == media_kind(None) == "movies"
+
+
+def test_client_ids_per_kind_with_default_fallback(log):
+    pool = PresencePool(lambda cid: FakePresence(cid, log), "default", {"music": "tunes"})
+    assert pool.client_id_for("Audio") == "tunes"
+    assert pool.client_id_for("Episode") == "default"
+
+
+def test_prewarm_connects_each_app_once(pool, log):
+    pool.prewarm()
+    pool.prewarm()
+    assert sorted(cid for op, cid in log if op == "connect") == ["default", "film", "tunes", "tv"]
+    assert len(pool) == 4
+
+
+def test_switch_clears_the_previous_app_only(pool, log):
+    pool.prewarm()
+    log.clear()
+    rpc = pool.switch("tv")
+    assert rpc.client_id == "tv" and log == []
+    assert pool.switch("tv") is rpc
+    pool.switch("tunes")
+    assert log == [("clear", "tv")]
+    assert pool.active == "tunes"
+
+
+def test_failed_connect_during_prewarm_is_skipped(log):
+    def connect(cid):
+        if cid == "film":
+            raise ConnectionRefusedError(cid)
+        return FakePresence(cid, log)
+
+    pool = PresencePool(connect, "default", IDS)
+    pool.prewarm()
+    assert len(pool) == 3
+
+
+def test_evict_idle_keeps_the_active_app_and_rewarm_reopens(pool, log):
+    pool.prewarm()
+    pool.switch("tv")
+    later = pool._slots["tv"].last_used + 150
+    # Something playing: nothing is closed however long the spares sat unused
+    assert pool.evict_idle(now=later, busy=True) == 0
+    assert pool.evict_idle(now=later) == 3
+    assert len(pool) == 1
+    assert sorted(cid for op, cid in log if op == "close") == ["default", "film", "tunes"]
+
+    log.clear()
+    pool.rewarm()
+    assert sorted(cid for op, cid in log if op == "connect") == ["default", "film", "tunes"]
+    log.clear()
+    pool.rewarm()  # only once per eviction
+    assert log == []
+
+
+def test_close_all_forgets_everything(pool, log):
+    pool.prewarm()
+    pool.switch("tv")
+    pool.evict_idle(now=pool._slots["tv"].last_used + 150)
+    pool.close_all()
+    assert len(pool) == 0 and pool.active is None
+    log.clear()
+    pool.rewarm()
+    assert log == []
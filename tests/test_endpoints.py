@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from endpoints import HEDGE_MIN_SAMPLES, EndpointPool, jellyfin_urls, public_base_url, rebase_url
+
+LAN, WAN, SPARE = "http://10.0.0.2:8096", "https://media.example", "http://spare:8096"
+
+
+def _pool(hedge=False):
+    pool = EndpointPool([LAN, WAN, SPARE], hedge=hedge)
+    pool._next_probe = float("inf")  # no background pings to real hosts
+    return pool
+
+
+def _fast(pool, url, seconds=0.01):
+    ep = next(e for e in pool.endpoints if e.url == url)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        pool.record(ep, seconds)
+    return ep
+
+
+def test_urls_from_any_config_shape():
+    assert jellyfin_urls({"jellyfin_url": f" {LAN}/ , {WAN}"}) == [LAN, WAN]
+    assert jellyfin_urls({"jellyfin_url": [LAN, WAN + "/"]}) == [LAN, WAN]
+    assert public_base_url({"jellyfin_url": [LAN, WAN]}) == WAN
+    assert public_base_url({"jellyfin_url": [LAN], "public_url": "https://pub/"}) == "https://pub"
+
+
+def test_rebase_points_lan_urls_at_the_public_endpoint():
+    cfg = {"jellyfin_url": [LAN, WAN]}
+    assert rebase_url(f"{LAN}/Items/1/Images/Primary?tag=x", cfg) == f"{WAN}/Items/1/Images/Primary?tag=x"
+    assert rebase_url(f"{WAN}/Items/1", cfg) == f"{WAN}/Items/1"
+    assert rebase_url("https://elsewhere/x", cfg) == "https://elsewhere/x"
+
+
+def test_fastest_endpoint_goes_first():
+    pool = _pool()
+    _fast(pool, WAN, 0.01)
+    _fast(pool, LAN, 0.05)
+    assert [ep.url for ep in pool.ranked()][:2] == [WAN, LAN]
+
+
+def test_failover_tries_each_endpoint_once_and_backs_off():
+    pool = _pool()
+    _fast(pool, LAN)
+    calls = []
+
+    def fn(base):
+        calls.append(base)
+        if base == LAN:
+            raise ConnectionError("down")
+        return base
+
+    assert pool.call(fn) in (WAN, SPARE)
+    assert calls[0] == LAN and len(calls) == 2
+    # The failed endpoint now waits out its backoff behind the healthy ones
+    assert pool.ranked()[-1].url == LAN
+
+
+def test_all_failing_raises_the_last_error():
+    pool = _pool()
+    calls = []
+
+    def fn(base):
+        calls.append(base)
+        raise ConnectionError(base)
+
+    with pytest.raises(ConnectionError):
+        pool.call(fn)
+    assert sorted(calls) == sorted([LAN, WAN, SPARE])
+
+
+def test_slow_primary_is_hedged_on_the_runner_up():
+    pool = _pool(hedge=True)
+    _fast(pool, LAN, 0.01)
+    _fast(pool, WAN, 0.02)
+
+    def fn(base):
+        if base == LAN:
+            time.sleep(0.3)
+        return base
+
+    assert pool.call(fn) == WAN
+    assert pool.hedged == 1
+
+
+def test_failed_hedge_continues_past_both_racers():
+    pool = _pool(hedge=True)
+    _fast(pool, LAN, 0.01)
+    _fast(pool, WAN, 0.02)
+    calls = []
+    lock = threading.Lock()
+
+    def fn(base):
+        with lock:
+            calls.append(base)
+        if base == LAN:
+            time.sleep(0.1)
+        if base != SPARE:
+            raise ConnectionError(base)
+        return base
+
+    assert pool.call(fn) == SPARE
+    # The runner-up already raced; it isn't asked a second time
+    assert sorted(calls) == sorted([LAN, WAN, SPARE])
+    assert all(ep.failures == 1 for ep in pool.endpoints if ep.url != SPARE)
+
+
+def test_losing_racer_is_recorded_against_its_endpoint(caplog):
+    pool = _pool(hedge=True)
+    lan = _fast(pool, LAN, 0.01)
+    _fast(pool, WAN, 0.02)
+    release = threading.Event()
+
+    def fn(base):
+        if base == LAN:
+            release.wait(5)
+            raise ConnectionError("reset")
+        return base
+
+    assert pool.call(fn) == WAN
+    release.set()
+    deadline = time.monotonic() + 5
+    while lan.failures == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert lan.failures == 1
+    assert any("hedged race" in r.getMessage() and LAN in r.getMessage() for r in caplog.records)
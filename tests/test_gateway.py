@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import gateway
+from endpoints import EndpointPool
+from gateway import GatewayFeed, Hub, is_loopback, poll_forever, serve
+
+ALICE = {"user_name": "Alice", "active": True, "item_id": "1", "details": "Show S01E01",
+         "state": "Drama • 40:00 left", "start_timestamp": 1000, "end_timestamp": 3400}
+BOB = {"user_name": "bob", "active": True, "item_id": "2", "details": "Movie", "start_timestamp": 500}
+
+
+def _drift(body, seconds=1, left="39:59"):
+    out = dict(body, start_timestamp=body["start_timestamp"] + seconds)
+    if "state" in out:
+        out["state"] = f"Drama • {left} left"
+    return out
+
+
+def test_publish_pushes_only_meaningful_changes():
+    hub = Hub()
+    assert hub.publish({"alice": ALICE, "bob": BOB}) == 2
+    assert hub.publish({"alice": _drift(ALICE), "bob": BOB}) == 0
+    assert hub.publish({"alice": dict(ALICE, item_id="9"), "bob": BOB}) == 1
+    # Missing from the poll: stopped
+    assert hub.publish({"alice": dict(ALICE, item_id="9")}) == 1
+    assert json.loads(hub.get("BOB")[1]) == {"active": False}
+    assert hub.get("nobody") == (0, b'{"active":false}')
+
+
+def test_suppression_is_counted_per_user():
+    hub = Hub()
+    hub.publish({"alice": ALICE, "bob": BOB})
+    hub.publish({"alice": _drift(ALICE), "bob": _drift(BOB)})
+    hub.publish({"alice": _drift(ALICE, 2, "39:58"), "bob": BOB})
+    assert hub.suppressed("alice") == 2
+    assert hub.suppressed("Bob") == 1
+    assert hub.suppressed("carol") == 0
+
+
+def test_wait_returns_newer_seq_or_times_out():
+    hub = Hub()
+    hub.publish({"alice": ALICE})
+    seq, _ = hub.get("alice")
+    assert hub.wait("alice", seq, 0.05) == hub.get("alice")
+    threading.Timer(0.05, hub.publish, args=({"alice": dict(ALICE, item_id="3")},)).start()
+    new_seq, body = hub.wait("Alice", seq, 5)
+    assert new_seq > seq and json.loads(body)["item_id"] == "3"
+
+
+def test_serve_refuses_open_addresses_without_a_token():
+    assert is_loopback("127.0.0.1") and is_loopback("[::1]") and is_loopback("localhost")
+    assert not is_loopback("0.0.0.0")
+    with pytest.raises(ValueError):
+        serve(Hub(), "0.0.0.0:0")
+
+
+@pytest.fixture
+def served():
+    hub = Hub()
+    server = serve(hub, "127.0.0.1:0", token="s3cret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield hub, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _get(port, path, headers=None):
+    conn = HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    resp = conn.getresponse()
+    return resp, conn
+
+
+def test_token_from_header_or_query(served):
+    hub, port = served
+    hub.publish({"alice": ALICE})
+    resp, conn = _get(port, "/presence/alice")
+    assert resp.status == 401
+    conn.close()
+    resp, conn = _get(port, "/presence/alice", {"Authorization": "Bearer s3cret"})
+    assert resp.status == 200 and json.loads(resp.read())["item_id"] == "1"
+    conn.close()
+    resp, conn = _get(port, "/presence/alice?token=s3cret")
+    assert resp.status == 200
+    conn.close()
+    resp, conn = _get(port, "/health")
+    assert json.loads(resp.read())["users"] == 1
+    conn.close()
+
+
+def _events(resp, count):
+    """Read count SSE events as (id, data) pairs; one chunk each."""
+    events, event = [], {}
+    lines = []
+    while len(events) < count:
+        if not lines:
+            lines = resp.read1().decode().split("\n")
+        line = lines.pop(0)
+        if line.startswith("id: "):
+            event["id"] = line[4:]
+        elif line.startswith("data: "):
+            event["data"] = json.loads(line[6:])
+        elif not line and "data" in event:
+            events.append((event["id"], event["data"]))
+            event = {}
+    return events
+
+
+def test_stream_ids_and_resume_from_last_event_id(served):
+    hub, port = served
+    hub.publish({"alice": ALICE})
+    auth = {"Authorization": "Bearer s3cret"}
+    resp, conn = _get(port, "/presence/alice/stream", auth)
+    assert resp.getheader("Content-Type") == "text/event-stream"
+    [(first_id, data)] = _events(resp, 1)
+    assert first_id == f"{hub.epoch}.{hub.get('alice')[0]}" and data["item_id"] == "1"
+    hub.publish({"alice": dict(ALICE, item_id="2")})
+    [(second_id, data)] = _events(resp, 1)
+    assert data["item_id"] == "2"
+    conn.close()
+
+    # Reconnecting with the newest id: nothing is replayed until a change
+    resp, conn = _get(port, "/presence/alice/stream", dict(auth, **{"Last-Event-ID": second_id}))
+    threading.Timer(0.1, hub.publish, args=({"alice": dict(ALICE, item_id="3")},)).start()
+    [(_, data)] = _events(resp, 1)
+    assert data["item_id"] == "3"
+    conn.close()
+
+    # An id from an older gateway process: the current presence is sent straight away
+    resp, conn = _get(port, "/presence/alice/stream", dict(auth, **{"Last-Event-ID": "1.999"}))
+    [(_, data)] = _events(resp, 1)
+    assert data["item_id"] == "3"
+    conn.close()
+
+
+def test_feed_follows_the_stream(served):
+    hub, port = served
+    hub.publish({"alice": ALICE})
+    feed = GatewayFeed(f"http://127.0.0.1:{port}", "Alice", "s3cret")
+    deadline = time.monotonic() + 5
+    while feed.latest() is None:
+        assert time.monotonic() < deadline
+        feed.wait(0.05)
+    assert feed.latest().item_id == "1"
+    hub.publish({"alice": dict(ALICE, item_id="2")})
+    assert feed.wait(5)
+    assert feed.latest().item_id == "2"
+    assert feed.latest_body()["item_id"] == "2"
+
+
+class _All(BaseHTTPRequestHandler):
+    etag = 'W/"all-1"'
+    seen: list
+
+    def do_GET(self):
+        self.seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({"users": [ALICE, BOB]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_poll_forever_skips_the_diff_on_304(monkeypatch):
+    pytest.importorskip("requests")
+    handler = type("All", (_All,), {"seen": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    hub = Hub()
+    published = []
+    real_publish = hub.publish
+    monkeypatch.setattr(hub, "publish", lambda bodies: published.append(bodies) or real_publish(bodies))
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 3:
+            raise _Stop
+
+    endpoints = EndpointPool([f"http://127.0.0.1:{server.server_address[1]}"])
+    try:
+        with pytest.raises(_Stop):
+            poll_forever(hub, endpoints, "key", 0.01, sleep=sleep)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert handler.seen == [None, 'W/"all-1"', 'W/"all-1"']
+    assert len(published) == 1 and set(published[0]) == {"alice", "bob"}
+    assert hub.polls == 3
@@ -0,0 +1,99 @@
+import calendar
+import time
+
+import pytest
+
+import history
+from history import WatchHistory, connect, recent, top_series, weekly_hours
+from presence_state import PresenceState
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _ts(text):
+    return calendar.timegm(time.strptime(text, "%Y-%m-%d %H:%M"))
+
+
+def _span(db, started, hours, series=None, item="i"):
+    db.execute(history._INSERT, (item, "Episode", series, series, "t", started, started + hours * 3600, "stop"))
+
+
+def test_weekly_hours_buckets_start_on_monday(tmp_path, utc):
+    db = connect(tmp_path / "h.sqlite3")
+    _span(db, _ts("2026-10-12 00:30"), 1)   # Monday
+    _span(db, _ts("2026-10-18 23:00"), 2)   # Sunday, same week
+    _span(db, _ts("2026-10-19 00:10"), 0.5)  # next Monday
+    rows = weekly_hours(db, _ts("2026-10-01 00:00"))
+    assert rows == [("2026-10-12", pytest.approx(3.0)), ("2026-10-19", pytest.approx(0.5))]
+
+
+def test_weekly_hours_uses_each_weeks_own_utc_offset(tmp_path, monkeypatch):
+    # Monday 00:30 in Berlin, once in winter (UTC+1) and once in summer (UTC+2);
+    # one fixed offset puts one of them in the previous week
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    try:
+        db = connect(tmp_path / "h.sqlite3")
+        _span(db, _ts("2024-01-07 23:30"), 1)
+        _span(db, _ts("2024-01-14 22:30"), 0.25)  # Sunday 23:30 local
+        _span(db, _ts("2024-06-30 22:30"), 1)
+        _span(db, _ts("2024-06-30 21:30"), 0.5)  # Sunday 23:30 local
+        rows = weekly_hours(db, _ts("2024-01-01 00:00"))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert rows == [("2024-01-08", pytest.approx(1.25)), ("2024-06-24", pytest.approx(0.5)),
+                    ("2024-07-01", pytest.approx(1.0))]
+
+
+def test_weekly_hours_respects_since(tmp_path, utc):
+    db = connect(tmp_path / "h.sqlite3")
+    _span(db, _ts("2026-09-01 12:00"), 1)
+    assert weekly_hours(db, _ts("2026-10-01 00:00")) == []
+
+
+def test_top_series_groups_by_series_then_item(tmp_path):
+    db = connect(tmp_path / "h.sqlite3")
+    _span(db, 1000, 1, series="s1", item="e1")
+    _span(db, 9000, 2, series="s1", item="e2")
+    _span(db, 20000, 2.5, item="movie")
+    rows = top_series(db, 0, 10)
+    assert rows == [("s1", pytest.approx(3.0), 2), ("t", pytest.approx(2.5), 1)]
+
+
+def _state(item="a", paused=False):
+    return PresenceState(active=True, item_id=item, details=item, is_paused=paused)
+
+
+def test_watch_history_records_transitions(tmp_path):
+    path = tmp_path / "h.sqlite3"
+    h = WatchHistory(path, flush_interval=60)
+    for i in range(4):
+        h.observe(_state(), now=1000 + i * 5)
+    h.observe(_state(paused=True), now=1020)
+    h.observe(_state("b"), now=1030)
+    h.observe(_state("b"), now=1032)  # shorter than MIN_SPAN once stopped
+    h.observe(None, now=1033)
+    h.close()
+    rows = [(s, e, r) for s, e, _, _, r in recent(connect(path), 10)]
+    assert rows == [(1000, 1020, "pause")]
+
+
+def test_watch_history_splits_spans_across_a_gap(tmp_path):
+    path = tmp_path / "h.sqlite3"
+    h = WatchHistory(path, flush_interval=60)
+    h.observe(_state(), now=1000)
+    h.observe(_state(), now=1030)
+    h.observe(_state(), now=1030 + history.MAX_GAP + 3600)  # resumed from suspend
+    h.observe(_state(), now=1030 + history.MAX_GAP + 3660)
+    h.observe(None, now=1030 + history.MAX_GAP + 3660)
+    h.close()
+    rows = sorted((s, e) for s, e, _, _, _ in recent(connect(path), 10))
+    assert rows == [(1000, 1030), (1030 + history.MAX_GAP + 3600, 1030 + history.MAX_GAP + 3660)]
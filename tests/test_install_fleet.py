@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import install_plugin as ip
+
+
+def _inventory(tmp_path, targets):
+    path = tmp_path / "fleet.json"
+    path.write_text(json.dumps({"targets": targets}))
+    return path
+
+
+def test_restart_defaults(tmp_path):
+    targets = ip.load_inventory(_inventory(tmp_path, [
+        {"name": "remote", "plugins_dir": "/mnt/a", "jellyfin_url": "http://a", "api_key": "k"},
+        {"name": "mounted", "plugins_dir": "/mnt/b"},
+    ]))
+    assert [t.restart for t in targets] == ["api", "none"]
+
+
+def test_service_restart_needs_a_local_target(tmp_path):
+    with pytest.raises(ValueError):
+        ip.load_inventory(_inventory(tmp_path, [{"plugins_dir": "/mnt/b", "restart": "service"}]))
+    (target,) = ip.load_inventory(_inventory(tmp_path, [{"plugins_dir": "/x", "restart": "service", "local": True}]))
+    assert target.local and target.restart == "service"
+
+
+def test_service_restarts_once_per_run(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ip, "try_restart_service", lambda: calls.append(1))
+    publish = tmp_path / "publish"
+    publish.mkdir()
+    (publish / "DiscordRpc.dll").write_text("dll")
+    inventory = _inventory(tmp_path, [
+        {"name": f"t{i}", "plugins_dir": str(tmp_path / f"p{i}" / "plugins"), "restart": "service", "local": True}
+        for i in range(3)
+    ])
+    assert ip.run_fleet(inventory, publish, workers=3) == 0
+    assert calls == [1]
+
+
+def test_fleet_rollback_needs_no_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(ip, "build_plugin", lambda *a, **k: pytest.fail("rollback must not build"))
+    plugins = tmp_path / "plugins"
+    for text in ("one", "two"):
+        publish = tmp_path / text
+        publish.mkdir()
+        (publish / "DiscordRpc.dll").write_text(text)
+        ip.install_publish(publish, plugins)
+    inventory = _inventory(tmp_path, [{"plugins_dir": str(plugins)}])
+    monkeypatch.setattr("sys.argv", ["install_plugin.py", "--inventory", str(inventory), "--rollback"])
+    with pytest.raises(SystemExit) as exit_info:
+        ip.main()
+    assert exit_info.value.code == 0
+    assert (plugins / "DiscordRpc" / "DiscordRpc.dll").read_text() == "one"
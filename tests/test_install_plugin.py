@@ -0,0 +1,116 @@
+import pytest
+
+import install_plugin as ip
+
+
+def _publish(root, files):
+    root.mkdir(parents=True, exist_ok=True)
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return root
+
+
+def test_source_manifest_skips_build_outputs_and_other_files(tmp_path):
+    plugin = _publish(tmp_path / "plugin", {"A.cs": "a", "P.csproj": "p", "notes.txt": "n",
+                                            "bin/X.cs": "x", "obj/Y.json": "y", "Configuration/page.html": "h"})
+    assert sorted(ip.source_manifest(plugin)) == ["A.cs", "Configuration/page.html", "P.csproj"]
+
+
+def test_publish_is_current_follows_the_sources(tmp_path):
+    plugin = _publish(tmp_path / "plugin", {"A.cs": "a"})
+    publish = _publish(plugin / "bin" / "installer_publish", {"DiscordRpc.dll": "dll"})
+    ip._write_manifest(plugin / ip.SOURCE_MANIFEST, ip.source_manifest(plugin))
+    assert ip.publish_is_current(plugin, publish)
+    (plugin / "A.cs").write_text("changed")
+    assert not ip.publish_is_current(plugin, publish)
+
+
+def test_deploy_changes_copies_only_what_differs(tmp_path):
+    publish = _publish(tmp_path / "publish", {"a.dll": "a", "b.dll": "b2"})
+    target = _publish(tmp_path / "target", {"a.dll": "a", "b.dll": "b1", "old.dll": "o", "meta.json": "{}"})
+    wanted = ip.publish_manifest(publish)
+    previous = {"a.dll": wanted["a.dll"], "b.dll": "stale", "old.dll": "x"}
+    copy, remove = ip._deploy_changes(publish, target, wanted, previous)
+    assert copy == ["b.dll"]
+    assert remove == ["old.dll"]  # meta.json was never deployed by us
+
+
+def test_deploy_changes_recopies_files_edited_on_the_target(tmp_path):
+    publish = _publish(tmp_path / "publish", {"a.dll": "a"})
+    target = _publish(tmp_path / "target", {"a.dll": "tampered"})
+    wanted = ip.publish_manifest(publish)
+    assert ip._deploy_changes(publish, target, wanted, dict(wanted))[0] == ["a.dll"]
+
+
+def test_install_stages_swaps_and_rolls_back(tmp_path):
+    plugins = tmp_path / "plugins"
+    v1 = _publish(tmp_path / "v1", {"DiscordRpc.dll": "one", "extra.dll": "e"})
+    target, changed = ip.install_publish(v1, plugins)
+    assert sorted(changed) == ["DiscordRpc.dll", "extra.dll"]
+    (target / "meta.json").write_text("{}")  # written by Jellyfin
+
+    assert ip.install_publish(v1, plugins) == (target, [])
+
+    v2 = _publish(tmp_path / "v2", {"DiscordRpc.dll": "two"})
+    _, changed = ip.install_publish(v2, plugins)
+    assert sorted(changed) == ["DiscordRpc.dll", "extra.dll"]
+    assert (target / "DiscordRpc.dll").read_text() == "two"
+    assert not (target / "extra.dll").exists()
+    assert (target / "meta.json").exists()
+    # Staging and the kept copy live beside plugins/, never inside it
+    assert sorted(p.name for p in plugins.iterdir()) == ["DiscordRpc"]
+
+    assert ip.rollback_install(plugins)
+    assert (target / "DiscordRpc.dll").read_text() == "one"
+    assert (target / "extra.dll").exists()
+    assert ip.rollback_install(plugins)  # and back again
+    assert (target / "DiscordRpc.dll").read_text() == "two"
+
+
+def test_failed_swap_aborts_and_leaves_the_live_folder(tmp_path, monkeypatch):
+    plugins = tmp_path / "plugins"
+    target, _ = ip.install_publish(_publish(tmp_path / "v1", {"DiscordRpc.dll": "one"}), plugins)
+
+    def locked(staging, live, previous):
+        raise PermissionError("DiscordRpc.dll is in use")
+
+    monkeypatch.setattr(ip, "_swap_dirs", locked)
+    with pytest.raises(OSError, match="nothing was changed"):
+        ip.install_publish(_publish(tmp_path / "v2", {"DiscordRpc.dll": "two"}), plugins)
+    # Not patched in place, and no staging copy left behind
+    assert (target / "DiscordRpc.dll").read_text() == "one"
+    assert not (ip._install_state_dir(plugins) / "staging").exists()
+
+
+def test_swap_restores_live_when_the_second_rename_fails(tmp_path, monkeypatch):
+    live = _publish(tmp_path / "live", {"a.dll": "old"})
+    staging = _publish(tmp_path / "staging", {"a.dll": "new"})
+    real_replace = ip.os.replace
+
+    def replace(src, dst):
+        if src == staging:
+            raise OSError("cross-device link")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(ip.os, "replace", replace)
+    with pytest.raises(OSError):
+        ip._swap_dirs(staging, live, tmp_path / "previous")
+    assert (live / "a.dll").read_text() == "old"
+
+
+def test_rollback_without_previous_install(tmp_path):
+    assert not ip.rollback_install(tmp_path / "plugins")
+
+
+def test_merge_defaults_keeps_admin_edits():
+    current = {"LargeImageKey": "mine", "Images": {"ENABLE_IMAGES": False}, "Movies": None}
+    defaults = {"LargeImageKey": "jellyfin", "IncludeTimestamps": True,
+                "Images": {"ENABLE_IMAGES": True}, "Movies": {"DetailsTemplate": "{title}"}}
+    merged = ip._merge_defaults(current, defaults)
+    assert merged["LargeImageKey"] == "mine"
+    assert merged["Images"] == {"ENABLE_IMAGES": False}
+    assert merged["IncludeTimestamps"] is True
+    assert merged["Movies"] == {"DetailsTemplate": "{title}"}
+    assert ip._changed_keys(current, merged) == ["Movies", "IncludeTimestamps"]
@@ -0,0 +1,96 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("pypresence")
+if not hasattr(__import__("socket"), "AF_UNIX"):
+    pytest.skip("the fake Discord IPC server needs Unix sockets", allow_module_level=True)
+
+from fake_discord import FakeDiscord  # noqa: E402
+
+CLI_APP = Path(__file__).resolve().parent.parent / "cli-app"
+
+# What the stand-in Presence/Me answers, one entry per poll; the last repeats
+EPISODE = {"active": True, "item_id": "a", "item_type": "Episode", "details": "Show S01E01",
+           "state": "Drama", "large_image": "jellyfin", "small_image": "play", "small_text": "Playing"}
+MOVIE = {"active": True, "item_id": "b", "item_type": "Movie", "details": "Movie",
+         "state": "Comedy", "large_image": "jellyfin", "small_image": "play", "small_text": "Playing"}
+POLLS = [EPISODE, dict(EPISODE, state="Drama • 41:59 left"), EPISODE, MOVIE, MOVIE, {"active": False}]
+
+
+class _Jellyfin(BaseHTTPRequestHandler):
+    polls = 0
+
+    def do_GET(self):
+        cls = type(self)
+        body = json.dumps(POLLS[min(cls.polls, len(POLLS) - 1)]).encode()
+        cls.polls += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def _wait_for(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.skipif((CLI_APP / "config.json").exists(), reason="a local cli-app/config.json would override the test's")
+def test_main_publishes_changes_and_clears(tmp_path):
+    handler = type("Jellyfin", (_Jellyfin,), {"polls": 0})
+    jellyfin = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=jellyfin.serve_forever, daemon=True).start()
+
+    home = tmp_path / "home"
+    config_dir = home / ".config" / "jellyfin-discord-rpc"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config.json").write_text(json.dumps({
+        "jellyfin_url": f"http://127.0.0.1:{jellyfin.server_address[1]}",
+        "api_key": "key",
+        "discord_client_id": "123456789012345678",
+        "interval": 0.2,
+        "watch_history": False,
+        "status_snapshot": False,
+        "Images": {"ENABLE_IMAGES": False},
+    }))
+    runtime = tmp_path / "run"
+    runtime.mkdir()
+    env = dict(os.environ, HOME=str(home), XDG_RUNTIME_DIR=str(runtime), LOG_FILE=str(tmp_path / "rpc.log"))
+    env.pop("APPDATA", None)
+    env.pop("NOTIFY_SOCKET", None)
+
+    with FakeDiscord(str(runtime)) as discord:
+        proc = subprocess.Popen([sys.executable, "main.py", "--daemon"], cwd=CLI_APP, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            assert _wait_for(lambda: handler.polls > len(POLLS) + 2), "client never polled through the script"
+            assert _wait_for(lambda: len(discord.activities()) >= 3)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=15)
+        jellyfin.shutdown()
+        jellyfin.server_close()
+
+    activities = discord.activities()
+    # Drift in the "left" countdown and repeated polls don't republish
+    assert [a and a.get("details") for a in activities] == ["Show S01E01", "Movie", None]
+    assert activities[0]["state"] == "Drama"
+    assert {r.client_id for r in discord.received} == {"123456789012345678"}
@@ -0,0 +1,56 @@
+import pytest
+
+from poll_trace import TraceRing, default_dump_path, read_dump
+
+
+def _poll(ring, status, nbytes, decision, publish=0.0):
+    ring.request_start()
+    ring.response(status, nbytes)
+    ring.commit(decision, publish)
+
+
+def test_dump_round_trip(tmp_path):
+    ring = TraceRing(8)
+    _poll(ring, 200, 512, "update", 0.004)
+    _poll(ring, 304, 0, "skip")
+    path = tmp_path / "rpc_trace.bin"
+    assert ring.dump(path) == 2
+    records = read_dump(path)
+    assert [(r.status, r.nbytes, r.decision) for r in records] == [(200, 512, "update"), (304, 0, "skip")]
+    assert records[0].publish_ms == pytest.approx(4.0, rel=1e-3)
+    assert records[0].request_ms >= 0
+    assert not (tmp_path / "rpc_trace.bin.tmp").exists()
+
+
+def test_ring_keeps_only_the_newest(tmp_path):
+    ring = TraceRing(3)
+    for nbytes in range(5):
+        _poll(ring, 200, nbytes, "skip")
+    assert len(ring) == 3
+    ring.dump(tmp_path / "t.bin")
+    assert [r.nbytes for r in read_dump(tmp_path / "t.bin")] == [2, 3, 4]
+
+
+def test_failed_request_records_status_zero(tmp_path):
+    ring = TraceRing()
+    ring.request_start()
+    ring.commit("error")
+    ring.dump(tmp_path / "t.bin")
+    (record,) = read_dump(tmp_path / "t.bin")
+    assert record.status == 0 and record.decision == "error"
+
+
+def test_unknown_decision_is_rejected():
+    with pytest.raises(KeyError):
+        TraceRing().commit("maybe")
+
+
+def test_read_dump_rejects_other_files(tmp_path):
+    path = tmp_path / "not.bin"
+    path.write_bytes(b"\0" * 32)
+    with pytest.raises(ValueError):
+        read_dump(path)
+
+
+def test_default_dump_path_sits_next_to_the_log(tmp_path):
+    assert default_dump_path(str(tmp_path / "rpc.log")) == tmp_path / "rpc_trace.bin"
@@ -0,0 +1,51 @@
+from presence_diff import PresenceDiff, strip_time_left
+from presence_state import PresenceState
+
+
+def _state(**overrides):
+    values = dict(active=True, item_id="1", details="Show S01E02", state='"Pilot" • Drama • 12:00 left',
+                  start_timestamp=1000, end_timestamp=4600, is_paused=False)
+    values.update(overrides)
+    return PresenceState(**values)
+
+
+def test_strip_time_left():
+    assert strip_time_left('"Pilot" • Drama • 12:00 left') == '"Pilot" • Drama'
+    assert strip_time_left("1:02:03 left") == ""
+    assert strip_time_left(None) is None
+
+
+def test_first_presence_is_published():
+    assert PresenceDiff().should_publish(_state(), None)
+
+
+def test_clock_drift_is_suppressed_and_counted():
+    differ = PresenceDiff(tolerance=5)
+    old = _state()
+    drifted = _state(state='"Pilot" • Drama • 11:55 left', start_timestamp=1003, end_timestamp=4603)
+    assert not differ.should_publish(drifted, old)
+    assert differ.suppressed == 1
+    assert differ.changes(drifted, old) == []
+
+
+def test_seek_beyond_tolerance_is_published():
+    differ = PresenceDiff(tolerance=5)
+    changed = differ.changes(_state(start_timestamp=1100, end_timestamp=4700), _state())
+    assert changed == ["start_timestamp", "end_timestamp"]
+
+
+def test_pause_and_text_changes_are_published():
+    differ = PresenceDiff()
+    assert differ.changes(_state(is_paused=True), _state()) == ["is_paused"]
+    assert differ.changes(_state(details="Show S01E03"), _state()) == ["details"]
+
+
+def test_timestamp_appearing_counts_as_change():
+    assert PresenceDiff().changes(_state(end_timestamp=None), _state()) == ["end_timestamp"]
+
+
+def test_identical_object_is_not_counted():
+    differ = PresenceDiff()
+    state = _state()
+    assert not differ.should_publish(state, state)
+    assert differ.suppressed == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from presence_state import PresenceState
+
+RESPONSE = {
+    "active": True,
+    "details": "Show S01E02",
+    "state": "Drama",
+    "large_image": "jellyfin",
+    "small_image": "https://example/cover.jpg",
+    "item_id": 42,
+    "item_type": "Episode",
+    "series_id": "00000000-0000-0000-0000-000000000000",
+    "is_paused": 0,
+    "links": [{"label": "IMDb", "url": "https://imdb"}, {"label": "", "url": "x"}, "junk"],
+}
+
+
+def test_from_mapping_normalises_fields():
+    state = PresenceState.from_mapping(RESPONSE)
+    assert state.active is True and state.is_paused is False
+    assert state.item_id == "42"
+    assert state.series_id is None  # the empty GUID means "no series"
+    assert state.links == (("IMDb", "https://imdb"),)
+    assert state.genres is None
+
+
+def test_from_mapping_matches_constructor():
+    state = PresenceState.from_mapping(RESPONSE)
+    again = PresenceState.from_mapping(state.to_mapping())
+    assert again == state
+    assert hash(again) == hash(state)
+    assert not (again != state)
+
+
+def test_any_field_change_breaks_equality():
+    state = PresenceState.from_mapping(RESPONSE)
+    assert PresenceState.from_mapping(dict(RESPONSE, is_paused=True)) != state
+
+
+def test_immutable():
+    state = PresenceState(active=True)
+    with pytest.raises(AttributeError):
+        state.details = "x"
+
+
+def test_dict_style_get():
+    state = PresenceState.from_mapping(RESPONSE)
+    assert state.get("details") == "Show S01E02"
+    assert state.get("genres", "none") == "none"
+    assert state.get("missing") is None
+
+
+def test_repeated_strings_are_interned():
+    a = PresenceState.from_mapping(dict(RESPONSE, item_type="".join(["Epi", "sode"])))
+    b = PresenceState.from_mapping(RESPONSE)
+    assert a.item_type is b.item_type
+    assert a.large_image is b.large_image
@@ -0,0 +1,100 @@
+import argparse
+import socket
+import tempfile
+
+import pytest
+
+from discord_pool import PresencePool
+from presence_diff import PresenceDiff
+from presence_state import PresenceState
+from publisher import Publisher
+
+EPISODE = PresenceState(active=True, item_id="a", item_type="Episode", details="Show S01E01",
+                        state="Drama • 41:59 left", large_image="https://jf.lan/Items/a/Images/Primary?tag=1",
+                        start_timestamp=1000, end_timestamp=4600)
+
+
+class FakePresence:
+    def __init__(self, client_id, log):
+        self.client_id = client_id
+        self.log = log
+
+    def update(self, **payload):
+        self.log.append((self.client_id, payload))
+
+    def clear(self):
+        self.log.append((self.client_id, None))
+
+    def close(self):
+        pass
+
+
+class FakeArtwork:
+    def __init__(self, url=None):
+        self.url = url
+        self.landed = False
+
+    def resolve(self, data):
+        return self.url
+
+    def settled(self):
+        return self.landed
+
+
+def _publisher(cfg=None, artwork=None, log=None):
+    log = [] if log is None else log
+    pool = PresencePool(lambda cid: FakePresence(cid, log), "default", {"music": "tunes"})
+    return Publisher(cfg or {}, pool, PresenceDiff(), artwork or FakeArtwork()), log
+
+
+def test_wants_only_meaningful_changes():
+    publisher, _ = _publisher()
+    assert publisher.wants(EPISODE, None)
+    drifted = PresenceState.from_mapping(dict(EPISODE.to_mapping(), state="Drama • 41:54 left", start_timestamp=1002))
+    assert not publisher.wants(drifted, EPISODE)
+    assert publisher.differ.suppressed == 1
+
+
+def test_ticking_template_or_settled_cover_republishes():
+    publisher, _ = _publisher({"state_template": "{time_left}"})
+    assert publisher.templates_tick and publisher.wants(EPISODE, EPISODE)
+    artwork = FakeArtwork()
+    publisher, _ = _publisher(artwork=artwork)
+    assert not publisher.wants(EPISODE, EPISODE)
+    artwork.landed = True
+    assert publisher.wants(EPISODE, EPISODE)
+
+
+def test_payload_uses_cover_and_public_url_only_with_images_enabled():
+    cfg = {"jellyfin_url": "https://jf.lan, https://jf.example.com", "public_url": "https://jf.example.com",
+           "Images": {"ENABLE_IMAGES": True}}
+    publisher, _ = _publisher(cfg, FakeArtwork("https://jf.lan/Items/a/Images/Primary?tag=1"))
+    assert publisher.payload(EPISODE)["large_image"] == "https://jf.example.com/Items/a/Images/Primary?tag=1"
+    publisher, _ = _publisher({}, FakeArtwork("https://unused"))
+    assert publisher.payload(EPISODE)["details"] == "Show S01E01"
+    assert "https://unused" not in publisher.payload(EPISODE).values()
+
+
+def test_send_switches_to_the_media_types_app():
+    publisher, log = _publisher()
+    rpc, seconds = publisher.send(EPISODE, {"details": "Show"})
+    assert rpc.client_id == "default" and seconds >= 0
+    track = PresenceState(active=True, item_id="t", item_type="Audio", details="Song")
+    publisher.send(track, {"details": "Song"})
+    assert log == [("default", {"details": "Show"}), ("default", None), ("tunes", {"details": "Song"})]
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="the fake Discord IPC server needs Unix sockets")
+def test_ipc_load_publishes_through_publisher(monkeypatch, capsys):
+    import ipc_load
+
+    monkeypatch.setenv("XDG_RUNTIME_DIR", "/nonexistent")
+    args = argparse.Namespace(polls=60, interval=5.0, sleep=0.0, diff=True, change_every=3, pause_every=0,
+                              delay=0.0, throttle=False, throttle_wait=False, drop=10, apps=True,
+                              responses=None, client="raw", seed=1)
+    # Short path: AF_UNIX paths are limited to ~100 bytes
+    with tempfile.TemporaryDirectory(prefix="rpc-") as runtime_dir:
+        assert ipc_load.run(args, runtime_dir) == 0
+    out = capsys.readouterr().out
+    assert "activities match" in out
+    assert "updates acknowledged" in out and "update     p50" in out
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("rich")
+
+from main_selfbot import render_presence  # noqa: E402
+from templates import CompiledTemplate  # noqa: E402
+
+CFG = {"jellyfin_url": ["http://10.0.0.2:8096", "https://media.example"]}
+BODY = {
+    "active": True,
+    "details": "Show S01E02",
+    "state": "Drama • 41:00 left",
+    "episode_title": "Pilot",
+    "series_name": "Show",
+    "large_image": "http://10.0.0.2:8096/Items/abc/Images/Primary?tag=1",
+    "end_timestamp": 4600,
+}
+
+
+def test_rendering_leaves_the_shared_body_alone():
+    body = dict(BODY)
+    out = render_presence(body, CFG, CompiledTemplate("{series_name}: {title}"), None)
+    assert body == BODY
+    assert out is not body
+    assert out["details"] == "Show: Pilot"
+    assert out["large_image"] == "https://media.example/Items/abc/Images/Primary?tag=1"
+
+
+def test_rendering_again_starts_from_the_server_text():
+    # A 304 or a ticking template re-renders the cached body, not the last output
+    details = CompiledTemplate("[{title}]")
+    first = render_presence(BODY, CFG, details, None)
+    second = render_presence(BODY, CFG, details, None)
+    assert first["details"] == second["details"] == "[Pilot]"
+
+
+def test_inactive_bodies_pass_through():
+    idle = {"active": False}
+    assert render_presence(idle, CFG, CompiledTemplate("{title}"), None) is idle
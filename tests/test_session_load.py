@@ -0,0 +1,37 @@
+import json
+from urllib.request import urlopen
+
+import pytest
+
+from session_load import PRESENCE_PATH, StandInSessions, run_clients, start_stand_in
+
+
+@pytest.fixture(scope="module")
+def store():
+    return StandInSessions(400, 25, seed=3)
+
+
+def test_index_finds_the_same_sessions_as_the_scan(store):
+    for name in store.user_names + ["USER3", "nobody"]:
+        by_scan = sorted(s["Id"] for s in store.scan(name))
+        by_index = sorted(s["Id"] for s in store.index(name))
+        assert by_index == by_scan, name
+
+
+def test_both_strategies_answer_the_same_presence(store):
+    for name in store.user_names:
+        assert store.presence(name, "index") == store.presence(name, "scan")
+
+
+@pytest.mark.parametrize("strategy", ["scan", "index"])
+def test_stand_in_serves_presences(store, strategy):
+    server, url = start_stand_in(store, strategy)
+    try:
+        with urlopen(f"{url}{PRESENCE_PATH}?username=user0", timeout=5) as resp:
+            assert json.load(resp) == store.presence("user0", strategy)
+        latencies = run_clients(url, "", store.user_names, clients=4, polls=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(latencies) == 20
+    assert len(server.RequestHandlerClass.lookup_ns) == 21
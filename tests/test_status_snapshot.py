@@ -0,0 +1,117 @@
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+from presence_state import PresenceState
+from status_reader import SELFBOT_STATUS_FILE, SIZE, StatusReader
+from status_snapshot import StatusSnapshot, open_status
+
+
+def _playing(**overrides):
+    values = dict(active=True, item_id="abc", details="Show S01E02", state="Drama",
+                  start_timestamp=1000, end_timestamp=4600, series_name="Show")
+    values.update(overrides)
+    return PresenceState(**values)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "status.snap"
+    writer = StatusSnapshot(path)
+    reader = StatusReader(path)
+    assert path.stat().st_size == SIZE
+    assert reader.read().active is False
+
+    assert writer.publish(_playing(is_paused=True), details="Custom details")
+    status = reader.read()
+    assert status.active and status.paused
+    assert (status.details, status.state, status.series_name) == ("Custom details", "Drama", "Show")
+    assert (status.start, status.end) == (1000, 4600)
+    assert status.seq % 2 == 0
+    fields = status.fields(now=2000)
+    assert fields["summary"] == "Custom details • Drama"
+    assert fields["play_state"] == "Paused"
+    assert fields["remaining"] == ""  # frozen while paused
+
+    writer.close()
+    assert reader.read().active is False
+
+
+def test_unchanged_presence_is_not_rewritten(tmp_path):
+    writer = StatusSnapshot(tmp_path / "status.snap")
+    reader = StatusReader(tmp_path / "status.snap")
+    assert writer.publish(_playing())
+    seq = reader.seq()
+    assert not writer.publish(_playing())
+    assert reader.seq() == seq
+
+
+def test_long_text_is_cut_on_a_character_boundary(tmp_path):
+    writer = StatusSnapshot(tmp_path / "status.snap")
+    writer.publish(_playing(details="✓" * 200))  # 600 bytes into 256
+    details = StatusReader(tmp_path / "status.snap").read().details
+    assert details == "✓" * 85
+
+
+def test_sequence_continues_across_writers(tmp_path):
+    path = tmp_path / "status.snap"
+    first = StatusSnapshot(path)
+    first.publish(_playing())
+    seq = StatusReader(path).seq()
+    StatusSnapshot(path)
+    assert StatusReader(path).seq() > seq
+
+
+def test_missing_file_reads_as_none(tmp_path):
+    reader = StatusReader(tmp_path / "absent.snap")
+    assert reader.read() is None
+    assert reader.seq() == 0
+
+
+def test_open_status_honours_config(tmp_path):
+    assert open_status({"status_snapshot": False}) is None
+    status = open_status({"status_snapshot_path": str(tmp_path / "s.snap")})
+    assert isinstance(status, StatusSnapshot)
+
+
+def test_each_client_gets_its_own_default_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    regular = open_status({})
+    selfbot = open_status({}, SELFBOT_STATUS_FILE)
+    regular.publish(_playing(details="Regular"))
+    selfbot.publish(_playing(details="Selfbot"))
+    folder = tmp_path / "jellyfin-discord-rpc"
+    assert StatusReader(folder / "status.snap").read().details == "Regular"
+    assert StatusReader(folder / "status_selfbot.snap").read().details == "Selfbot"
+    regular.close()
+    selfbot.close()
+
+
+CLI_APP = Path(__file__).resolve().parent.parent / "cli-app"
+WRITER = textwrap.dedent("""
+    import sys
+    from pathlib import Path
+    from presence_state import PresenceState
+    from status_snapshot import StatusSnapshot
+    w = StatusSnapshot(Path(sys.argv[1]))
+    for i in range(int(sys.argv[2])):
+        w.publish(PresenceState(active=True, details="D%d" % i, state="%d" % i * 20))
+""")
+
+
+def test_concurrent_reader_never_sees_a_torn_write(tmp_path):
+    path = tmp_path / "status.snap"
+    StatusSnapshot(path)
+    proc = subprocess.Popen([sys.executable, "-c", WRITER, str(path), "20000"], cwd=CLI_APP)
+    reader = StatusReader(path)
+    consistent = 0
+    deadline = time.monotonic() + 60
+    while proc.poll() is None and time.monotonic() < deadline:
+        status = reader.read()
+        if status is not None and status.active:
+            assert status.state == status.details[1:] * 20
+            consistent += 1
+    proc.wait(timeout=60)
+    assert proc.returncode == 0
+    assert consistent > 0
@@ -0,0 +1,39 @@
+import pytest
+
+from template_load import DEFAULT_TEMPLATES, CompiledTemplate, StandInPresence, TOKENS
+
+
+def test_compiled_renders_like_the_chained_replace():
+    store = StandInPresence(300, dict(DEFAULT_TEMPLATES), seed=5)
+    for i in range(len(store.items)):
+        assert store.render(i, "compiled") == store.render(i, "replace")
+
+
+@pytest.mark.parametrize("template", [
+    "{title} • {nope} • {time_left}",
+    "{{title}} {title",
+    "}{genres}{",
+    "",
+])
+def test_unknown_names_and_braces_stay_literal(template):
+    values = [f"<{t}>" for t in TOKENS]
+    expected = template
+    for name, value in zip(TOKENS, values):
+        expected = expected.replace("{" + name + "}", value)
+    assert CompiledTemplate(template).render(values) == expected
+
+
+def test_token_free_templates_are_constant():
+    t = CompiledTemplate("Jellyfin")
+    assert t.constant == "Jellyfin"
+    assert t.render([]) == "Jellyfin"
+
+
+def test_templates_are_recompiled_when_the_version_moves():
+    store = StandInPresence(3, dict(DEFAULT_TEMPLATES))
+    first = store.compiled()
+    assert store.compiled() is first
+    store.templates["LargeImageText"] = "{activity}"
+    store.version += 1
+    assert store.compiled() is not first
+    assert store.render(0, "compiled")["large_text"] in ("Watching", "Listening")
@@ -0,0 +1,55 @@
+from templates import CompiledTemplate, compile_templates
+
+EPISODE = {
+    "details": "Show S01E02",
+    "episode_title": "Pilot",
+    "series_name": "Show",
+    "season_episode": "S01E02",
+    "genres": "Drama, Comedy",
+    "item_type": "Episode",
+    "start_timestamp": 1000,
+    "end_timestamp": 4600,
+    "is_paused": False,
+}
+
+
+def test_tokens_render_in_one_pass():
+    t = CompiledTemplate("{series_or_title} - {title}")
+    assert t.render(EPISODE, now=1000) == "Show S01E02 - Pilot"
+    assert not t.time_dependent
+
+
+def test_time_tokens_follow_the_clock():
+    t = CompiledTemplate("{progress_percent}% • {time_left}")
+    assert t.time_dependent
+    assert t.render(EPISODE, now=1000 + 1800) == "50% • 30:00 left"
+    assert t.render(EPISODE, now=1000) == "0% • 01:00:00 left"
+
+
+def test_empty_bullet_segments_are_dropped():
+    t = CompiledTemplate('"{title}" • {genres} • {time_left}')
+    paused = dict(EPISODE, is_paused=True)
+    assert t.render(paused, now=2000) == '"Pilot" • Drama, Comedy'
+
+
+def test_unknown_tokens_and_stray_braces_stay_verbatim():
+    # Like the plugin's Replace: "{{title}}" still contains the token
+    t = CompiledTemplate("{nope} {{title}} {title")
+    assert t.render(EPISODE, now=1000) == "{nope} {Pilot} {title"
+
+
+def test_template_without_tokens_is_returned_as_is():
+    t = CompiledTemplate("Jellyfin")
+    assert t.render({}) == "Jellyfin"
+
+
+def test_activity_and_play_state():
+    t = CompiledTemplate("{activity} ({play_state})")
+    assert t.render(dict(EPISODE, item_type="Audio", is_paused=True), now=0) == "Listening (Paused)"
+    assert t.render(EPISODE, now=0) == "Watching (Playing)"
+
+
+def test_compile_templates_reads_optional_keys():
+    details, state = compile_templates({"details_template": "{title}"})
+    assert isinstance(details, CompiledTemplate)
+    assert state is None
@@ -0,0 +1,58 @@
+import json
+
+from presence_state import PresenceState
+from warm_start import Snapshot, WarmStart
+
+PLAYING = PresenceState.from_mapping({
+    "active": True, "details": "Show S01E01", "state": "Drama", "item_id": "a",
+    "start_timestamp": 1000, "end_timestamp": 4600,
+})
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr("warm_start.time.time", lambda: 2000.0)
+    path = tmp_path / "cfg" / "presence_snapshot.json"
+    assert WarmStart(path).save(PLAYING, "a", None)
+    assert not (tmp_path / "cfg" / "presence_snapshot.json.tmp").exists()
+
+    snap = WarmStart(path).load()
+    assert snap == Snapshot(state=PLAYING, content_key="a", paused_since=None, saved_at=2000.0)
+
+
+def test_unchanged_state_is_rewritten_only_to_stay_fresh(tmp_path, monkeypatch):
+    now = [2000.0]
+    monkeypatch.setattr("warm_start.time.time", lambda: now[0])
+    warm = WarmStart(tmp_path / "snap.json", max_age=600)
+    assert warm.save(PLAYING, "a", None)
+    now[0] += 100
+    assert not warm.save(PLAYING, "a", None)
+    assert warm.save(PLAYING, "a", 2100.0)  # paused: changed
+    now[0] += 301
+    assert warm.save(PLAYING, "a", 2100.0)  # half of max_age passed
+
+
+def test_old_snapshots_are_ignored(tmp_path, monkeypatch):
+    now = [2000.0]
+    monkeypatch.setattr("warm_start.time.time", lambda: now[0])
+    path = tmp_path / "snap.json"
+    WarmStart(path).save(None, "idle", None)
+    now[0] += 601
+    assert WarmStart(path, max_age=600).load() is None
+    assert WarmStart(path, max_age=3600).load() is not None
+
+
+def test_items_that_have_ended_are_stale():
+    snap = Snapshot(state=PLAYING, content_key="a", paused_since=None, saved_at=4500.0)
+    assert snap.is_fresh(600, now=4590.0)
+    assert not snap.is_fresh(600, now=4700.0)
+    paused = Snapshot(state=PresenceState.from_mapping(dict(PLAYING.to_mapping(), is_paused=True)), content_key="a", paused_since=4500.0, saved_at=4500.0)
+    assert paused.is_fresh(600, now=4700.0)
+
+
+def test_broken_files_load_as_nothing(tmp_path):
+    path = tmp_path / "snap.json"
+    assert WarmStart(path).load() is None
+    path.write_text("{not json")
+    assert WarmStart(path).load() is None
+    path.write_text(json.dumps(["a", "list"]))
+    assert WarmStart(path).load() is None
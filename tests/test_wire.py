@@ -0,0 +1,90 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import wire
+from presence_state import PresenceState
+from wire import PresenceCache, decode_body, decode_presence
+
+BODY = {"active": True, "details": "Movie", "item_id": "7"}
+
+
+def test_cache_sends_no_validator_until_it_has_a_value():
+    cache = PresenceCache()
+    assert cache.headers() == {}
+    cache.store('W/"abc"', None)
+    assert cache.headers() == {}
+
+
+def test_not_modified_returns_the_stored_object():
+    cache = PresenceCache()
+    state = cache.store('W/"abc"', PresenceState.from_mapping(BODY))
+    assert cache.headers() == {"If-None-Match": 'W/"abc"'}
+    assert cache.not_modified() is state
+    assert cache.hits == 1
+
+
+def test_decode_json_and_msgpack():
+    assert decode_body(json.dumps(BODY).encode(), "application/json") == BODY
+    msgpack = pytest.importorskip("msgpack")
+    packed = msgpack.packb(BODY)
+    assert decode_body(packed, "application/x-msgpack") == BODY
+    assert decode_presence(packed, "application/x-msgpack").details == "Movie"
+
+
+def test_accept_header_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(wire, "msgpack", None)
+    assert wire.accept_header() == "application/json"
+
+
+class _ETagServer(BaseHTTPRequestHandler):
+    etag = 'W/"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        body = json.dumps(BODY).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+@pytest.fixture
+def etag_server():
+    handler = type("Handler", (_ETagServer,), {"requests_seen": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_presence_reuses_the_presence_on_304(etag_server):
+    pytest.importorskip("requests")
+    pytest.importorskip("pypresence")
+    pytest.importorskip("rich")
+    import main
+    from endpoints import EndpointPool
+
+    handler, url = etag_server
+    cache = PresenceCache()
+    endpoints = EndpointPool([url])
+    first = main.get_presence(endpoints, "key", cache=cache)
+    second = main.get_presence(endpoints, "key", cache=cache)
+    assert first.details == "Movie"
+    assert second is first
+    assert cache.hits == 1
+    assert handler.requests_seen == [None, 'W/"v1"']